@@ -0,0 +1,121 @@
+"""
+AOI (American Opportunity Index) composite score.
+
+Job listings carry four AOI badges and three employer rates. ``aoi_score``
+condenses them into one 0-5 number that is stored on ``job_listing`` and
+indexed, so listings can be filtered (``GET /api/jobs?min_aoi=4``) and
+ordered by opportunity quality in SQL:
+
+    badges   Platinum = 1, Gold = 0.5, anything else = 0; the overall badge
+             counts twice, early career, growth and stability once each
+    rates    internal and external promotion rate (0.3 or more = 1) and
+             3-year retention rate (0-1), averaged over the rates present
+    score    5 x (badges + rates) / 2, or badges alone without any rate
+
+Rows written through the ORM get their score from a mapper event (see
+models.py); bulk loads such as synthetic_data.py call ``compute_aoi_score``
+directly. Existing databases are upgraded and filled with
+
+    python aoi.py backfill
+"""
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+BADGE_POINTS = {"platinum": 1.0, "gold": 0.5}
+# Promotion rates at or above this count as the best possible
+PROMOTION_RATE_CAP = 0.3
+MAX_SCORE = 5.0
+
+
+def _badge(value: Optional[str]) -> float:
+    return BADGE_POINTS.get((value or "").lower(), 0.0)
+
+
+def compute_aoi_score(overall_badge: Optional[str], early_career_badge: Optional[str],
+                      growth_badge: Optional[str], stability_badge: Optional[str],
+                      internal_promotion_rate: Optional[float], external_promotion_rate: Optional[float],
+                      retention_rate_3yr: Optional[float]) -> Optional[float]:
+    """Composite 0-5 score, or None when the listing has no AOI data at all"""
+    badges = (overall_badge, early_career_badge, growth_badge, stability_badge)
+    rates = [min(1.0, rate / PROMOTION_RATE_CAP) for rate in (internal_promotion_rate, external_promotion_rate)
+             if rate is not None]
+    if retention_rate_3yr is not None:
+        rates.append(min(1.0, retention_rate_3yr))
+    if all(badge is None for badge in badges) and not rates:
+        return None
+
+    badge_part = (2 * _badge(overall_badge) + _badge(early_career_badge) + _badge(growth_badge)
+                  + _badge(stability_badge)) / 5
+    if not rates:
+        return round(MAX_SCORE * badge_part, 2)
+    return round(MAX_SCORE * (badge_part + sum(rates) / len(rates)) / 2, 2)
+
+
+def aoi_score_for(job) -> Optional[float]:
+    """compute_aoi_score from a JobListing's AOI columns"""
+    return compute_aoi_score(
+        job.aoi_overall_badge, job.aoi_badge_early_career, job.aoi_badge_growth, job.aoi_badge_stability,
+        job.aoi_interal_promption_rate, job.aoi_external_promotion_rate, job.aoi_retention_rate_3yr,
+    )
+
+
+def ensure_column(engine) -> bool:
+    """Add job_listing.aoi_score and its index to a database created before they existed"""
+    from sqlalchemy import inspect, text
+
+    from models import JobListing
+
+    columns = {column["name"] for column in inspect(engine).get_columns(JobListing.__tablename__)}
+    if "aoi_score" in columns:
+        return False
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE job_listing ADD COLUMN aoi_score FLOAT"))
+    for index in JobListing.__table__.indexes:
+        if "aoi_score" in index.columns:
+            index.create(bind=engine, checkfirst=True)
+    return True
+
+
+def backfill(db, batch_size: int = 1000) -> int:
+    """Compute aoi_score for stored jobs that lack it; returns the number updated"""
+    from models import JobListing
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = db.query(JobListing).filter(
+            JobListing.id > last_id, JobListing.aoi_score.is_(None)
+        ).order_by(JobListing.id).limit(batch_size).all()
+        if not batch:
+            break
+        for job in batch:
+            job.aoi_score = aoi_score_for(job)
+            updated += job.aoi_score is not None
+        last_id = batch[-1].id
+        db.commit()
+    if updated:
+        from cache import invalidate_catalog
+        invalidate_catalog()
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal, get_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the stored AOI composite score")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Add the aoi_score column if needed and fill it")
+    backfill_parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if ensure_column(get_engine()):
+        logger.info("Added job_listing.aoi_score")
+    session = SessionLocal()
+    try:
+        logger.info("Scored %d job listings", backfill(session, args.batch_size))
+    finally:
+        session.close()
@@ -0,0 +1,354 @@
+"""
+Benchmark harness for scoring, job listings, recommendations and swipe ingestion.
+
+Runs against a scratch database (SQLite by default, or a local PostgreSQL
+instance) that is dropped and re-seeded on every run with data from
+synthetic_data.py:
+
+    python benchmark.py --jobs 1000 --users 10000
+    python benchmark.py --jobs 100000 --database-url postgresql://localhost/careervillage_bench
+
+Results are saved as JSON under data/processed/benchmarks/. Pass --baseline
+with an earlier results file to fail (exit code 1) on regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "..", "data", "processed", "benchmarks")
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(BASE_DIR, "..", "data", "processed", "benchmark.db")
+FEATURE_STORE_DIR = os.path.join(BASE_DIR, "..", "data", "processed", "benchmark_features")
+
+# Metrics where a larger number is better; everything else is a latency
+THROUGHPUT_KEYS = ("ops_per_sec",)
+
+
+def percentiles(samples_ms):
+    """Summarize latency samples (milliseconds) as p50/p95/p99/mean"""
+    ordered = sorted(samples_ms)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(pick(50), 3),
+        "p95_ms": round(pick(95), 3),
+        "p99_ms": round(pick(99), 3),
+    }
+
+
+def seed(engine, args):
+    """Drop, recreate and fill the benchmark database"""
+    from models import Base
+    from synthetic_data import populate
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    populate(engine, jobs=args.jobs, users=args.users, seed=args.seed)
+    return round(time.perf_counter() - start, 3)
+
+
+def bench_scoring(session_factory, args):
+    """Throughput of calculate_job_match_score over a sample of jobs"""
+    from models import JobListing, User
+    from utils import calculate_job_match_score
+
+    db = session_factory()
+    try:
+        jobs = db.query(JobListing).limit(args.score_sample).all()
+        users = db.query(User).limit(10).all()
+        start = time.perf_counter()
+        for user in users:
+            for job in jobs:
+                calculate_job_match_score(user, job)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+
+    calls = len(users) * len(jobs)
+    return {"calls": calls, "seconds": round(elapsed, 4), "ops_per_sec": round(calls / elapsed, 1)}
+
+
+def bench_endpoint(session_factory, args, call):
+    """Latency percentiles for a view function invoked with a fresh session per request"""
+    rng = random.Random(args.seed + 1)
+    samples = []
+    for _ in range(args.requests):
+        user_id = rng.randint(1, args.users)
+        db = session_factory()
+        try:
+            start = time.perf_counter()
+            call(user_id, db)
+            samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+    return percentiles(samples)
+
+
+def bench_swipes(session_factory, args):
+    """Insert rate of create_swipe, including its preference recompute cadence"""
+    from fastapi import Response
+    from schemas import SwipeCreate
+    from views import create_swipe
+
+    rng = random.Random(args.seed + 2)
+    samples = []
+    start = time.perf_counter()
+    for i in range(args.swipes):
+        direction = rng.choice(["left", "right"])
+        swipe = SwipeCreate(
+            user_id=rng.randint(1, args.users),
+            job_listing_id=rng.randint(1, args.jobs),
+            interaction_type=f"swipe_{direction}",
+            swipe_direction=direction,
+            position_in_deck=i % 10,
+            session_id=f"bench-{i // 10}",
+            aspect_swiped="overall",
+        )
+        db = session_factory()
+        try:
+            call_start = time.perf_counter()
+            create_swipe(swipe, Response(), db)
+            samples.append((time.perf_counter() - call_start) * 1000)
+        finally:
+            db.close()
+    elapsed = time.perf_counter() - start
+
+    result = percentiles(samples)
+    result["ops_per_sec"] = round(args.swipes / elapsed, 1)
+    return result
+
+
+def bench_hot_queries(session_factory, args):
+    """Per-query latency of the hot lookups: ad-hoc ORM Query vs the pre-built statements in queries.py"""
+    import queries
+    from models import JobListing, User, UserJobListing
+    from utils import recent_interactions_cutoff
+
+    cutoff = recent_interactions_cutoff()
+    cases = {
+        "user_by_id": (
+            lambda db, u, j: db.query(User).filter(User.id == u).first(),
+            lambda db, u, j: queries.user_by_id(db, u)),
+        "job_by_id": (
+            lambda db, u, j: db.query(JobListing).filter(JobListing.id == j).first(),
+            lambda db, u, j: queries.job_by_id(db, j)),
+        "job_exists": (
+            lambda db, u, j: db.query(JobListing.id).filter(JobListing.id == j).first(),
+            lambda db, u, j: queries.job_exists(db, j)),
+        "seen_job_ids": (
+            lambda db, u, j: db.query(UserJobListing.job_listing_id).filter(
+                UserJobListing.user_id == u).distinct().all(),
+            lambda db, u, j: queries.seen_job_ids(db, u)),
+        "recent_swipes_with_jobs": (
+            lambda db, u, j: db.query(UserJobListing.swipe_direction, JobListing).join(
+                JobListing, JobListing.id == UserJobListing.job_listing_id
+            ).filter(
+                UserJobListing.user_id == u,
+                UserJobListing.interaction_type.in_(['swipe_left', 'swipe_right']),
+                UserJobListing.created_at >= cutoff
+            ).order_by(UserJobListing.created_at.desc()).limit(30).all(),
+            lambda db, u, j: queries.recent_swipes_with_jobs(db, u, cutoff)),
+    }
+
+    rng = random.Random(args.seed + 3)
+    results = {}
+    db = session_factory()
+    try:
+        for name, (orm_call, prebuilt_call) in cases.items():
+            samples = {"orm": [], "prebuilt": []}
+            for i in range(args.query_iterations):
+                user_id, job_id = rng.randint(1, args.users), rng.randint(1, args.jobs)
+                # Alternate which variant runs first so caching effects are shared fairly
+                order = (("orm", orm_call), ("prebuilt", prebuilt_call))
+                for variant, call in order if i % 2 else reversed(order):
+                    start = time.perf_counter()
+                    call(db, user_id, job_id)
+                    samples[variant].append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+            orm, prebuilt = percentiles(samples["orm"]), percentiles(samples["prebuilt"])
+            results[name] = {
+                "orm_p50_ms": orm["p50_ms"],
+                "prebuilt_p50_ms": prebuilt["p50_ms"],
+                "saved_us": round((orm["p50_ms"] - prebuilt["p50_ms"]) * 1000, 1),
+                "speedup": round(orm["p50_ms"] / prebuilt["p50_ms"], 2) if prebuilt["p50_ms"] else None,
+            }
+    finally:
+        db.close()
+    return results
+
+
+def bench_pool_scaling(session_factory, args):
+    """Full-catalog scoring latency through ScoringPool at each worker count"""
+    import numpy as np
+    from feature_store import get_features
+    from models import User
+    from scoring_kernel import kernel_for
+    from scoring_pool import ScoringPool
+
+    db = session_factory()
+    try:
+        users = db.query(User).limit(args.requests).all()
+    finally:
+        db.close()
+    features = get_features(FEATURE_STORE_DIR)
+    positions = np.arange(len(features))
+
+    results = {}
+    for workers in args.pool_workers:
+        pool = ScoringPool(workers, store_dir=FEATURE_STORE_DIR)
+        try:
+            # Warm up: spawn workers and map the store before timing
+            pool.top_k(kernel_for(users[0]).bind(features), positions, 20)
+            samples = []
+            for user in users:
+                start = time.perf_counter()
+                pool.top_k(kernel_for(user).bind(features), positions, 20)
+                samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            pool.shutdown()
+        results[f"workers_{workers}"] = percentiles(samples)
+
+    baseline = results[f"workers_{args.pool_workers[0]}"]["p50_ms"]
+    for metrics in results.values():
+        metrics["speedup"] = round(baseline / metrics["p50_ms"], 2) if metrics["p50_ms"] else None
+    return results
+
+
+def run(results, name, func, *args):
+    """Run one benchmark, recording its error instead of aborting the whole suite"""
+    print(f"Benchmarking {name}...")
+    try:
+        results["results"][name] = func(*args)
+    except Exception as exc:
+        print(f"  {name} failed: {exc!r}")
+        results["results"][name] = {"error": repr(exc)}
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of results against a baseline run"""
+    regressions = []
+    for name, metrics in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        for key in ("ops_per_sec", "p95_ms"):
+            if key not in metrics or key not in previous:
+                continue
+            old, new = previous[key], metrics[key]
+            if key in THROUGHPUT_KEYS:
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name}.{key}: {old} -> {new}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring, listings, recommendations and swipes")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL,
+                        help="Scratch database to seed (all tables are dropped)")
+    parser.add_argument("--jobs", type=int, default=1000, help="Synthetic job listings (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--users", type=int, default=10000, help="Synthetic users")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per latency benchmark")
+    parser.add_argument("--swipes", type=int, default=500, help="Swipes to insert")
+    parser.add_argument("--query-iterations", type=int, default=2000,
+                        help="Executions per hot query in the prepared-statement microbenchmark")
+    parser.add_argument("--score-sample", type=int, default=5000, help="Jobs scored per user in the throughput test")
+    parser.add_argument("--pool-workers", type=lambda v: [int(w) for w in v.split(",")],
+                        help="Comma-separated worker counts for the scoring pool scaling run, e.g. 1,2,4,8")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Results file (default: data/processed/benchmarks/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--force", action="store_true", help="Allow using the app's DATABASE_URL")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.database_url == os.getenv("DATABASE_URL") and not args.force:
+        sys.exit("Refusing to drop the application database; pass a scratch --database-url or --force")
+
+    # database.py and feature_store.py read their locations at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["FEATURE_STORE_DIR"] = FEATURE_STORE_DIR
+    # Keep benchmark decks out of the app's shared cache file
+    os.environ["CACHE_URL"] = "memory://"
+    from database import engine, SessionLocal
+    from views import get_jobs, get_recommendations
+    engine.echo = False
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "jobs": args.jobs,
+            "users": args.users,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    print(f"Seeding {args.jobs} jobs and {args.users} users into {engine.dialect.name}...")
+    results["meta"]["seed_seconds"] = seed(engine, args)
+
+    from feature_store import build_feature_store
+    db = SessionLocal()
+    try:
+        build_feature_store(db, store_dir=FEATURE_STORE_DIR, with_embeddings=False)
+    finally:
+        db.close()
+
+    run(results, "calculate_job_match_score", bench_scoring, SessionLocal, args)
+    run(results, "get_jobs", bench_endpoint, SessionLocal, args, lambda user_id, db: get_jobs(
+        user_id=user_id, skip=0, limit=20, location=None, industry=None, min_salary=None, min_aoi=None,
+        after_id=None, count="exact", db=db))
+    run(results, "get_recommendations", bench_endpoint, SessionLocal, args,
+        lambda user_id, db: get_recommendations(user_id=user_id, limit=10, db=db))
+    run(results, "create_swipe", bench_swipes, SessionLocal, args)
+    run(results, "hot_queries", bench_hot_queries, SessionLocal, args)
+    if args.pool_workers:
+        run(results, "scoring_pool", bench_pool_scaling, SessionLocal, args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{args.jobs}jobs.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results["results"], indent=2))
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+Two-tier cache for catalog and recommendation data.
+
+Each uvicorn worker keeps a small in-process LRU in front of a store shared
+by all workers on the host, so a restart or a second worker does not start
+cold and the same value is not computed once per worker. The shared store is
+chosen with CACHE_URL:
+
+    redis://localhost:6379/0     Redis or any Redis-compatible server (needs `redis`)
+    sqlite:///path/cache.sqlite3 a local SQLite file in WAL mode (the default)
+    memory://                    process-local, for tests and single-worker runs
+
+Values are JSON and expire after a per-cache TTL. Keys embed the catalog
+version (feature store version plus a counter bumped by ingestion) and, for
+per-user data, a user version bumped whenever the user's stated or learned
+preferences change, so stale entries are never read and simply age out. Concurrent misses for the
+same key are coalesced: within a worker one thread computes while the others
+wait, and across workers a short-lived lock key in the shared store does the
+same.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import Counter, Histogram, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.getenv("CACHE_URL") or "sqlite:///" + os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "processed", "cache.sqlite3")
+CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "2048"))
+# How long the in-process tier may serve an entry without asking the shared store
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "5"))
+# How long a worker may hold the cross-worker lock for one key while computing it
+CACHE_LOCK_SECONDS = float(os.getenv("CACHE_LOCK_SECONDS", "10"))
+# How long a worker reuses the catalog version before re-reading CURRENT and the
+# shared counter; another worker's invalidation is seen after at most this long
+CACHE_CATALOG_VERSION_TTL = float(os.getenv("CACHE_CATALOG_VERSION_TTL", "1"))
+
+REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+LOAD_SECONDS = Histogram("cache_load_duration_seconds", "Time to compute a missing cache entry", ("cache",))
+REGISTRY.extend([REQUESTS, LOAD_SECONDS])
+
+
+class MemoryBackend:
+    """Process-local stand-in for the shared store"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value, expires_at = self._data.get(key, (None, 0.0))
+            return value if expires_at > time.time() else None
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        """Set ``key`` only if it is missing or expired; True if it was set"""
+        with self._lock:
+            if self._data.get(key, (None, 0.0))[1] > time.time():
+                return False
+            self._data[key] = (value, time.time() + ttl)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._data.get(key, (0, 0.0))[0]) + 1
+            self._data[key] = (value, float("inf"))
+            return value
+
+
+class SQLiteBackend:
+    """Shared store in a local SQLite file, one connection per thread"""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache.expires_at <= ?",
+            (key, value, now + ttl, now))
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        row = self._conn().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, '1', 1e308) "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1 RETURNING value",
+            (key,)).fetchone()
+        return int(row[0])
+
+
+class RedisBackend:
+    """Shared store in Redis or a Redis-compatible server"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self.client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+
+def open_backend(url: str = CACHE_URL):
+    """Shared store for a CACHE_URL"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url == "memory://":
+        return MemoryBackend()
+    raise ValueError(f"Unsupported CACHE_URL {url!r}")
+
+
+class LocalLRU:
+    """Thread-safe LRU of (value, expires_at) entries"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """(True, value) for a live entry, (False, None) otherwise"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return False, None
+            self._data.move_to_end(key)
+            return True, entry[0]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache:
+    """One named cache: in-process LRU over the shared store, with single-flight loads"""
+
+    def __init__(self, name: str, ttl: float, local_size: int = CACHE_LOCAL_SIZE):
+        self.name = name
+        self.ttl = ttl
+        self.local = LocalLRU(local_size)
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, computing it with ``loader`` (JSON-serializable) on a miss"""
+        key = f"{self.name}:{key}"
+        found, value = self._lookup(key)
+        if found:
+            return value
+
+        # Single-flight within this worker
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait(CACHE_LOCK_SECONDS)
+            found, value = self._lookup(key)
+            if found:
+                return value
+        try:
+            return self._load(key, loader)
+        finally:
+            if leader:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def put(self, key: str, value: Any):
+        """Replace the entry for ``key`` (e.g. after the caller found it unusable)"""
+        key = f"{self.name}:{key}"
+        _shared_call("set", key, json.dumps(value), self.ttl)
+        self.local.set(key, value, min(self.ttl, CACHE_LOCAL_TTL))
+
+    def _lookup(self, key: str):
+        found, value = self.local.get(key)
+        if found:
+            REQUESTS.inc((self.name, "local_hit"))
+            return True, value
+        raw = _shared_get(key)
+        if raw is not None:
+            value = json.loads(raw)
+            self.local.set(key, value, min(self.ttl, CACHE_LOCAL_TTL))
+            REQUESTS.inc((self.name, "shared_hit"))
+            return True, value
+        return False, None
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        # Single-flight across workers: wait briefly for whoever holds the lock
+        lock_key = f"lock:{key}"
+        locked = _shared_add(lock_key, CACHE_LOCK_SECONDS)
+        if not locked:
+            deadline = time.monotonic() + CACHE_LOCK_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                raw = _shared_get(key)
+                if raw is not None:
+                    REQUESTS.inc((self.name, "shared_hit"))
+                    value = json.loads(raw)
+                    self.local.set(key, value, min(self.ttl, CACHE_LOCAL_TTL))
+                    return value
+                if _shared_get(lock_key) is None:
+                    break
+
+        REQUESTS.inc((self.name, "miss"))
+        start = time.perf_counter()
+        try:
+            value = loader()
+        finally:
+            LOAD_SECONDS.observe((self.name,), time.perf_counter() - start)
+            if locked:
+                _shared_call("delete", lock_key)
+        _shared_call("set", key, json.dumps(value), self.ttl)
+        self.local.set(key, value, min(self.ttl, CACHE_LOCAL_TTL))
+        return value
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = open_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the shared store (e.g. a MemoryBackend in tests) and drop local entries"""
+    global _backend, _catalog_version
+    _backend = backend
+    _catalog_version = ("", 0.0)
+    for cache in CACHES.values():
+        cache.local.clear()
+
+
+def _shared_call(method: str, *args):
+    # The shared tier is an optimisation; if it is down, compute and carry on
+    try:
+        return getattr(get_backend(), method)(*args)
+    except Exception:
+        logger.warning("Shared cache %s failed", method, exc_info=True)
+        return None
+
+
+def _shared_get(key: str) -> Optional[str]:
+    return _shared_call("get", key)
+
+
+def _shared_add(key: str, ttl: float) -> bool:
+    result = _shared_call("add", key, "1", ttl)
+    # Without a shared store there is nobody to coordinate with
+    return True if result is None else result
+
+
+def _version(key: str) -> int:
+    raw = _shared_get(key)
+    return int(raw) if raw is not None else 0
+
+
+# (version, monotonic expiry) of this worker's copy of the catalog version
+_catalog_version: Tuple[str, float] = ("", 0.0)
+
+
+def catalog_version() -> str:
+    """
+    Changes when a feature store version is published or jobs are reingested.
+    Kept in-process for CACHE_CATALOG_VERSION_TTL, so a local-tier hit does
+    no file or shared-store I/O.
+    """
+    global _catalog_version
+    version, expires_at = _catalog_version
+    now = time.monotonic()
+    if now < expires_at:
+        return version
+    from feature_store import current_version
+
+    version = f"{current_version() or 'none'}.{_version('version:catalog')}"
+    _catalog_version = (version, now + CACHE_CATALOG_VERSION_TTL)
+    return version
+
+
+def user_version(user_id: int) -> int:
+    """Changes whenever the user's stated or learned preferences change"""
+    return _version(f"version:user:{user_id}")
+
+
+def get_state(key: str) -> Optional[Any]:
+    """Small JSON value shared by all workers, or None if missing or expired"""
+    raw = _shared_get(key)
+    return json.loads(raw) if raw is not None else None
+
+
+def set_state(key: str, value: Any, ttl: float):
+    _shared_call("set", key, json.dumps(value), ttl)
+
+
+def set_flag(key: str, ttl: float):
+    """Mark ``key`` for ``ttl`` seconds, visible to every worker"""
+    _shared_call("set", key, "1", ttl)
+
+
+def has_flag(key: str) -> bool:
+    return _shared_get(key) is not None
+
+
+def invalidate_catalog():
+    global _catalog_version
+    _shared_call("incr", "version:catalog")
+    _catalog_version = ("", 0.0)
+
+
+def invalidate_user(user_id: int):
+    _shared_call("incr", f"version:user:{user_id}")
+
+
+CACHES = {
+    "job": TieredCache("job", float(os.getenv("CACHE_JOB_TTL", "3600"))),
+    "deck": TieredCache("deck", float(os.getenv("CACHE_DECK_TTL", "300"))),
+    "score": TieredCache("score", float(os.getenv("CACHE_SCORE_TTL", "900"))),
+    "count": TieredCache("count", float(os.getenv("CACHE_COUNT_TTL", "300"))),
+}
+job_cache = CACHES["job"]
+deck_cache = CACHES["deck"]
+score_cache = CACHES["score"]
+count_cache = CACHES["count"]
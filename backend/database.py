@@ -1,21 +1,158 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+import itertools
+import logging
 import os
+import threading
+from typing import List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-
+logger = logging.getLogger(__name__)
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=True)
+# create: create missing tables at startup; check: fail startup if tables or
+# columns are missing; skip: schema is managed externally (e.g. Alembic)
+SCHEMA_MODE = os.getenv("SCHEMA_MODE", "create")
+
+# Compiled SQL cache entries per engine (SQLAlchemy's default is 500); hit
+# rates are exported as sql_compiled_cache_total, raise this if misses persist
+SQL_QUERY_CACHE_SIZE = int(os.getenv("SQL_QUERY_CACHE_SIZE", "1000"))
+# psycopg 3 prepares a statement server-side after it ran this many times on a
+# connection; empty disables it (e.g. behind PgBouncer in transaction mode)
+PG_PREPARE_THRESHOLD = os.getenv("PG_PREPARE_THRESHOLD", "5")
+
+# Comma-separated read replica URLs for the read-only endpoints (get_read_db)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write, the user's reads stay on the primary this long; keep it above replica lag
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+_engine = None
+_engine_lock = threading.Lock()
+_replica_engines: Optional[List] = None
+_replica_turn = itertools.count()
+
+
+def _create_engine(url):
+    # Statement echo is opt-in: logging every query dominates request time
+    return create_engine(
+        url,
+        echo=os.getenv("SQL_ECHO", "0") == "1",
+        query_cache_size=SQL_QUERY_CACHE_SIZE,
+        connect_args=driver_connect_args(url),
+    )
+
+
+def get_engine():
+    """
+    Process-wide engine, created on first use so importing this module does
+    not need DATABASE_URL or a database driver
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine(DATABASE_URL)
+    return _engine
+
+
+def get_replica_engines() -> List:
+    """Engines for DATABASE_REPLICA_URLS (empty when there are no replicas)"""
+    global _replica_engines
+    if _replica_engines is None:
+        with _engine_lock:
+            if _replica_engines is None:
+                _replica_engines = [_create_engine(url) for url in DATABASE_REPLICA_URLS]
+    return _replica_engines
+
+
+def driver_connect_args(url) -> dict:
+    """Driver options for server-side prepared statements, where the driver has them"""
+    # psycopg2 (postgresql://) has no automatic prepare; postgresql+psycopg://
+    # (psycopg 3) does, and the COPY helpers below work with either driver
+    if make_url(url).get_driver_name() == "psycopg":
+        return {"prepare_threshold": int(PG_PREPARE_THRESHOLD) if PG_PREPARE_THRESHOLD else None}
+    return {}
+
+
+def copy_out(cursor, sql: str, file) -> None:
+    """Run ``COPY ... TO STDOUT`` on a raw cursor, writing the bytes to ``file``"""
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2
+        cursor.copy_expert(sql, file)
+        return
+    with cursor.copy(sql) as copy:
+        for data in copy:
+            file.write(bytes(data))
+
+
+def copy_in(cursor, sql: str, file, chunk_size: int = 1 << 20) -> None:
+    """Run ``COPY ... FROM STDIN`` on a raw cursor, reading the data from ``file``"""
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2
+        cursor.copy_expert(sql, file, size=chunk_size)
+        return
+    with cursor.copy(sql) as copy:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            copy.write(data)
+
+
+def __getattr__(name):
+    # `from database import engine` keeps working for scripts
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazyEngineSession(Session):
+    """Session that binds to the process-wide engine when it first needs a connection"""
+
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
+
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessions are request-scoped and closed right after the response is built, so
+# keeping attributes loaded after commit is safe and avoids a refresh SELECT
+SessionLocal = sessionmaker(class_=LazyEngineSession, autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+def prepare_schema(engine, mode: str = SCHEMA_MODE):
+    """Create or verify the ORM tables according to ``mode`` (create|check|skip)"""
+    from models import Base
+
+    if mode == "skip":
+        return
+    if mode == "create":
+        Base.metadata.create_all(bind=engine)
+        return
+    if mode != "check":
+        raise ValueError(f"Unknown SCHEMA_MODE {mode!r} (expected create, check or skip)")
+
+    inspector = inspect(engine)
+    problems = []
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            problems.append(f"missing table {table.name}")
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems.extend(
+            f"missing column {table.name}.{column.name}"
+            for column in table.columns if column.name not in existing_columns
+        )
+    if problems:
+        raise RuntimeError("Database schema is out of date: " + ", ".join(problems))
+
 
 # Dependency to get DB session
 def get_db():
@@ -24,3 +161,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def note_user_write(user_id: int):
+    """Keep the user's reads on the primary until replicas have caught up with this write"""
+    if DATABASE_REPLICA_URLS:
+        from cache import set_flag
+        set_flag(f"primary:user:{user_id}", READ_YOUR_WRITES_SECONDS)
+
+
+def reads_pinned_to_primary(user_id: Optional[int]) -> bool:
+    if user_id is None:
+        return False
+    from cache import has_flag
+    return has_flag(f"primary:user:{user_id}")
+
+
+def replica_session() -> Session:
+    """Session on the next read replica in turn, or on the primary when there are none"""
+    replicas = get_replica_engines()
+    if replicas:
+        return SessionLocal(bind=replicas[next(_replica_turn) % len(replicas)])
+    return SessionLocal()
+
+
+# Dependency for read-only endpoints: a replica session, round-robin, unless
+# there are no replicas or the requesting user wrote something moments ago.
+# FastAPI fills user_id from the endpoint's path or query parameter of that name.
+def get_read_db(user_id: Optional[int] = None):
+    if get_replica_engines() and not reads_pinned_to_primary(user_id):
+        db = replica_session()
+    else:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
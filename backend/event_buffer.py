@@ -0,0 +1,248 @@
+"""
+Write-behind buffer for high-volume impression events.
+
+'shown' and 'viewed' interactions are not worth a synchronous INSERT and
+COMMIT each. ``POST /api/impressions`` puts them on a bounded asyncio queue
+instead, and a background task writes them in one multi-row INSERT whenever
+IMPRESSION_FLUSH_EVENTS events are waiting or IMPRESSION_FLUSH_MS has passed
+since the first one arrived. The insert runs in a worker thread so the event
+loop keeps serving requests.
+
+Backpressure: when the database falls behind the queue fills up, and callers
+wait up to IMPRESSION_ENQUEUE_TIMEOUT_MS for room for their whole batch
+before being refused (the endpoint answers 503 so clients can retry). A batch
+is queued all at once or not at all, so a retried batch is never written twice. A batch that fails to write
+(database down, timeout, pool exhausted) is retried with exponential backoff
+capped at IMPRESSION_RETRY_MAX_MS, and nothing else is taken off the queue
+meanwhile, so an unavailable database turns into 503s rather than silent
+loss. Only after IMPRESSION_FLUSH_RETRIES failed retries is the batch
+dropped and counted on /metrics. On shutdown the queue is
+drained and flushed before the process exits. Events still buffered if the
+process is killed are lost, which is acceptable for impressions; swipes keep
+the synchronous ``POST /api/swipes`` path.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from metrics import Counter, Gauge, Histogram, REGISTRY
+from models import UserJobListing
+
+logger = logging.getLogger(__name__)
+
+IMPRESSION_TYPES = ("shown", "viewed")
+FLUSH_EVENTS = int(os.getenv("IMPRESSION_FLUSH_EVENTS", "500"))
+FLUSH_MS = float(os.getenv("IMPRESSION_FLUSH_MS", "250"))
+QUEUE_SIZE = int(os.getenv("IMPRESSION_QUEUE_SIZE", "20000"))
+ENQUEUE_TIMEOUT_MS = float(os.getenv("IMPRESSION_ENQUEUE_TIMEOUT_MS", "100"))
+FLUSH_RETRIES = int(os.getenv("IMPRESSION_FLUSH_RETRIES", "8"))
+RETRY_INITIAL_MS = float(os.getenv("IMPRESSION_RETRY_INITIAL_MS", "100"))
+RETRY_MAX_MS = float(os.getenv("IMPRESSION_RETRY_MAX_MS", "5000"))
+
+EVENTS = Counter("impression_events_total", "Impression events by outcome", ("outcome",))
+FLUSH_SECONDS = Histogram("impression_flush_duration_seconds", "Time to bulk insert one impression batch", ())
+FLUSH_SIZE = Histogram(
+    "impression_flush_events", "Events per impression flush", (), (1, 10, 50, 100, 250, 500, 1000, 5000))
+FLUSH_FAILURES = Counter("impression_flush_failures_total", "Impression batch writes that failed and were retried", ())
+
+
+class BufferFull(Exception):
+    """No queue space became available within the enqueue timeout"""
+
+
+class ImpressionBuffer:
+    """Bounded queue of interaction rows flushed by a background task"""
+
+    def __init__(self, session_factory, flush_events: int = FLUSH_EVENTS, flush_ms: float = FLUSH_MS,
+                 queue_size: int = QUEUE_SIZE, enqueue_timeout_ms: float = ENQUEUE_TIMEOUT_MS,
+                 flush_retries: int = FLUSH_RETRIES, retry_initial_ms: float = RETRY_INITIAL_MS,
+                 retry_max_ms: float = RETRY_MAX_MS):
+        self.session_factory = session_factory
+        self.flush_events = flush_events
+        self.flush_seconds = flush_ms / 1000
+        self.queue_size = queue_size
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.flush_retries = flush_retries
+        self.retry_initial = retry_initial_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        # Set by the flush task whenever it takes events off the queue
+        self._space: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Start the flush task on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._space = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def put_many(self, rows: List[dict]):
+        """
+        Enqueue all rows or none, waiting up to the enqueue timeout for the
+        queue to have room for the whole batch. Raises BufferFull if it does not.
+        """
+        if not self.running:
+            raise BufferFull("Impression buffer is not running")
+        deadline = time.monotonic() + self.enqueue_timeout
+        while self.queue_size - self._queue.qsize() < len(rows):
+            remaining = deadline - time.monotonic()
+            if len(rows) > self.queue_size or remaining <= 0:
+                EVENTS.inc(("rejected",), len(rows))
+                raise BufferFull(f"Impression buffer full ({self.queue_size} events)")
+            self._space.clear()
+            try:
+                await asyncio.wait_for(self._space.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        # No await from the size check to here, so the whole batch fits
+        for row in rows:
+            self._queue.put_nowait(row)
+        EVENTS.inc(("buffered",), len(rows))
+
+    async def stop(self):
+        """Stop accepting events, flush everything queued and wait for the task"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+            elif self._closing and self._queue.empty():
+                return
+
+    async def _collect(self) -> List[dict]:
+        """Wait for the first event, then gather until the size or time limit"""
+        try:
+            first = await asyncio.wait_for(self._queue.get(), self.flush_seconds)
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.flush_events:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._closing:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        self._space.set()
+        return batch
+
+    async def _flush(self, batch: List[dict]):
+        """Write a batch, retrying with capped backoff while the database fails"""
+        delay = self.retry_initial
+        for attempt in range(self.flush_retries + 1):
+            if await asyncio.to_thread(self._write, batch):
+                return
+            if attempt < self.flush_retries:
+                FLUSH_FAILURES.inc(())
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+        EVENTS.inc(("dropped",), len(batch))
+        logger.error("Dropped %d impression events after %d retries", len(batch), self.flush_retries)
+
+    def _write(self, batch: List[dict]) -> bool:
+        """
+        One attempt at writing a batch; False when it should be retried.
+        Rows written before a failure are removed from ``batch``.
+        """
+        start = time.perf_counter()
+        size = len(batch)
+        db = self.session_factory()
+        try:
+            try:
+                db.execute(insert(UserJobListing), batch)
+                db.commit()
+                EVENTS.inc(("written",), len(batch))
+                batch.clear()
+            except IntegrityError:
+                # One bad row (e.g. unknown job id) must not lose the whole batch
+                db.rollback()
+                self._write_rows(db, batch)
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to write %d impression events", len(batch))
+            return False
+        finally:
+            db.close()
+        FLUSH_SECONDS.observe((), time.perf_counter() - start)
+        FLUSH_SIZE.observe((), size)
+        return True
+
+    def _write_rows(self, db, batch: List[dict]):
+        while batch:
+            try:
+                db.execute(insert(UserJobListing), [batch[0]])
+                db.commit()
+                EVENTS.inc(("written",))
+            except IntegrityError:
+                db.rollback()
+                EVENTS.inc(("dropped",))
+                logger.warning("Dropped invalid impression event %s", batch[0])
+            del batch[0]
+
+
+def impression_row(event, received_at: Optional[datetime] = None) -> dict:
+    """user_job_listing row for an impression, stamped when it was received rather than written"""
+    return {
+        "user_id": event.user_id,
+        "job_listing_id": event.job_listing_id,
+        "interaction_type": event.interaction_type,
+        "position_in_deck": event.position_in_deck,
+        "session_id": event.session_id,
+        "time_spent_viewing": event.time_spent_viewing,
+        "created_at": received_at or datetime.utcnow(),
+    }
+
+
+_buffer: Optional[ImpressionBuffer] = None
+
+
+def get_buffer() -> Optional[ImpressionBuffer]:
+    return _buffer
+
+
+async def start_buffer(session_factory) -> ImpressionBuffer:
+    global _buffer
+    _buffer = ImpressionBuffer(session_factory)
+    await _buffer.start()
+    return _buffer
+
+
+async def stop_buffer():
+    global _buffer
+    if _buffer is not None:
+        await _buffer.stop()
+        _buffer = None
+
+
+QUEUE_DEPTH = Gauge(
+    "impression_queue_depth", "Impression events waiting to be written", (),
+    callback=lambda: {(): _buffer.depth() if _buffer is not None else 0})
+REGISTRY.extend([EVENTS, FLUSH_SECONDS, FLUSH_SIZE, FLUSH_FAILURES, QUEUE_DEPTH])
@@ -0,0 +1,174 @@
+"""
+Streaming export of swipe/interaction logs for analytics.
+
+Rows of ``user_job_listing`` joined with the job features analysts usually
+need are read through a server-side cursor (``stream_results`` +
+``yield_per``) and written out incrementally, so memory stays constant no
+matter how many events are exported. Bulk pulls go through the command line,
+which also supports Parquet:
+
+    python exports.py --format csv --start 2026-01-01 --end 2026-02-01 > january.csv
+    python exports.py --format parquet --output interactions.parquet
+
+``GET /api/exports/interactions`` streams NDJSON or CSV too, but only with
+EXPORTS_ENABLED=1 and a read replica configured: an export holds a connection
+and a server-side cursor for its whole run, which must not come out of the
+primary's pool that serves the API.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import JobListing, UserJobListing
+
+EXPORTS_ENABLED = os.getenv("EXPORTS_ENABLED", "0") == "1"
+
+EXPORT_COLUMNS = [
+    UserJobListing.id.label("interaction_id"),
+    UserJobListing.user_id,
+    UserJobListing.job_listing_id,
+    UserJobListing.created_at,
+    UserJobListing.interaction_type,
+    UserJobListing.swipe_direction,
+    UserJobListing.position_in_deck,
+    UserJobListing.session_id,
+    UserJobListing.aspect_swiped,
+    UserJobListing.time_spent_viewing,
+    JobListing.industry.label("job_industry"),
+    JobListing.occupation_code.label("job_occupation_code"),
+    JobListing.state.label("job_state"),
+    JobListing.salary_min.label("job_salary_min"),
+    JobListing.remote_work.label("job_remote_work"),
+    JobListing.aoi_overall_badge.label("job_aoi_overall_badge"),
+    JobListing.aoi_score.label("job_aoi_score"),
+]
+FIELD_NAMES = [column.key for column in EXPORT_COLUMNS]
+FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def iter_interactions(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 5000
+) -> Iterator[tuple]:
+    """Yield export rows (in FIELD_NAMES order) with created_at in [start, end)"""
+    statement = select(*EXPORT_COLUMNS).join(
+        JobListing, JobListing.id == UserJobListing.job_listing_id
+    ).order_by(UserJobListing.id)
+    if start is not None:
+        statement = statement.where(UserJobListing.created_at >= start)
+    if end is not None:
+        statement = statement.where(UserJobListing.created_at < end)
+
+    result = db.execute(statement.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions():
+        for row in partition:
+            yield tuple(row)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def to_ndjson(rows) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(FIELD_NAMES, row)), default=_json_default) + "\n"
+
+
+def to_csv(rows, chunk_rows: int = 1000) -> Iterator[str]:
+    """CSV text in chunks of ``chunk_rows`` rows (header first)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELD_NAMES)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(["" if v is None else v.isoformat() if isinstance(v, datetime) else v for v in row])
+        if i % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_parquet(rows, path: str, row_group_size: int = 100000) -> int:
+    """Write rows to a Parquet file one row group at a time (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    count = 0
+    batch = []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pylist([dict(zip(FIELD_NAMES, row)) for row in batch])
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+
+    try:
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= row_group_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def stream_export(session_factory, export_format: str, start=None, end=None) -> Iterator[str]:
+    """
+    Text chunks for an HTTP streaming response. Opens its own session because
+    the response body is produced after the request's dependencies have exited.
+    """
+    db = session_factory()
+    try:
+        rows = iter_interactions(db, start, end)
+        yield from (to_csv(rows) if export_format == "csv" else to_ndjson(rows))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from database import replica_session
+
+    parser = argparse.ArgumentParser(description="Export interaction logs joined with job features")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Inclusive created_at lower bound")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Exclusive created_at upper bound")
+    parser.add_argument("--output", help="Output file (required for parquet, default stdout)")
+    args = parser.parse_args()
+
+    session = replica_session()
+    try:
+        interactions = iter_interactions(session, args.start, args.end)
+        if args.format == "parquet":
+            if not args.output:
+                parser.error("--output is required for parquet")
+            print(f"Wrote {write_parquet(interactions, args.output)} rows to {args.output}", file=sys.stderr)
+        else:
+            out = open(args.output, "w", newline="") if args.output else sys.stdout
+            try:
+                for chunk in (to_csv(interactions) if args.format == "csv" else to_ndjson(interactions)):
+                    out.write(chunk)
+            finally:
+                if args.output:
+                    out.close()
+    finally:
+        session.close()
@@ -0,0 +1,286 @@
+"""
+Versioned on-disk feature store for job vectors.
+
+The ingestion step writes one directory per version under
+data/processed/features/ with a .npy file per feature column plus vocab.json,
+then atomically repoints the CURRENT file at it. API workers open the arrays
+with ``np.load(mmap_mode="r")``, so every uvicorn worker shares the same page
+cache instead of holding its own copy, and a newly published version is
+picked up on the next lookup without a restart.
+
+Columns (row i describes job_ids[i]; rows are sorted by id):
+
+    job_ids        int64
+    latitude       float64 (NaN when unknown)
+    longitude      float64 (NaN when unknown)
+    salary_min     float64 (NaN when unknown)
+    remote         uint8
+    industry_id    int32   index into vocab["industries"], -1 when unknown
+    state_id       int32   index into vocab["states"], -1 when unknown
+    skill_bits     uint64  [n, words] bitset over vocab["skills"] (lowercased)
+    skill_count    int16   number of distinct required skills
+    embeddings     float32 [n, d] L2-normalized (see similarity.py), optional
+
+    python feature_store.py            # build and publish a new version
+    python feature_store.py --keep 3   # ...and prune all but the newest 3
+
+The first version is published by hand. After that, the ingestion scripts
+(init_db.py, synthetic_data.py) publish a new version whenever they write
+jobs, through ``refresh_feature_store``.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import JobListing
+
+STORE_DIR = os.getenv("FEATURE_STORE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "processed", "features")
+CURRENT_FILE = "CURRENT"
+COLUMNS = ("job_ids", "latitude", "longitude", "salary_min", "remote",
+           "industry_id", "state_id", "skill_bits", "skill_count")
+OPTIONAL_COLUMNS = ("embeddings",)
+
+# How often readers stat CURRENT to notice a new version
+RELOAD_CHECK_SECONDS = float(os.getenv("FEATURE_STORE_RELOAD_SECONDS", "5"))
+
+
+class JobFeatures:
+    """Memory-mapped, read-only view of one feature store version"""
+
+    def __init__(self, version: str, path: str):
+        self.version = version
+        self.path = path
+        with open(os.path.join(path, "vocab.json")) as f:
+            self.vocab = json.load(f)
+        self.columns: Dict[str, np.ndarray] = {}
+        for name in COLUMNS + OPTIONAL_COLUMNS:
+            file_path = os.path.join(path, f"{name}.npy")
+            if os.path.exists(file_path):
+                self.columns[name] = np.load(file_path, mmap_mode="r")
+        self.skill_index = {skill: i for i, skill in enumerate(self.vocab["skills"])}
+
+    def __len__(self):
+        return len(self.columns["job_ids"])
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def has_embeddings(self) -> bool:
+        return "embeddings" in self.columns
+
+    def positions(self, job_ids) -> np.ndarray:
+        """Row positions for job ids, skipping ids not in this version"""
+        ids = np.asarray(job_ids, dtype=np.int64)
+        store_ids = self.columns["job_ids"]
+        if not len(ids) or not len(store_ids):
+            return np.empty(0, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(store_ids, ids), len(store_ids) - 1)
+        return pos[store_ids[pos] == ids]
+
+    def skill_bits_for(self, skills) -> np.ndarray:
+        """Bitset (same width as skill_bits rows) for a list of skill names"""
+        bits = np.zeros(self.columns["skill_bits"].shape[1], dtype=np.uint64)
+        for skill in skills or []:
+            i = self.skill_index.get(skill.lower())
+            if i is not None:
+                bits[i // 64] |= np.uint64(1) << np.uint64(i % 64)
+        return bits
+
+
+def _version_path(version: str, store_dir: str = STORE_DIR) -> str:
+    return os.path.join(store_dir, version)
+
+
+def current_version(store_dir: str = STORE_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(version: str, store_dir: str = STORE_DIR):
+    """Atomically point CURRENT at ``version``"""
+    tmp_path = os.path.join(store_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(store_dir, CURRENT_FILE))
+
+
+def build_feature_store(db: Session, store_dir: str = STORE_DIR, with_embeddings: bool = True,
+                        batch_size: int = 10000) -> str:
+    """Stream job listings into a new feature store version and publish it"""
+    count = db.query(JobListing.id).count()
+
+    job_ids = np.empty(count, dtype=np.int64)
+    latitude = np.full(count, np.nan, dtype=np.float64)
+    longitude = np.full(count, np.nan, dtype=np.float64)
+    salary_min = np.full(count, np.nan, dtype=np.float64)
+    remote = np.zeros(count, dtype=np.uint8)
+    industry_id = np.full(count, -1, dtype=np.int32)
+    state_id = np.full(count, -1, dtype=np.int32)
+    skill_count = np.zeros(count, dtype=np.int16)
+    row_skills = []
+
+    industries, states, skills = {}, {}, {}
+    rows = db.query(
+        JobListing.id, JobListing.latitude, JobListing.longitude, JobListing.salary_min,
+        JobListing.remote_work, JobListing.industry, JobListing.state, JobListing.required_skills
+    ).order_by(JobListing.id).yield_per(batch_size)
+
+    n = 0
+    for job_id, lat, lon, salary, is_remote, industry, state, required_skills in rows:
+        if n >= count:
+            break
+        job_ids[n] = job_id
+        if lat is not None and lon is not None:
+            latitude[n], longitude[n] = lat, lon
+        if salary is not None:
+            salary_min[n] = salary
+        remote[n] = bool(is_remote)
+        if industry:
+            industry_id[n] = industries.setdefault(industry, len(industries))
+        if state:
+            state_id[n] = states.setdefault(state.upper(), len(states))
+        indices = {skills.setdefault(s.lower(), len(skills)) for s in (required_skills or [])}
+        skill_count[n] = len(indices)
+        row_skills.append(indices)
+        n += 1
+
+    words = max(1, (len(skills) + 63) // 64)
+    skill_bits = np.zeros((n, words), dtype=np.uint64)
+    for row, indices in enumerate(row_skills):
+        for i in indices:
+            skill_bits[row, i // 64] |= np.uint64(1) << np.uint64(i % 64)
+
+    columns = {
+        "job_ids": job_ids[:n], "latitude": latitude[:n], "longitude": longitude[:n],
+        "salary_min": salary_min[:n], "remote": remote[:n], "industry_id": industry_id[:n],
+        "state_id": state_id[:n], "skill_bits": skill_bits, "skill_count": skill_count[:n],
+    }
+
+    if with_embeddings and n:
+        from similarity import build_index
+
+        index = build_index(db)
+        embeddings = np.zeros((n, index.vectors.shape[1]), dtype=np.float32)
+        pos = np.minimum(np.searchsorted(columns["job_ids"], index.job_ids), n - 1)
+        found = columns["job_ids"][pos] == index.job_ids
+        embeddings[pos[found]] = index.vectors[found]
+        columns["embeddings"] = embeddings
+
+    # Microseconds keep names in build order; the random suffix keeps concurrent builds apart
+    version = datetime.now().strftime("v%Y%m%dT%H%M%S%f") + "-" + uuid.uuid4().hex[:6]
+    staging = _version_path(version + ".staging", store_dir)
+    os.makedirs(staging, exist_ok=True)
+    for name, array in columns.items():
+        np.save(os.path.join(staging, f"{name}.npy"), array)
+    with open(os.path.join(staging, "vocab.json"), "w") as f:
+        json.dump({"industries": list(industries), "states": list(states), "skills": list(skills)}, f)
+
+    os.replace(staging, _version_path(version, store_dir))
+    publish(version, store_dir)
+    return version
+
+
+def refresh_feature_store(db: Session, store_dir: str = STORE_DIR) -> Optional[str]:
+    """Publish a new version after jobs were written, if a store has been published before"""
+    if current_version(store_dir) is None:
+        return None
+    return build_feature_store(db, store_dir)
+
+
+def prune(keep: int = 2, store_dir: str = STORE_DIR):
+    """Delete all but the newest ``keep`` versions (never the current one)"""
+    current = current_version(store_dir)
+    versions = sorted(
+        (d for d in os.listdir(store_dir)
+         if d.startswith("v") and not d.endswith(".staging") and os.path.isdir(_version_path(d, store_dir))),
+        reverse=True,
+    )
+    for version in versions[keep:]:
+        if version != current:
+            shutil.rmtree(_version_path(version, store_dir), ignore_errors=True)
+
+
+# Open versions and last CURRENT check time, per store directory
+_features: Dict[str, Optional[JobFeatures]] = {}
+_checked_at: Dict[str, float] = {}
+# Versions opened by name (get_version), newest last
+_pinned: Dict[Tuple[str, str], JobFeatures] = {}
+PINNED_VERSIONS = 2
+_lock = threading.Lock()
+
+
+def get_features(store_dir: str = STORE_DIR) -> Optional[JobFeatures]:
+    """Current feature store version, remapped when a new one is published"""
+    now = time.monotonic()
+    features = _features.get(store_dir)
+    if features is not None and now - _checked_at.get(store_dir, 0.0) < RELOAD_CHECK_SECONDS:
+        return features
+
+    with _lock:
+        _checked_at[store_dir] = now
+        version = current_version(store_dir)
+        features = _features.get(store_dir)
+        if version is None:
+            features = None
+        elif features is None or features.version != version:
+            features = JobFeatures(version, _version_path(version, store_dir))
+        _features[store_dir] = features
+    return features
+
+
+def get_version(version: str, store_dir: str = STORE_DIR) -> Optional[JobFeatures]:
+    """
+    A specific version regardless of CURRENT, e.g. the one a request started
+    scoring against. Versions are immutable once published; None if pruned.
+    """
+    features = _features.get(store_dir)
+    if features is not None and features.version == version:
+        return features
+    with _lock:
+        features = _pinned.get((store_dir, version))
+        if features is None:
+            path = _version_path(version, store_dir)
+            if not os.path.exists(os.path.join(path, "vocab.json")):
+                return None
+            features = JobFeatures(version, path)
+            _pinned[(store_dir, version)] = features
+            while len(_pinned) > PINNED_VERSIONS:
+                del _pinned[next(iter(_pinned))]
+        return features
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Build and publish a job feature store version")
+    parser.add_argument("--no-embeddings", action="store_true", help="Skip the TF-IDF/SVD embedding column")
+    parser.add_argument("--keep", type=int, default=2, help="Versions to keep on disk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    session = SessionLocal()
+    try:
+        published = build_feature_store(session, with_embeddings=not args.no_embeddings)
+    finally:
+        session.close()
+    prune(args.keep)
+    print(f"Published feature store {published} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,437 @@
+"""
+Offline geocoding of free-text US locations.
+
+Locations such as "Saint Paul, MN", "St. Paul, Minnesota 55101" or "60601"
+are resolved against a gazetteer CSV (ZIP codes, cities and state
+centroids), loaded once into dictionaries. Lookups try the ZIP code first,
+then "city, state", then a city name that exists in only one state, and
+finally the state centroid. Results are cached per input string, so
+geocoding every user and job costs a few dictionary probes and no network
+call. How close a match is depends on the gazetteer: only ZIP codes and
+cities in it resolve below state level, so deployments must build the full
+Census-derived file (see below).
+
+State-level matches are too coarse for distance scoring, so the fill_*
+helpers only store coordinates from ZIP or city matches.
+
+The resolver reads GAZETTEER_PATH (data/processed/us_gazetteer_full.csv
+unless set), built from the Census Bureau Gazetteer place and ZCTA national
+files plus every geocoded job in the database:
+
+    python geocoder.py download                 # fetch and verify the Census files
+    python geocoder.py build --census-year 2023 --from-database
+    python geocoder.py backfill                 # fill missing user/job coordinates
+
+``download`` checks each archive against data/raw/census_gazetteer.sha256
+(sha256sum format). An archive without an entry has its checksum recorded
+there; commit the manifest so later downloads must match it.
+
+data/processed/us_gazetteer.csv is only a sample (state centroids and the
+metros synthetic_data.py places its listings in) for development and tests.
+It is used, with a warning, when GAZETTEER_PATH does not exist.
+"""
+import csv
+import hashlib
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH") or os.path.join(DATA_DIR, "processed", "us_gazetteer_full.csv")
+SAMPLE_GAZETTEER_PATH = os.path.join(DATA_DIR, "processed", "us_gazetteer.csv")
+RAW_DIR = os.path.join(DATA_DIR, "raw")
+CENSUS_CHECKSUMS_PATH = os.path.join(RAW_DIR, "census_gazetteer.sha256")
+CENSUS_GAZETTEER_YEAR = os.getenv("CENSUS_GAZETTEER_YEAR", "2023")
+CENSUS_GAZETTEER_URL = os.getenv(
+    "CENSUS_GAZETTEER_URL",
+    "https://www2.census.gov/geo/docs/maps-data/data/gazetteer/{year}_Gazetteer/{name}.zip")
+GAZETTEER_COLUMNS = ["kind", "key", "latitude", "longitude"]
+PRECISION_RANK = {"state": 0, "city": 1, "zip": 2}
+CACHE_SIZE = int(os.getenv("GEOCODER_CACHE_SIZE", "100000"))
+
+# (code, name, latitude, longitude)
+STATES = [
+    ("AL", "Alabama", 32.8067, -86.7911), ("AK", "Alaska", 61.3707, -152.4044),
+    ("AZ", "Arizona", 33.7298, -111.4312), ("AR", "Arkansas", 34.9697, -92.3731),
+    ("CA", "California", 36.1162, -119.6816), ("CO", "Colorado", 39.0598, -105.3111),
+    ("CT", "Connecticut", 41.5978, -72.7554), ("DE", "Delaware", 39.3185, -75.5071),
+    ("DC", "District of Columbia", 38.8974, -77.0268), ("FL", "Florida", 27.7663, -81.6868),
+    ("GA", "Georgia", 33.0406, -83.6431), ("HI", "Hawaii", 21.0943, -157.4983),
+    ("ID", "Idaho", 44.2405, -114.4788), ("IL", "Illinois", 40.3495, -88.9861),
+    ("IN", "Indiana", 39.8494, -86.2583), ("IA", "Iowa", 42.0115, -93.2105),
+    ("KS", "Kansas", 38.5266, -96.7265), ("KY", "Kentucky", 37.6681, -84.6701),
+    ("LA", "Louisiana", 31.1695, -91.8678), ("ME", "Maine", 44.6939, -69.3819),
+    ("MD", "Maryland", 39.0639, -76.8021), ("MA", "Massachusetts", 42.2302, -71.5301),
+    ("MI", "Michigan", 43.3266, -84.5361), ("MN", "Minnesota", 45.6945, -93.9002),
+    ("MS", "Mississippi", 32.7416, -89.6787), ("MO", "Missouri", 38.4561, -92.2884),
+    ("MT", "Montana", 46.9219, -110.4544), ("NE", "Nebraska", 41.1254, -98.2681),
+    ("NV", "Nevada", 38.3135, -117.0554), ("NH", "New Hampshire", 43.4525, -71.5639),
+    ("NJ", "New Jersey", 40.2989, -74.5210), ("NM", "New Mexico", 34.8405, -106.2485),
+    ("NY", "New York", 42.1657, -74.9481), ("NC", "North Carolina", 35.6301, -79.8064),
+    ("ND", "North Dakota", 47.5289, -99.7840), ("OH", "Ohio", 40.3888, -82.7649),
+    ("OK", "Oklahoma", 35.5653, -96.9289), ("OR", "Oregon", 44.5720, -122.0709),
+    ("PA", "Pennsylvania", 40.5908, -77.2098), ("RI", "Rhode Island", 41.6809, -71.5118),
+    ("SC", "South Carolina", 33.8569, -80.9450), ("SD", "South Dakota", 44.2998, -99.4388),
+    ("TN", "Tennessee", 35.7478, -86.6923), ("TX", "Texas", 31.0545, -97.5635),
+    ("UT", "Utah", 40.1500, -111.8624), ("VT", "Vermont", 44.0459, -72.7107),
+    ("VA", "Virginia", 37.7693, -78.1700), ("WA", "Washington", 47.4009, -121.4905),
+    ("WV", "West Virginia", 38.4912, -80.9545), ("WI", "Wisconsin", 44.2685, -89.6165),
+    ("WY", "Wyoming", 42.7560, -107.3025), ("PR", "Puerto Rico", 18.2208, -66.5901),
+]
+STATE_CODES = {code.lower(): code for code, _, _, _ in STATES}
+STATE_CODES.update({name.lower(): code for code, name, _, _ in STATES})
+
+_ZIP_RE = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+_CENSUS_PLACE_SUFFIX = re.compile(
+    r"\s+(city|town|village|borough|cdp|municipality|city and borough|urban county|"
+    r"consolidated government|metropolitan government|unified government)(\s*\(.*\))?$")
+_NON_LOCATIONS = {"remote", "hybrid", "anywhere", "nationwide", "united states", "usa", "us"}
+
+
+class GeocodeResult(NamedTuple):
+    latitude: float
+    longitude: float
+    precision: str  # 'zip', 'city' or 'state'
+
+
+def normalize_city(name: str) -> str:
+    """Lowercase, drop punctuation and expand 'St.'/'Ft.'/'Mt.' prefixes"""
+    name = re.sub(r"[^a-z0-9 ]+", " ", name.lower())
+    name = re.sub(r"\s+", " ", name).strip()
+    return re.sub(r"^(st|ft|mt) ", lambda m: {"st": "saint ", "ft": "fort ", "mt": "mount "}[m.group(1)], name)
+
+
+def state_code(text: str) -> Optional[str]:
+    return STATE_CODES.get(re.sub(r"[^a-z ]+", "", text.lower()).strip())
+
+
+class Gazetteer:
+    """In-memory ZIP, city and state indexes"""
+
+    def __init__(self):
+        self.zips: Dict[str, Tuple[float, float]] = {}
+        self.cities: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self.states: Dict[str, Tuple[float, float]] = {code: (lat, lon) for code, _, lat, lon in STATES}
+        # City name -> states it exists in, for inputs without a state
+        self.city_states: Dict[str, set] = {}
+
+    def add(self, kind: str, key: str, latitude: float, longitude: float):
+        if kind == "zip":
+            self.zips[key] = (latitude, longitude)
+        elif kind == "city":
+            city, state = key.rsplit("|", 1)
+            self.cities[(city, state)] = (latitude, longitude)
+            self.city_states.setdefault(city, set()).add(state)
+        elif kind == "state":
+            self.states[key] = (latitude, longitude)
+
+    def rows(self) -> Iterable[list]:
+        for code, (lat, lon) in sorted(self.states.items()):
+            yield ["state", code, lat, lon]
+        for (city, state), (lat, lon) in sorted(self.cities.items()):
+            yield ["city", f"{city}|{state}", lat, lon]
+        for zip_code, (lat, lon) in sorted(self.zips.items()):
+            yield ["zip", zip_code, lat, lon]
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        gazetteer = cls()
+        if os.path.exists(path):
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    gazetteer.add(row["kind"], row["key"], float(row["latitude"]), float(row["longitude"]))
+        return gazetteer
+
+    def save(self, path: str = GAZETTEER_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(GAZETTEER_COLUMNS)
+            for kind, key, lat, lon in self.rows():
+                writer.writerow([kind, key, round(lat, 5), round(lon, 5)])
+        os.replace(tmp_path, path)
+
+    def lookup(self, city: Optional[str] = None, state: Optional[str] = None,
+               zip_code: Optional[str] = None) -> Optional[GeocodeResult]:
+        """Most precise match for structured fields"""
+        if zip_code:
+            coords = self.zips.get(zip_code.strip()[:5])
+            if coords:
+                return GeocodeResult(*coords, "zip")
+        code = state_code(state) if state else None
+        if city:
+            name = normalize_city(city)
+            if code:
+                coords = self.cities.get((name, code))
+            else:
+                states = self.city_states.get(name, ())
+                coords = self.cities.get((name, next(iter(states)))) if len(states) == 1 else None
+            if coords:
+                return GeocodeResult(*coords, "city")
+        if code:
+            return GeocodeResult(*self.states[code], "state")
+        return None
+
+    def geocode(self, text: Optional[str]) -> Optional[GeocodeResult]:
+        """Parse and resolve a free-text location such as "Austin, TX 78701" """
+        if not text or normalize_city(text) in _NON_LOCATIONS:
+            return None
+        zip_match = _ZIP_RE.search(text)
+        zip_code = zip_match.group(1) if zip_match else None
+        remainder = _ZIP_RE.sub("", text)
+        # Work-arrangement words are not part of the place ("Remote - Denver, CO")
+        remainder = re.sub(r"(?i)\b(remote|hybrid|on[- ]site)\b", "", remainder)
+        parts = [p.strip(" -/") for p in remainder.split(",") if p.strip(" -/")]
+
+        city = state = None
+        if len(parts) >= 2:
+            city, state = parts[-2], parts[-1]
+            if not state_code(state):
+                city, state = parts[-1], None
+        elif len(parts) == 1:
+            # "Chicago IL", "Minnesota" or a bare city name
+            words = parts[0].split()
+            if len(words) > 1 and state_code(words[-1]):
+                city, state = " ".join(words[:-1]), words[-1]
+            elif state_code(parts[0]):
+                state = parts[0]
+            else:
+                city = parts[0]
+        return self.lookup(city, state, zip_code)
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                if os.path.exists(GAZETTEER_PATH):
+                    _gazetteer = Gazetteer.load(GAZETTEER_PATH)
+                else:
+                    logger.warning(
+                        "Gazetteer %s not found, geocoding against the bundled sample %s, which only "
+                        "covers a few metros; run `python geocoder.py download` and `build`",
+                        GAZETTEER_PATH, SAMPLE_GAZETTEER_PATH)
+                    _gazetteer = Gazetteer.load(SAMPLE_GAZETTEER_PATH)
+    return _gazetteer
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def geocode(text: Optional[str]) -> Optional[GeocodeResult]:
+    """Cached free-text geocoding against the gazetteer"""
+    return get_gazetteer().geocode(text)
+
+
+def _precise_enough(result: Optional[GeocodeResult], min_precision: str) -> bool:
+    return result is not None and PRECISION_RANK[result.precision] >= PRECISION_RANK[min_precision]
+
+
+def fill_user_coordinates(user, min_precision: str = "city") -> bool:
+    """Set a user's missing latitude/longitude from their location text"""
+    if user.latitude is not None and user.longitude is not None:
+        return False
+    result = geocode(user.location)
+    if not _precise_enough(result, min_precision):
+        return False
+    user.latitude, user.longitude = result.latitude, result.longitude
+    return True
+
+
+def fill_job_coordinates(job, min_precision: str = "city") -> bool:
+    """Set a job's missing latitude/longitude from its ZIP, city/state or location text"""
+    if job.latitude is not None and job.longitude is not None:
+        return False
+    result = get_gazetteer().lookup(job.city, job.state, job.zip_code) if (job.city or job.zip_code) else None
+    if not _precise_enough(result, min_precision):
+        result = geocode(job.location)
+    if not _precise_enough(result, min_precision):
+        return False
+    job.latitude, job.longitude = result.latitude, result.longitude
+    return True
+
+
+def build_gazetteer(db=None, census_places: Optional[str] = None,
+                    census_zctas: Optional[str] = None) -> Gazetteer:
+    """Gazetteer from state centroids, Census files and geocoded jobs"""
+    gazetteer = Gazetteer()
+    if census_places:
+        with open(census_places, newline="", encoding="latin-1") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                row = {k.strip(): v for k, v in row.items()}
+                name = _CENSUS_PLACE_SUFFIX.sub("", row["NAME"].lower())
+                gazetteer.add("city", f"{normalize_city(name)}|{row['USPS']}",
+                              float(row["INTPTLAT"]), float(row["INTPTLONG"]))
+    if census_zctas:
+        with open(census_zctas, newline="") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                row = {k.strip(): v for k, v in row.items()}
+                gazetteer.add("zip", row["GEOID"], float(row["INTPTLAT"]), float(row["INTPTLONG"]))
+
+    if db is not None:
+        # Average the coordinates of already-geocoded jobs per ZIP and per city
+        from models import JobListing
+
+        sums: Dict[Tuple[str, str], list] = {}
+        rows = db.query(JobListing.city, JobListing.state, JobListing.zip_code,
+                        JobListing.latitude, JobListing.longitude).filter(
+            JobListing.latitude.isnot(None), JobListing.longitude.isnot(None)
+        ).yield_per(10000)
+        for city, state, zip_code, lat, lon in rows:
+            code = state_code(state) if state else None
+            keys = []
+            if zip_code and zip_code.strip()[:5].isdigit():
+                keys.append(("zip", zip_code.strip()[:5]))
+            if city and code:
+                keys.append(("city", f"{normalize_city(city)}|{code}"))
+            for key in keys:
+                entry = sums.setdefault(key, [0.0, 0.0, 0])
+                entry[0] += lat
+                entry[1] += lon
+                entry[2] += 1
+        for (kind, key), (lat_sum, lon_sum, count) in sums.items():
+            # Census centroids win over listing averages
+            known = key in gazetteer.zips if kind == "zip" else tuple(key.rsplit("|", 1)) in gazetteer.cities
+            if not known:
+                gazetteer.add(kind, key, lat_sum / count, lon_sum / count)
+    return gazetteer
+
+
+def census_file_names(year: str) -> Tuple[str, str]:
+    """Base names of the Census Gazetteer place and ZCTA national files"""
+    return f"{year}_Gaz_place_national", f"{year}_Gaz_zcta_national"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_checksums(path: str) -> Dict[str, str]:
+    checksums = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    digest, name = line.split(maxsplit=1)
+                    checksums[name.strip().lstrip("*")] = digest
+    return checksums
+
+
+def download_census_files(year: str = CENSUS_GAZETTEER_YEAR, dest: str = RAW_DIR,
+                          checksums_path: str = CENSUS_CHECKSUMS_PATH) -> Tuple[str, str]:
+    """Fetch and unpack the Census place and ZCTA files; returns their paths"""
+    import shutil
+    import urllib.request
+    import zipfile
+
+    os.makedirs(dest, exist_ok=True)
+    checksums = _read_checksums(checksums_path)
+    recorded = False
+    paths = []
+    for name in census_file_names(year):
+        archive = os.path.join(dest, f"{name}.zip")
+        tmp_path = archive + ".tmp"
+        urllib.request.urlretrieve(CENSUS_GAZETTEER_URL.format(year=year, name=name), tmp_path)
+        digest = _sha256(tmp_path)
+        expected = checksums.get(f"{name}.zip")
+        if expected is None:
+            logger.warning("No checksum for %s.zip in %s, recording %s", name, checksums_path, digest)
+            checksums[f"{name}.zip"] = digest
+            recorded = True
+        elif digest != expected:
+            os.remove(tmp_path)
+            raise ValueError(f"Checksum mismatch for {name}.zip: expected {expected}, got {digest}")
+        os.replace(tmp_path, archive)
+
+        path = os.path.join(dest, f"{name}.txt")
+        with zipfile.ZipFile(archive) as zf:
+            member = next(m for m in zf.namelist() if m.endswith(".txt"))
+            with zf.open(member) as src, open(path, "wb") as out:
+                shutil.copyfileobj(src, out)
+        paths.append(path)
+
+    if recorded:
+        with open(checksums_path, "w") as f:
+            for archive_name, digest in sorted(checksums.items()):
+                f.write(f"{digest}  {archive_name}\n")
+    return paths[0], paths[1]
+
+
+def backfill(db, batch_size: int = 1000) -> Tuple[int, int]:
+    """Fill missing coordinates of stored jobs and users; returns (jobs, users) updated"""
+    from models import JobListing, User
+
+    counts = []
+    for model, fill in ((JobListing, fill_job_coordinates), (User, fill_user_coordinates)):
+        updated = 0
+        last_id = 0
+        while True:
+            batch = db.query(model).filter(
+                model.id > last_id, (model.latitude.is_(None)) | (model.longitude.is_(None))
+            ).order_by(model.id).limit(batch_size).all()
+            if not batch:
+                break
+            updated += sum(fill(obj) for obj in batch)
+            last_id = batch[-1].id
+            db.commit()
+        counts.append(updated)
+    if counts[0]:
+        from cache import invalidate_catalog
+        invalidate_catalog()
+    return counts[0], counts[1]
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Build the offline gazetteer or backfill coordinates")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    download_parser = subparsers.add_parser("download", help="Fetch the Census Gazetteer files into data/raw")
+    download_parser.add_argument("--year", default=CENSUS_GAZETTEER_YEAR)
+    build_parser = subparsers.add_parser("build", help="Write the gazetteer to GAZETTEER_PATH")
+    build_parser.add_argument("--from-database", action="store_true", help="Include geocoded job listings")
+    build_parser.add_argument("--census-year", help="Use the files fetched by `download` for this year")
+    build_parser.add_argument("--census-places", help="Census Gazetteer place file (tab-separated)")
+    build_parser.add_argument("--census-zctas", help="Census Gazetteer ZCTA file (tab-separated)")
+    build_parser.add_argument("--output", default=GAZETTEER_PATH)
+    subparsers.add_parser("backfill", help="Fill missing user and job coordinates")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "download":
+        places, zctas = download_census_files(args.year)
+        print(f"Wrote {places} and {zctas}")
+        raise SystemExit(0)
+
+    session = SessionLocal()
+    try:
+        if args.command == "build":
+            if args.census_year:
+                places, zctas = census_file_names(args.census_year)
+                args.census_places = args.census_places or os.path.join(RAW_DIR, f"{places}.txt")
+                args.census_zctas = args.census_zctas or os.path.join(RAW_DIR, f"{zctas}.txt")
+            if not (args.census_places and args.census_zctas):
+                logger.warning("Building without both Census files; most ZIP codes and cities will not resolve")
+            built = build_gazetteer(session if args.from_database else None, args.census_places, args.census_zctas)
+            built.save(args.output)
+            print(f"Wrote {len(built.zips)} ZIP codes, {len(built.cities)} cities and "
+                  f"{len(built.states)} states to {args.output}")
+        else:
+            jobs, users = backfill(session)
+            print(f"Geocoded {jobs} jobs and {users} users")
+    finally:
+        session.close()
@@ -4,6 +4,9 @@ Run this to create tables and optionally seed with sample data
 """
 from database import engine
 from models import Base, JobListing
+from geocoder import fill_job_coordinates
+from cache import invalidate_catalog
+from feature_store import refresh_feature_store
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime, timedelta
 
@@ -1411,11 +1414,14 @@ def seed_sample_data():
         ),
     ]
 
-    # Add to database
+    # Add to database, geocoding listings that came without coordinates
     for job in sample_jobs:
+        fill_job_coordinates(job)
         db.add(job)
 
     db.commit()
+    refresh_feature_store(db)
+    invalidate_catalog()
     print(f"Added {len(sample_jobs)} sample job listings!")
     db.close()
 
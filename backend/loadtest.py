@@ -0,0 +1,234 @@
+"""
+Load test that replays the frontend's swipe sessions against a running API.
+
+Each virtual user walks the same path as frontend/app: onboarding
+(POST /api/users), the results page (GET /api/jobs?user_id=...&limit=50),
+then the explore deck: fetch 20 recommendations, record a 'shown'
+impression per card, swipe after a think time, and refetch when three
+cards are left. Profiles come from synthetic_data.py. Virtual users start
+over with a new profile when their session ends, until the run is over.
+
+Start a server with synthetic data first, then point the driver at it:
+
+    python synthetic_data.py --jobs 100000 --users 1000 --database-url sqlite:///../data/processed/load.db
+    DATABASE_URL=sqlite:///../data/processed/load.db uvicorn main:app --workers 4
+    python loadtest.py --users 200 --duration 300 --ramp-up 60
+
+Reports throughput, p50/p95/p99 latency and error counts per endpoint, and
+connection pool saturation sampled from /metrics; results are saved as JSON
+under data/processed/loadtests/. Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from benchmark import percentiles
+from synthetic_data import generate_users
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "..", "data", "processed", "loadtests")
+
+PROFILE_FIELDS = ("location", "work_location", "industry", "occupation", "skills", "location_importance",
+                  "industry_importance", "salary_importance", "growth_importance", "flexibility_importance")
+DECK_SIZE = 20
+RIGHT_SWIPE_RATE = 0.3
+
+
+class Recorder:
+    """Latency samples and status counts per endpoint"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except Exception as exc:
+            response, status = None, type(exc).__name__
+        self.samples[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint][status] += 1
+        return response if response is not None and response.is_success else None
+
+
+class PoolSampler:
+    """Polls /metrics for db_pool_connections while the test runs"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    async def run(self, client, interval):
+        while True:
+            try:
+                response = await client.get("/metrics")
+                self._parse(response.text)
+            except Exception:
+                pass
+            await asyncio.sleep(interval)
+
+    def _parse(self, text):
+        for line in text.splitlines():
+            if line.startswith("db_pool_connections{"):
+                labels, value = line[len("db_pool_connections{"):].rsplit("} ", 1)
+                parts = dict(item.split("=", 1) for item in labels.split('",') if "=" in item)
+                engine = parts.get("engine", "").strip('"')
+                state = parts.get("state", "").strip('"')
+                self.samples[(engine, state)].append(float(value))
+
+    def summary(self):
+        result = {}
+        for engine in {engine for engine, _ in self.samples}:
+            checked_out = self.samples.get((engine, "checked_out"), [])
+            capacity = max(self.samples.get((engine, "capacity"), [0]))
+            if not checked_out:
+                continue
+            result[engine] = {
+                "capacity": capacity,
+                "checked_out_mean": round(sum(checked_out) / len(checked_out), 2),
+                "checked_out_max": max(checked_out),
+                "saturated_share": round(sum(c >= capacity for c in checked_out) / len(checked_out), 3)
+                if capacity else None,
+            }
+        return result
+
+
+async def think(rng, scale, mean_seconds):
+    """Log-normal pause around ``mean_seconds``, like a person reading a card"""
+    if scale > 0:
+        await asyncio.sleep(rng.lognormvariate(0, 0.5) * mean_seconds * scale)
+
+
+async def session(client, recorder, profile, rng, args):
+    """One user's onboarding, results page and explore loop"""
+    payload = {field: profile[field] for field in PROFILE_FIELDS}
+    response = await recorder.call(client, "POST /api/users", "POST", "/api/users", json=payload)
+    if response is None:
+        return
+    user_id = response.json()["id"]
+    session_id = f"load-{user_id}-{rng.getrandbits(32):08x}"
+
+    await recorder.call(client, "GET /api/jobs", "GET", "/api/jobs", params={"user_id": user_id, "limit": 50})
+    await think(rng, args.think_scale, 5)
+
+    swipes = min(int(rng.expovariate(1 / args.mean_swipes)) + 1, args.max_swipes)
+    deck, index = [], 0
+    for _ in range(swipes):
+        if index >= len(deck) - 3:
+            response = await recorder.call(
+                client, "GET /api/users/{id}/recommendations", "GET",
+                f"/api/users/{user_id}/recommendations", params={"limit": DECK_SIZE})
+            fetched = response.json() if response is not None else []
+            seen = {rec["job"]["id"] for rec in deck[:index]}
+            deck = deck[:index] + [rec for rec in fetched if rec["job"]["id"] not in seen]
+            if index >= len(deck):
+                break
+        job_id = deck[index]["job"]["id"]
+        await recorder.call(client, "POST /api/impressions", "POST", "/api/impressions", json=[{
+            "user_id": user_id, "job_listing_id": job_id, "interaction_type": "shown",
+            "position_in_deck": index, "session_id": session_id,
+        }])
+        await think(rng, args.think_scale, 3)
+        direction = "right" if rng.random() < RIGHT_SWIPE_RATE else "left"
+        await recorder.call(client, "POST /api/swipes", "POST", "/api/swipes", json={
+            "user_id": user_id, "job_listing_id": job_id, "interaction_type": f"swipe_{direction}",
+            "swipe_direction": direction, "position_in_deck": index, "session_id": session_id,
+            "aspect_swiped": "overall",
+        })
+        index += 1
+
+
+async def virtual_user(client, recorder, profiles, rng, deadline, args):
+    while time.monotonic() < deadline:
+        await session(client, recorder, next(profiles), rng, args)
+
+
+async def run(args):
+    import httpx
+
+    recorder = Recorder()
+    sampler = PoolSampler()
+    profiles = generate_users(10 ** 9, seed=args.seed)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        sampler_task = asyncio.create_task(sampler.run(client, args.sample_interval))
+        start = time.monotonic()
+        deadline = start + args.duration
+        tasks = []
+        for i in range(args.users):
+            delay = args.ramp_up * i / args.users
+            rng = random.Random(args.seed * 100003 + i)
+            tasks.append(asyncio.create_task(
+                _delayed(delay, virtual_user(client, recorder, profiles, rng, deadline, args))))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+        sampler_task.cancel()
+
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        statuses = dict(recorder.statuses[endpoint])
+        errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+        endpoints[endpoint] = {
+            **percentiles(samples),
+            "requests_per_sec": round(len(samples) / elapsed, 2),
+            "errors": errors,
+            "statuses": statuses,
+        }
+    total = sum(len(samples) for samples in recorder.samples.values())
+    return {
+        "elapsed_sec": round(elapsed, 1),
+        "requests": total,
+        "requests_per_sec": round(total / elapsed, 2),
+        "endpoints": endpoints,
+        "db_pool": sampler.summary(),
+    }
+
+
+async def _delayed(delay, coro):
+    await asyncio.sleep(delay)
+    await coro
+
+
+def report(results):
+    print(f"{results['requests']} requests in {results['elapsed_sec']}s ({results['requests_per_sec']} req/s)")
+    print(f"{'endpoint':40} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for endpoint, stats in results["endpoints"].items():
+        print(f"{endpoint:40} {stats['requests_per_sec']:8.2f} {stats['p50_ms']:8.1f}ms "
+              f"{stats['p95_ms']:8.1f}ms {stats['p99_ms']:8.1f}ms {stats['errors']:7d}")
+    for engine, pool in results["db_pool"].items():
+        print(f"pool {engine}: {pool['checked_out_mean']} mean / {pool['checked_out_max']} max checked out "
+              f"of {pool['capacity']}, saturated {pool['saturated_share']:.0%} of samples"
+              if pool["saturated_share"] is not None else f"pool {engine}: {pool}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay frontend swipe sessions against a running API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds to keep starting sessions")
+    parser.add_argument("--ramp-up", type=float, default=30, help="Seconds over which users are started")
+    parser.add_argument("--think-scale", type=float, default=1.0,
+                        help="Multiplier on think times (0 for a closed-loop stress test)")
+    parser.add_argument("--mean-swipes", type=float, default=25, help="Mean swipes per session")
+    parser.add_argument("--max-swipes", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between /metrics samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: data/processed/loadtests/<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    results.update({"timestamp": datetime.utcnow().isoformat(), "config": vars(args)})
+    report(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
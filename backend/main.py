@@ -1,17 +1,101 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from views import router
-from database import engine
-from models import Base
+from database import SessionLocal, get_engine, get_replica_engines, prepare_schema, SCHEMA_MODE
+from metrics import Gauge, MetricsMiddleware, REGISTRY, instrument_engine, render_metrics
+from query_guard import install_lazy_load_guard
+from event_buffer import start_buffer, stop_buffer
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+STARTUP_SECONDS = Gauge("app_startup_duration_seconds", "Time spent in each startup phase", ("phase",))
+REGISTRY.append(STARTUP_SECONDS)
+
+
+# Cache warm-up steps. Each imports its (NumPy/scikit-learn backed) module
+# only when it runs, so importing the app stays cheap.
+def warm_ranker():
+    """Load the learned ranking model once, if one has been trained"""
+    from ranking_model import load_model
+    load_model()
+
+
+def warm_feature_store():
+    """Memory-map the current feature store version"""
+    from feature_store import get_features
+    get_features()
+
+
+def warm_similarity_index():
+    """Load the job embedding index, building it if there is none yet"""
+    from similarity import ensure_index
+    db = SessionLocal()
+    try:
+        ensure_index(db)
+    finally:
+        db.close()
+
+
+WARMUP_STEPS = {
+    "ranker": warm_ranker,
+    "feature_store": warm_feature_store,
+    "similarity_index": warm_similarity_index,
+}
+
+
+async def _timed_step(phase, func, required=True):
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(func)
+    except Exception:
+        if required:
+            raise
+        # A cold cache only slows the first request down; keep starting
+        logger.exception("Startup step %s failed", phase)
+    finally:
+        STARTUP_SECONDS.set((phase,), time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Schema check and cache warm-up once per worker, then drain on shutdown"""
+    start = time.perf_counter()
+    engine = get_engine()
+    for instrumented in [engine, *get_replica_engines()]:
+        instrument_engine(instrumented)
+    await _timed_step("schema", lambda: prepare_schema(engine, SCHEMA_MODE))
+    if STARTUP_WARMUP:
+        await asyncio.gather(*(
+            _timed_step(f"warm_{name}", step, required=False) for name, step in WARMUP_STEPS.items()
+        ))
+    await start_buffer(SessionLocal)
+    elapsed = time.perf_counter() - start
+    STARTUP_SECONDS.set(("total",), elapsed)
+    logger.info("Startup finished in %.2fs", elapsed)
+
+    yield
+
+    await stop_buffer()
+    # Only a worker that scored a large catalog has a process pool to stop
+    if "scoring_pool" in sys.modules:
+        await asyncio.to_thread(sys.modules["scoring_pool"].shutdown_pool)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Create FastAPI app
 app = FastAPI(
     title="CareerVillage AOI Datathon API",
     description="REST API for job exploration and matching platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend access
@@ -23,6 +107,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing, SQL counts and opt-in profiling (the engine is instrumented
+# when it is created, in lifespan)
+install_lazy_load_guard(SessionLocal)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(router, prefix="/api", tags=["api"])
 
@@ -41,3 +130,9 @@ def root():
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics endpoint"""
+    return render_metrics()
@@ -0,0 +1,348 @@
+"""
+Request instrumentation exposed in Prometheus text format at /metrics.
+
+Records per-route latency histograms, SQL statement counts and time per
+request (via SQLAlchemy cursor events), and time spent in hot functions
+such as calculate_job_match_score. Individual requests can be profiled by
+sending an ``X-Profile: cprofile`` (or ``pyinstrument``) header when
+ENABLE_PROFILING=1; the profile replaces the response body.
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS, CACHING_DISABLED, NO_CACHE_KEY, NO_DIALECT_SUPPORT
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+
+PROFILING_ENABLED = os.getenv("ENABLE_PROFILING", "0") == "1"
+PROFILE_HEADER = "x-profile"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                base = _format_labels(self.label_names, labels)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_join_labels(base, _le(bound))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_join_labels(base, _le('+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{{{base}}} {total}" if base else f"{self.name}_sum {total}")
+                lines.append(f"{self.name}_count{{{base}}} {count}" if base else f"{self.name}_count {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                base = _format_labels(self.label_names, labels)
+                lines.append(f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Point-in-time value keyed by a tuple of label values. ``callback``, if
+    given, returns {labels: value} and is read at render time.
+    """
+
+    def __init__(self, name, help_text, label_names, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+        if self.callback is not None:
+            values.update(self.callback())
+        for labels, value in sorted(values.items()):
+            base = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}")
+        return lines
+
+
+def _format_labels(names, values):
+    return ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+
+
+def _le(bound):
+    return 'le="%s"' % bound
+
+
+def _join_labels(base, extra):
+    return "{" + (f"{base},{extra}" if base else extra) + "}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request", ("route",), STATEMENT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request", ("route",))
+REQUEST_LAZY_LOADS = Counter(
+    "http_request_lazy_loads_total", "ORM relationship lazy loads (counted when LAZY_LOAD_GUARD is on)", ("route",))
+SQL_STATEMENTS = Counter("sql_statements_total", "SQL statements executed", ())
+SQL_SECONDS = Counter("sql_duration_seconds_total", "Time spent executing SQL", ())
+SQL_COMPILED_CACHE = Counter(
+    "sql_compiled_cache_total", "Statements by SQLAlchemy compiled cache outcome", ("result",))
+FUNCTION_CALLS = Counter("function_calls_total", "Calls to instrumented hot functions", ("route", "function"))
+FUNCTION_SECONDS = Counter(
+    "function_duration_seconds_total", "Time spent in instrumented hot functions", ("route", "function"))
+
+REGISTRY = [REQUEST_LATENCY, REQUEST_SQL_STATEMENTS, REQUEST_SQL_SECONDS, REQUEST_LAZY_LOADS,
+            SQL_STATEMENTS, SQL_SECONDS, SQL_COMPILED_CACHE, FUNCTION_CALLS, FUNCTION_SECONDS]
+
+_CACHE_RESULTS = {
+    CACHE_HIT: "hit", CACHE_MISS: "miss", CACHING_DISABLED: "disabled",
+    NO_CACHE_KEY: "no_cache_key", NO_DIALECT_SUPPORT: "no_dialect_support",
+}
+
+
+class RequestStats:
+    """Mutable per-request accumulator shared through a context variable"""
+    __slots__ = ("statements", "sql_seconds", "lazy_loads", "functions", "profiler", "profile_output")
+
+    def __init__(self, profiler=None):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.lazy_loads = 0
+        self.functions = {}
+        self.profiler = profiler
+        self.profile_output = None
+
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request_stats():
+    """Stats for the request being handled, or None outside a request"""
+    return _request_stats.get()
+
+
+@contextmanager
+def timed_section(name):
+    """Accumulate the wall time of a block under ``name``, like ``timed`` for a function"""
+    stats = _request_stats.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = stats.functions.get(name)
+        if entry is None:
+            entry = stats.functions[name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+
+
+def timed(name):
+    """Decorator accumulating call count and wall time of a hot function per request"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed_section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_instrumented_engines = weakref.WeakSet()
+
+
+def _pool_states():
+    """Connection pool occupancy of every instrumented engine, read at scrape time"""
+    values = {}
+    for engine in list(_instrumented_engines):
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue  # e.g. NullPool / StaticPool keep no pool to saturate
+        name = engine.url.render_as_string(hide_password=True)
+        size = pool.size()
+        values[(name, "size")] = size
+        values[(name, "capacity")] = size + max(getattr(pool, "_max_overflow", 0), 0)
+        values[(name, "checked_out")] = pool.checkedout()
+        values[(name, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+DB_POOL = Gauge("db_pool_connections", "Database connection pool occupancy", ("engine", "state"), callback=_pool_states)
+REGISTRY.append(DB_POOL)
+
+
+def instrument_engine(engine):
+    """Count and time every statement executed through ``engine`` (once per engine)"""
+    if engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        SQL_STATEMENTS.inc(())
+        SQL_SECONDS.inc((), elapsed)
+        # Driver-level SQL (exec_driver_sql) never goes through the compiled cache
+        cache_result = _CACHE_RESULTS.get(getattr(context, "cache_hit", None))
+        if cache_result is not None:
+            SQL_COMPILED_CACHE.inc((cache_result,))
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+
+
+def _run_profiled(stats, func, args, kwargs):
+    if stats.profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.stop()
+            stats.profile_output = profiler.output_text(unicode=True)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        stats.profile_output = out.getvalue()
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute whose endpoint can be profiled on request.
+
+    Sync endpoints run in a threadpool worker, so the profiler has to be
+    started inside the endpoint call rather than in the middleware.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        @wraps(endpoint)
+        def profiled_endpoint(*args, **kw):
+            stats = _request_stats.get()
+            if stats is None or stats.profiler is None:
+                return endpoint(*args, **kw)
+            return _run_profiled(stats, endpoint, args, kw)
+
+        if PROFILING_ENABLED and not asyncio.iscoroutinefunction(endpoint):
+            super().__init__(path, profiled_endpoint, **kwargs)
+        else:
+            super().__init__(path, endpoint, **kwargs)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Times each request and folds its SQL and hot-function stats into the registry"""
+
+    async def dispatch(self, request, call_next):
+        profiler = None
+        if PROFILING_ENABLED:
+            requested = request.headers.get(PROFILE_HEADER, "").lower()
+            if requested in ("1", "true", "cprofile"):
+                profiler = "cprofile"
+            elif requested == "pyinstrument":
+                profiler = "pyinstrument"
+
+        stats = RequestStats(profiler)
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _request_stats.reset(token)
+        elapsed = time.perf_counter() - start
+
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.observe((request.method, route_path, str(response.status_code)), elapsed)
+        REQUEST_SQL_STATEMENTS.observe((route_path,), stats.statements)
+        REQUEST_SQL_SECONDS.observe((route_path,), stats.sql_seconds)
+        if stats.lazy_loads:
+            REQUEST_LAZY_LOADS.inc((route_path,), stats.lazy_loads)
+        for name, (calls, seconds) in stats.functions.items():
+            FUNCTION_CALLS.inc((route_path, name), calls)
+            FUNCTION_SECONDS.inc((route_path, name), seconds)
+
+        if stats.profile_output is not None:
+            return PlainTextResponse(stats.profile_output)
+
+        response.headers["Server-Timing"] = (
+            f"app;dur={elapsed * 1000:.1f}, db;dur={stats.sql_seconds * 1000:.1f};desc=\"{stats.statements} queries\""
+        )
+        return response
+
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,14 +1,17 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, Text, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
+from aoi import aoi_score_for
+
 Base = declarative_base()
 
 
 class User(Base):
     """User model with preferences collected during onboarding"""
     __tablename__ = "user"
+    __mapper_args__ = {"eager_defaults": True}  # fetch generated values via RETURNING on INSERT
 
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -46,6 +49,7 @@ class User(Base):
 class JobListing(Base):
     """Job listing from National Labor Exchange mapped to AOI data"""
     __tablename__ = "job_listing"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -84,6 +88,8 @@ class JobListing(Base):
     aoi_interal_promption_rate = Column(Float, nullable=True)
     aoi_external_promotion_rate = Column(Float, nullable=True)
     aoi_retention_rate_3yr = Column(Float, nullable=True)
+    # Composite 0-5 score derived from the badges and rates above (see aoi.py)
+    aoi_score = Column(Float, nullable=True, index=True)
     
     # Additional metadata
     remote_work = Column(Boolean, default=False)
@@ -98,16 +104,33 @@ class JobListing(Base):
     user_interactions = relationship("UserJobListing", back_populates="job_listing")
 
 
+@event.listens_for(JobListing, "before_insert")
+@event.listens_for(JobListing, "before_update")
+def _set_aoi_score(mapper, connection, job):
+    """Keep the stored AOI composite in step with the badges and rates"""
+    job.aoi_score = aoi_score_for(job)
+
+
 class UserJobListing(Base):
     """Tracks user interactions (swipes) with job listings"""
     __tablename__ = "user_job_listing"
+    __mapper_args__ = {"eager_defaults": True}
+    # Recent interactions per user; on PostgreSQL the table can be range
+    # partitioned by created_at (see partitions.py)
+    __table_args__ = (
+        Index("ix_user_job_listing_user_id_created_at", "user_id", "created_at"),
+        # Seen-jobs lookups for recommendations, as an index-only scan
+        Index("ix_user_job_listing_user_id_job_listing_id", "user_id", "job_listing_id"),
+        # Keys are scoped per user: another user's key never matches
+        Index("ix_user_job_listing_user_id_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
     job_listing_id = Column(Integer, ForeignKey("job_listing.id"), nullable=False, index=True)
     
     # Interaction data
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # partition key
     interaction_type = Column(String(50), nullable=False)  # 'shown', 'swipe_left', 'swipe_right', 'viewed'
     
     # Swipe details (if applicable)
@@ -125,6 +148,9 @@ class UserJobListing(Base):
     time_spent_viewing = Column(Float, nullable=True)  # Seconds
     extra_data = Column(JSON, nullable=True)
     
+    # Dedup key so client retries do not record the same swipe twice
+    idempotency_key = Column(String(64), nullable=True)
+    
     # Relationships
     user = relationship("User", back_populates="swipes")
     job_listing = relationship("JobListing", back_populates="user_interactions")
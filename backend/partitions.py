@@ -0,0 +1,289 @@
+"""
+Monthly range partitioning and retention for the interaction log (PostgreSQL).
+
+``user_job_listing`` is append-only and grows fastest of all tables. On
+PostgreSQL it can be converted once into a declaratively partitioned table,
+``PARTITION BY RANGE (created_at)`` with one partition per calendar month
+(``user_job_listing_p2026_10``) plus a default partition that only catches
+rows outside the prepared range. Queries bounded on created_at (recent swipes
+per user, see utils.RECENT_INTERACTION_DAYS) are pruned to recent partitions.
+
+A maintenance job, run daily from cron, keeps future partitions created ahead
+of time and enforces retention: 'shown' impressions older than
+SHOWN_RETENTION_MONTHS are archived to gzipped CSV and deleted, and whole
+partitions older than an optional horizon are archived in full (with
+--archive-dir), detached and dropped. Months are calendar months in UTC, like
+the stored timestamps. Swipes are kept by default because the learned ranker
+trains on them.
+
+    python partitions.py convert                # one-off, takes an exclusive lock
+    python partitions.py maintain --archive-dir ../data/processed/archive
+
+The ORM model keeps ``id`` as its primary key, so SQLite and unpartitioned
+PostgreSQL databases work unchanged; on a partitioned table the primary key
+is (id, created_at), as PostgreSQL requires the partition key in it. For the
+same reason the unique swipe idempotency key index is created per partition,
+so duplicates are rejected within a month rather than table-wide.
+"""
+import gzip
+import logging
+import os
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from database import copy_out
+from models import UserJobListing
+
+logger = logging.getLogger(__name__)
+
+TABLE = "user_job_listing"
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+SHOWN_RETENTION_MONTHS = int(os.getenv("SHOWN_RETENTION_MONTHS", "6"))
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _utc_today() -> date:
+    # Rows are stamped with datetime.utcnow(), so month edges follow UTC
+    return datetime.utcnow().date()
+
+
+def _month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year}_{month.month:02d}"
+
+
+def _require_postgres(bind):
+    if bind.dialect.name != "postgresql":
+        raise RuntimeError(f"Table partitioning requires PostgreSQL (got {bind.dialect.name})")
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)"
+    ), {"table": TABLE}).scalar()
+
+
+def list_partitions(conn: Connection) -> List[str]:
+    """Names of the monthly partitions, oldest first (default partition excluded)"""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {"table": TABLE}).scalars().all()
+    return [name for name in rows if name != f"{TABLE}_default"]
+
+
+def _partition_month(name: str) -> date:
+    year, month = name.rsplit("_p", 1)[1].split("_")
+    return date(int(year), int(month), 1)
+
+
+def _partition_local_indexes():
+    """
+    Unique indexes without the partition key cannot exist on the parent, so
+    they are created on each partition (unique within that month)
+    """
+    return [index for index in UserJobListing.__table__.indexes
+            if index.unique and "created_at" not in index.columns]
+
+
+def _create_local_indexes(conn: Connection, partition: str):
+    for index in _partition_local_indexes():
+        columns = ", ".join(column.name for column in index.columns)
+        conn.execute(text(f'CREATE UNIQUE INDEX "{partition}_{index.name[3:]}" ON "{partition}" ({columns})'))
+
+
+def _create_partition(conn: Connection, month: date) -> bool:
+    name = partition_name(month)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+    if exists:
+        return False
+    conn.execute(text(
+        f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    ))
+    _create_local_indexes(conn, name)
+    return True
+
+
+def ensure_future_partitions(engine: Engine, months_ahead: int = MONTHS_AHEAD,
+                             today: Optional[date] = None) -> List[str]:
+    """Create monthly partitions from the current month through ``months_ahead`` months out"""
+    _require_postgres(engine)
+    current = _month_start(today or _utc_today())
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            raise RuntimeError(f"{TABLE} is not partitioned; run `python partitions.py convert` first")
+        for offset in range(months_ahead + 1):
+            month = _add_months(current, offset)
+            if _create_partition(conn, month):
+                created.append(partition_name(month))
+    return created
+
+
+def convert_to_partitioned(engine: Engine, months_ahead: int = MONTHS_AHEAD):
+    """
+    Rebuild user_job_listing as a monthly range-partitioned table, copying all
+    rows across in one transaction. Writes are blocked while it runs.
+    """
+    _require_postgres(engine)
+    legacy = f"{TABLE}_unpartitioned"
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            logger.info("%s is already partitioned", TABLE)
+            return
+        conn.execute(text(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE'))
+        # The partition key must be non-null; legacy rows without a timestamp get now()
+        conn.execute(text(f'UPDATE "{TABLE}" SET created_at = now() WHERE created_at IS NULL'))
+        bounds = conn.execute(text(f'SELECT min(created_at), max(created_at) FROM "{TABLE}"')).one()
+
+        conn.execute(text(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"'))
+        conn.execute(text(f'ALTER TABLE "{legacy}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{legacy}_pkey"'))
+        # Index names are schema-wide; free them for the partitioned table
+        legacy_indexes = conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :legacy AND indexname <> :pkey"
+        ), {"legacy": legacy, "pkey": f"{legacy}_pkey"}).scalars().all()
+        for index_name in legacy_indexes:
+            conn.execute(text(f'DROP INDEX "{index_name}"'))
+        conn.execute(text(
+            f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+        ))
+        conn.execute(text(f'ALTER TABLE "{TABLE}" ALTER COLUMN created_at SET NOT NULL'))
+        conn.execute(text(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, created_at)'))
+        conn.execute(text(f'ALTER TABLE "{TABLE}" ADD FOREIGN KEY (user_id) REFERENCES "user" (id)'))
+        conn.execute(text(f'ALTER TABLE "{TABLE}" ADD FOREIGN KEY (job_listing_id) REFERENCES job_listing (id)'))
+        # The id sequence belongs to the old table; keep it alive when that is dropped
+        conn.execute(text(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY \"{TABLE}\".id"))
+
+        today = _utc_today()
+        month = _month_start(bounds[0]) if bounds[0] else _month_start(today)
+        last = _add_months(_month_start(max(bounds[1].date(), today) if bounds[1] else today), months_ahead)
+        while month <= last:
+            _create_partition(conn, month)
+            month = _add_months(month, 1)
+        conn.execute(text(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT'))
+        _create_local_indexes(conn, f"{TABLE}_default")
+
+        # The model's other indexes, created on the parent, cascade to every partition
+        local_indexes = _partition_local_indexes()
+        for index in UserJobListing.__table__.indexes:
+            if index not in local_indexes:
+                index.create(conn)
+
+        conn.execute(text(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"'))
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text(f'ANALYZE "{TABLE}"'))
+
+
+def _archive(conn: Connection, partition: str, archive_dir: str, shown_only: bool = False) -> str:
+    """COPY a partition's rows (or only its 'shown' rows) to a gzipped CSV file"""
+    os.makedirs(archive_dir, exist_ok=True)
+    suffix = "_shown" if shown_only else ""
+    path = os.path.join(archive_dir, f"{partition}{suffix}.csv.gz")
+    where = " WHERE interaction_type = 'shown'" if shown_only else ""
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(path, "wb") as f:
+            copy_out(
+                cursor,
+                f"COPY (SELECT * FROM \"{partition}\"{where} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)",
+                f,
+            )
+    finally:
+        cursor.close()
+    return path
+
+
+def apply_retention(engine: Engine, shown_retention_months: int = SHOWN_RETENTION_MONTHS,
+                    drop_after_months: Optional[int] = None, archive_dir: Optional[str] = None,
+                    today: Optional[date] = None) -> dict:
+    """
+    Delete 'shown' rows from partitions that ended more than
+    ``shown_retention_months`` ago (archiving them first when ``archive_dir``
+    is given), and drop whole partitions older than ``drop_after_months``
+    (archiving every row of them first).
+    """
+    _require_postgres(engine)
+    current = _month_start(today or _utc_today())
+    shown_cutoff = _add_months(current, -shown_retention_months)
+    drop_cutoff = _add_months(current, -drop_after_months) if drop_after_months is not None else None
+    summary = {"archived": [], "shown_deleted": 0, "dropped": []}
+
+    with engine.connect() as conn:
+        partitions = list_partitions(conn)
+
+    for name in partitions:
+        month = _partition_month(name)
+        # One transaction per partition so a failure only affects that month
+        with engine.begin() as conn:
+            if drop_cutoff is not None and _add_months(month, 1) <= drop_cutoff:
+                if archive_dir:
+                    summary["archived"].append(_archive(conn, name, archive_dir))
+                conn.execute(text(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"'))
+                conn.execute(text(f'DROP TABLE "{name}"'))
+                summary["dropped"].append(name)
+            elif _add_months(month, 1) <= shown_cutoff:
+                has_shown = conn.execute(text(
+                    f"SELECT EXISTS (SELECT 1 FROM \"{name}\" WHERE interaction_type = 'shown')"
+                )).scalar()
+                if not has_shown:
+                    continue
+                if archive_dir:
+                    summary["archived"].append(_archive(conn, name, archive_dir, shown_only=True))
+                summary["shown_deleted"] += conn.execute(text(
+                    f"DELETE FROM \"{name}\" WHERE interaction_type = 'shown'"
+                )).rowcount
+    return summary
+
+
+def maintain(engine: Engine, months_ahead: int = MONTHS_AHEAD, **retention) -> dict:
+    """Daily job: create upcoming partitions, then apply the retention policy"""
+    created = ensure_future_partitions(engine, months_ahead)
+    summary = apply_retention(engine, **retention)
+    summary["created"] = created
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import engine as db_engine
+
+    parser = argparse.ArgumentParser(description="Partition maintenance for user_job_listing (PostgreSQL)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Convert the table to monthly partitions")
+    convert_parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    maintain_parser = subparsers.add_parser("maintain", help="Create future partitions and apply retention")
+    maintain_parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    maintain_parser.add_argument("--shown-retention-months", type=int, default=SHOWN_RETENTION_MONTHS)
+    maintain_parser.add_argument("--drop-after-months", type=int, default=None,
+                                 help="Drop whole partitions (all events) older than this")
+    maintain_parser.add_argument("--archive-dir", help="Archive deleted rows here as gzipped CSV")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = datetime.now()
+    if args.command == "convert":
+        convert_to_partitioned(db_engine, args.months_ahead)
+        print(f"Partitioned {TABLE} in {(datetime.now() - started).total_seconds():.1f}s")
+    else:
+        result = maintain(
+            db_engine, args.months_ahead,
+            shown_retention_months=args.shown_retention_months,
+            drop_after_months=args.drop_after_months,
+            archive_dir=args.archive_dir,
+        )
+        print(f"Created {len(result['created'])} partitions, deleted {result['shown_deleted']} shown rows, "
+              f"dropped {len(result['dropped'])} partitions, archived {len(result['archived'])} files")
@@ -0,0 +1,107 @@
+"""
+Decides when a swipe should trigger a learned-preference recompute.
+
+Learned preferences are averages over the liked jobs among a user's last
+RECENT_SWIPE_LIMIT swipes (see update_user_preferences_from_swipes). Instead
+of recomputing on a fixed cadence, each new swipe adds an estimate of how far
+it moves those averages:
+
+    right swipe on job x, with n likes behind the current preferences:
+        drift += (|salary_x - preferred_salary| / preferred_salary   (capped at 1)
+                  + 1 - share of x's industry among preferred industries
+                  + |remote_x - remote_preference|) / 3 / (n + 1)
+
+which is the step a running mean takes when x is added. Left swipes carry no
+liked-job signal and add nothing. A recompute runs when the accumulated drift
+reaches PREFERENCE_DRIFT_THRESHOLD, when swipes are pending and the last
+recompute is older than PREFERENCE_MAX_AGE_SECONDS, or when a whole window
+of swipes has passed since it. Interactions that are not swipes (``shown``,
+``viewed`` without a direction) count towards none of these. Only a
+recompute bumps the user's cache version, so decks and scores of heavy
+swipers are not rebuilt on every swipe.
+
+Pending drift lives in the shared cache store so every worker adds to the
+same total. It is approximate: concurrent swipes of one user can lose an
+increment, and if the entry is evicted the time budget still applies.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+from cache import get_state, set_state
+from metrics import Counter, REGISTRY
+from models import JobListing, User
+from queries import RECENT_SWIPE_LIMIT, SWIPE_TYPES
+
+logger = logging.getLogger(__name__)
+
+PREFERENCE_DRIFT_THRESHOLD = float(os.getenv("PREFERENCE_DRIFT_THRESHOLD", "0.15"))
+PREFERENCE_MAX_AGE_SECONDS = float(os.getenv("PREFERENCE_MAX_AGE_SECONDS", "900"))
+# Swipes before the first recompute, when there is nothing to drift from
+PREFERENCE_MIN_SWIPES = int(os.getenv("PREFERENCE_MIN_SWIPES", "3"))
+STATE_TTL_SECONDS = 24 * 3600
+
+DECISIONS = Counter("preference_recompute_decisions_total", "Swipes by preference recompute decision", ("decision",))
+REGISTRY.append(DECISIONS)
+
+
+def swipe_drift(preferences: dict, job: Optional[JobListing], direction: Optional[str]) -> float:
+    """Estimated change of the learned preference averages caused by one swipe"""
+    if direction != "right" or job is None:
+        return 0.0
+    liked = preferences.get("liked_count", 0)
+
+    preferred_salary = preferences.get("preferred_min_salary")
+    if not job.salary_min:
+        salary = 0.0
+    elif preferred_salary:
+        salary = min(1.0, abs(job.salary_min - preferred_salary) / preferred_salary)
+    else:
+        salary = 1.0
+
+    industries = preferences.get("preferred_industries") or {}
+    total = sum(industries.values())
+    industry = 1.0 - (industries.get(job.industry, 0) / total if total else 0.0) if job.industry else 0.0
+
+    remote_preference = preferences.get("remote_preference")
+    remote = abs(float(bool(job.remote_work)) - remote_preference) if remote_preference is not None else 1.0
+
+    return (salary + industry + remote) / 3 / (liked + 1)
+
+
+def _state_key(user_id: int) -> str:
+    return f"prefsched:user:{user_id}"
+
+
+def record_swipe(user: User, job: Optional[JobListing], direction: Optional[str],
+                 interaction_type: Optional[str] = None) -> bool:
+    """Account for a new swipe; True when the user's preferences should be recomputed now"""
+    if interaction_type not in SWIPE_TYPES and direction is None:
+        DECISIONS.inc(("ignored",))
+        return False
+    preferences = user.learned_preferences or {}
+    state = get_state(_state_key(user.id)) or {
+        "drift": 0.0, "swipes": 0, "since": preferences.get("computed_at", 0.0),
+    }
+    state["drift"] += swipe_drift(preferences, job, direction)
+    state["swipes"] += 1
+
+    if "computed_at" not in preferences:
+        decision = "first" if state["swipes"] >= PREFERENCE_MIN_SWIPES else None
+    elif state["drift"] >= PREFERENCE_DRIFT_THRESHOLD:
+        decision = "drift"
+    elif time.time() - state["since"] >= PREFERENCE_MAX_AGE_SECONDS:
+        decision = "age"
+    elif state["swipes"] >= RECENT_SWIPE_LIMIT:
+        decision = "window"
+    else:
+        decision = None
+
+    if decision is None:
+        set_state(_state_key(user.id), state, STATE_TTL_SECONDS)
+        DECISIONS.inc(("skip",))
+        return False
+    set_state(_state_key(user.id), {"drift": 0.0, "swipes": 0, "since": time.time()}, STATE_TTL_SECONDS)
+    DECISIONS.inc((decision,))
+    return True
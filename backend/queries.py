@@ -0,0 +1,91 @@
+"""
+Pre-built statements for the queries that run on (almost) every request.
+
+Building ``db.query(Model).filter(...)`` allocates a fresh Query and
+expression tree per call, which SQLAlchemy then has to hash to find the
+compiled form in its cache. These statements are constructed once at import
+with bound parameters for every per-request value, so a request only binds
+parameters: the cache key is computed from an already-built tree, and the
+compiled SQL string is identical every time, which is what lets the driver
+reuse a server-side prepared statement (psycopg 3, see database.py).
+
+Hit rates of the compiled cache are exported as ``sql_compiled_cache_total``.
+"""
+from typing import List, Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from models import JobListing, User, UserJobListing
+
+SWIPE_TYPES = ("swipe_left", "swipe_right")
+# Swipes considered when learning preferences and finding "similar to your likes"
+RECENT_SWIPE_LIMIT = 30
+
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+JOB_BY_ID = select(JobListing).where(JobListing.id == bindparam("job_id"))
+JOB_ID_EXISTS = select(JobListing.id).where(JobListing.id == bindparam("job_id"))
+SWIPE_BY_KEY = select(UserJobListing).where(
+    UserJobListing.user_id == bindparam("user_id"),
+    UserJobListing.idempotency_key == bindparam("key"),
+)
+# Every job the user ever interacted with; answered from the
+# (user_id, job_listing_id) index alone, without reading table rows
+SEEN_JOB_IDS = select(UserJobListing.job_listing_id).where(
+    UserJobListing.user_id == bindparam("user_id")
+).distinct()
+RECENT_SWIPES_WITH_JOBS = select(UserJobListing.swipe_direction, JobListing).join(
+    JobListing, JobListing.id == UserJobListing.job_listing_id
+).where(
+    UserJobListing.user_id == bindparam("user_id"),
+    UserJobListing.interaction_type.in_(SWIPE_TYPES),
+    UserJobListing.created_at >= bindparam("cutoff"),
+).order_by(UserJobListing.created_at.desc()).limit(RECENT_SWIPE_LIMIT)
+RECENT_LIKED_JOB_IDS = select(UserJobListing.job_listing_id).where(
+    UserJobListing.user_id == bindparam("user_id"),
+    UserJobListing.swipe_direction == "right",
+    UserJobListing.created_at >= bindparam("cutoff"),
+).order_by(UserJobListing.created_at.desc()).limit(RECENT_SWIPE_LIMIT)
+USER_SWIPES_PAGE = select(UserJobListing).where(
+    UserJobListing.user_id == bindparam("user_id")
+).order_by(UserJobListing.created_at.desc()).offset(bindparam("skip")).limit(bindparam("limit"))
+
+
+def user_by_id(db: Session, user_id: int) -> Optional[User]:
+    return db.scalars(USER_BY_ID, {"user_id": user_id}).first()
+
+
+def job_by_id(db: Session, job_id: int) -> Optional[JobListing]:
+    return db.scalars(JOB_BY_ID, {"job_id": job_id}).first()
+
+
+def job_exists(db: Session, job_id: int) -> bool:
+    return db.scalars(JOB_ID_EXISTS, {"job_id": job_id}).first() is not None
+
+
+def swipe_by_key(db: Session, user_id: int, key: str) -> Optional[UserJobListing]:
+    return db.scalars(SWIPE_BY_KEY, {"user_id": user_id, "key": key}).first()
+
+
+def seen_job_ids(db: Session, user_id: int) -> List[int]:
+    return list(db.scalars(SEEN_JOB_IDS, {"user_id": user_id}))
+
+
+def recent_swipes_with_jobs(db: Session, user_id: int, cutoff) -> list:
+    """(swipe_direction, JobListing) rows for the user's latest swipes, newest first"""
+    return db.execute(RECENT_SWIPES_WITH_JOBS, {"user_id": user_id, "cutoff": cutoff}).all()
+
+
+def recent_liked_job_ids(db: Session, user_id: int, cutoff) -> List[int]:
+    return list(db.scalars(RECENT_LIKED_JOB_IDS, {"user_id": user_id, "cutoff": cutoff}))
+
+
+def planner_row_estimate(db: Session, statement) -> int:
+    """PostgreSQL planner's row estimate for ``statement`` (EXPLAIN, nothing is scanned)"""
+    compiled = statement.compile(bind=db.get_bind())
+    plan = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def user_swipes_page(db: Session, user_id: int, skip: int, limit: int) -> List[UserJobListing]:
+    return list(db.scalars(USER_SWIPES_PAGE, {"user_id": user_id, "skip": skip, "limit": limit}))
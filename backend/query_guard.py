@@ -0,0 +1,54 @@
+"""
+Development-mode guard against N+1 relationship loading.
+
+Counts lazy relationship loads (e.g. touching ``user.swipes`` or
+``job.user_interactions`` on an object that was not eager-loaded) per
+request. With LAZY_LOAD_GUARD=log a warning is logged once a request passes
+LAZY_LOAD_THRESHOLD lazy loads; with LAZY_LOAD_GUARD=raise the offending load
+raises LazyLoadLimitExceeded so the access pattern shows up in development
+instead of as latency in production. Fix offenders with ``selectinload`` /
+``joinedload`` options or a joined query.
+"""
+import logging
+import os
+
+from sqlalchemy import event
+
+from metrics import current_request_stats
+
+logger = logging.getLogger(__name__)
+
+LAZY_LOAD_GUARD = os.getenv("LAZY_LOAD_GUARD", "off").lower()  # off | log | raise
+LAZY_LOAD_THRESHOLD = int(os.getenv("LAZY_LOAD_THRESHOLD", "10"))
+
+
+class LazyLoadLimitExceeded(RuntimeError):
+    """Raised when a request performs more lazy loads than allowed"""
+
+
+def install_lazy_load_guard(session_factory, mode=LAZY_LOAD_GUARD, threshold=LAZY_LOAD_THRESHOLD):
+    """Attach lazy-load counting to every session created by ``session_factory``"""
+    if mode not in ("log", "raise"):
+        return
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _count_lazy_loads(orm_execute_state):
+        # Only set for lazy loads, not for selectin/subquery eager loaders
+        if orm_execute_state.lazy_loaded_from is None:
+            return
+        stats = current_request_stats()
+        if stats is None:
+            return
+
+        stats.lazy_loads += 1
+        if stats.lazy_loads <= threshold:
+            return
+
+        message = (
+            f"{stats.lazy_loads} lazy loads in one request (threshold {threshold}); "
+            f"last one loaded a relationship of {orm_execute_state.lazy_loaded_from.class_.__name__}"
+        )
+        if mode == "raise":
+            raise LazyLoadLimitExceeded(message)
+        if stats.lazy_loads == threshold + 1:
+            logger.warning(message)
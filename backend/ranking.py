@@ -0,0 +1,49 @@
+"""
+Top-K selection shared by every job ranking path.
+
+Endpoints only ever return ``skip + limit`` rows, so instead of sorting the
+whole candidate set they select the best K with a bounded heap
+(``heapq.nsmallest``, O(n log k)) or, for NumPy score arrays,
+``np.argpartition`` (O(n)). All rankings order by score descending and then
+by job id ascending, so equal scores always paginate the same way.
+"""
+import heapq
+from typing import TYPE_CHECKING, Callable, Iterable, List, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    import numpy as np
+
+T = TypeVar("T")
+
+
+def top_k(items: Iterable[T], k: int, key: Callable[[T], Tuple[float, int]]) -> List[T]:
+    """Best ``k`` items, where ``key(item)`` returns ``(score, job_id)``"""
+    if k <= 0:
+        return []
+
+    def order(item):
+        score, job_id = key(item)
+        return -score, job_id
+
+    return heapq.nsmallest(k, items, key=order)
+
+
+def top_k_arrays(scores: "np.ndarray", job_ids: "np.ndarray", k: int) -> List[Tuple[float, int]]:
+    """Best ``k`` (score, job_id) pairs from parallel arrays"""
+    # NumPy is only needed by the array paths, not by every importer of top_k
+    import numpy as np
+
+    if k <= 0 or not len(scores):
+        return []
+    if k < len(scores):
+        # Keep everything tied with the k-th best so id tie-breaking stays exact
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        scores, job_ids = scores[keep], job_ids[keep]
+    order = np.lexsort((job_ids, -scores))[:k]
+    return [(float(scores[i]), int(job_ids[i])) for i in order]
+
+
+def merge_top_k(shards: Iterable[List[Tuple[float, int]]], k: int) -> List[Tuple[float, int]]:
+    """Merge per-shard (score, job_id) top-K lists into a global top-K"""
+    return top_k((pair for shard in shards for pair in shard), k, key=lambda pair: pair)
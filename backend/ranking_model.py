@@ -0,0 +1,282 @@
+"""
+Learned ranking model trained from swipe logs.
+
+Offline, every swipe in ``user_job_listing`` becomes a training example:
+user x job features (the explicit-profile match score and its components and
+AOI signals) labelled by swipe direction. Deck position is not a feature,
+since it is unknown when ranking candidates; it only reweights training
+examples so the position effect in the logs is not learned through
+correlated features (decks are sorted by score). A logistic regression
+(default) or gradient-boosted trees model is fitted, evaluated on the most
+recent 20% of swipes, and serialized with joblib:
+
+    python ranking_model.py                 # logistic regression
+    python ranking_model.py --model gbdt
+
+The API loads the model once at startup. Inference builds the feature matrix
+for all candidates in one pass and scores it in a single batched call (a
+plain dot product for logistic regression), re-ranking at most
+RANKER_MAX_CANDIDATES candidates so the per-request cost stays bounded;
+calls slower than RANKER_BUDGET_MS are counted on /metrics.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from metrics import Counter, Histogram, REGISTRY
+from models import JobListing, User, UserJobListing
+from scoring_kernel import kernel_for
+from utils import calculate_distance
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.getenv("RANKER_MODEL_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "processed", "models", "ranker.joblib")
+RANKER_BUDGET_MS = float(os.getenv("RANKER_BUDGET_MS", "25"))
+RANKER_MAX_CANDIDATES = int(os.getenv("RANKER_MAX_CANDIDATES", "1000"))
+# Deck positions from this one on share one debiasing bucket
+POSITION_BUCKETS = int(os.getenv("RANKER_POSITION_BUCKETS", "20"))
+
+FEATURE_NAMES = [
+    "rule_score", "location_score", "has_location", "industry_match", "salary_score",
+    "remote", "remote_x_flexibility", "skills_overlap", "badge_overall", "badge_early_career",
+    "badge_growth", "badge_stability", "internal_promotion_rate", "retention_rate_3yr",
+]
+BADGE_LEVELS = {"platinum": 2.0, "gold": 1.0}
+
+# Swipes on a single aspect say less about the whole job than overall swipes
+ASPECT_WEIGHTS = {None: 1.0, "overall": 1.0}
+DEFAULT_ASPECT_WEIGHT = 0.5
+
+INFERENCE_SECONDS = Histogram(
+    "ranker_inference_duration_seconds", "Learned ranker batch inference time",
+    (), (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+BUDGET_OVERRUNS = Counter("ranker_budget_overruns_total", "Ranker calls slower than RANKER_BUDGET_MS", ())
+REGISTRY.extend([INFERENCE_SECONDS, BUDGET_OVERRUNS])
+
+
+def _badge(value) -> float:
+    return BADGE_LEVELS.get((value or "").lower(), 0.0)
+
+
+def pair_features(user: User, jobs: List[JobListing]) -> np.ndarray:
+    """
+    Feature matrix (len(jobs) x len(FEATURE_NAMES)) for one user and many jobs.
+    ``rule_score`` is the explicit-profile match score: learned preferences are
+    built from the same swipes the model is trained on, so they are left out.
+    """
+    out = np.zeros((len(jobs), len(FEATURE_NAMES)), dtype=np.float32)
+    user_industry = (user.industry or "").lower()
+    user_skills = {s.lower() for s in user.skills or []}
+    has_user_coords = bool(user.latitude and user.longitude)
+    flexibility = (user.flexibility_importance or 3) / 5
+    kernel = kernel_for(user, learned=False)
+
+    for i, job in enumerate(jobs):
+        row = out[i]
+        row[0] = kernel.score(job) / 100
+        if has_user_coords and job.latitude and job.longitude:
+            distance = calculate_distance(user.latitude, user.longitude, job.latitude, job.longitude)
+            row[1] = max(0.0, 100 - distance / 2) / 100
+            row[2] = 1.0
+        if user_industry and job.industry and user_industry in job.industry.lower():
+            row[3] = 1.0
+        if job.salary_min:
+            row[4] = min(1.0, max(0.0, (job.salary_min - 30000) / 120000))
+        if job.remote_work:
+            row[5] = 1.0
+            row[6] = flexibility
+        if user_skills and job.required_skills:
+            job_skills = {s.lower() for s in job.required_skills}
+            row[7] = len(user_skills & job_skills) / len(job_skills)
+        row[8] = _badge(job.aoi_overall_badge)
+        row[9] = _badge(job.aoi_badge_early_career)
+        row[10] = _badge(job.aoi_badge_growth)
+        row[11] = _badge(job.aoi_badge_stability)
+        row[12] = job.aoi_interal_promption_rate or 0.0
+        row[13] = job.aoi_retention_rate_3yr or 0.0
+    return out
+
+
+class RankingModel:
+    """Serialized estimator plus a fast batched scoring path"""
+
+    max_candidates = RANKER_MAX_CANDIDATES
+
+    def __init__(self, estimator, feature_names, trained_at=None, metrics=None):
+        self.estimator = estimator
+        self.feature_names = list(feature_names)
+        self.trained_at = trained_at
+        self.metrics = metrics or {}
+        # Linear models score with one matrix-vector product, skipping sklearn's checks
+        coef = getattr(estimator, "coef_", None)
+        self._coef = None if coef is None else np.asarray(coef, dtype=np.float32).ravel()
+        self._intercept = float(np.ravel(getattr(estimator, "intercept_", [0.0]))[0])
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Probability of a right swipe for each feature row"""
+        if self._coef is not None:
+            return 1.0 / (1.0 + np.exp(-(features @ self._coef + self._intercept)))
+        return self.estimator.predict_proba(features)[:, 1]
+
+    def score_jobs(self, user: User, jobs: List[JobListing]) -> np.ndarray:
+        start = time.perf_counter()
+        probabilities = self.predict(pair_features(user, jobs))
+        elapsed = time.perf_counter() - start
+        INFERENCE_SECONDS.observe((), elapsed)
+        if elapsed * 1000 > RANKER_BUDGET_MS:
+            BUDGET_OVERRUNS.inc(())
+        return probabilities
+
+    def save(self, path: str = MODEL_PATH):
+        import joblib
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        joblib.dump({
+            "estimator": self.estimator,
+            "feature_names": self.feature_names,
+            "trained_at": self.trained_at,
+            "metrics": self.metrics,
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "RankingModel":
+        import joblib
+
+        data = joblib.load(path)
+        return cls(data["estimator"], data["feature_names"], data.get("trained_at"), data.get("metrics"))
+
+
+def load_training_data(db: Session, batch_size: int = 5000):
+    """Features, labels and sample weights for every swipe, oldest first"""
+    rows = db.query(
+        UserJobListing.swipe_direction, UserJobListing.position_in_deck,
+        UserJobListing.aspect_swiped, User, JobListing
+    ).join(User, User.id == UserJobListing.user_id).join(
+        JobListing, JobListing.id == UserJobListing.job_listing_id
+    ).filter(
+        UserJobListing.swipe_direction.in_(["left", "right"])
+    ).order_by(UserJobListing.created_at).yield_per(batch_size)
+
+    feature_blocks, labels, weights, positions = [], [], [], []
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            feature_blocks.append(_batch_features(batch))
+            batch = []
+        labels.append(1 if row[0] == "right" else 0)
+        weights.append(ASPECT_WEIGHTS.get(row[2], DEFAULT_ASPECT_WEIGHT))
+        positions.append(row[1] or 0)
+    if batch:
+        feature_blocks.append(_batch_features(batch))
+
+    if not feature_blocks:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32), np.empty(0), np.empty(0)
+    labels = np.asarray(labels)
+    weights = np.asarray(weights, dtype=np.float32) * position_weights(np.asarray(positions), labels)
+    return np.vstack(feature_blocks), labels, weights
+
+
+def _batch_features(batch) -> np.ndarray:
+    return np.vstack([pair_features(user, [job]) for _, _, _, user, job in batch])
+
+
+def position_weights(positions: np.ndarray, labels: np.ndarray, smoothing: float = 10.0) -> np.ndarray:
+    """
+    Per-example weights that give every deck position the overall right-swipe
+    rate: right swipes at a position with a high rate count less, left swipes
+    there count more. Rates are smoothed towards the overall rate.
+    """
+    if not len(labels):
+        return np.empty(0, dtype=np.float32)
+    buckets = np.clip(positions.astype(np.int64), 0, POSITION_BUCKETS - 1)
+    overall = labels.mean()
+    if overall in (0.0, 1.0):
+        return np.ones(len(labels), dtype=np.float32)
+    counts = np.bincount(buckets, minlength=POSITION_BUCKETS)
+    rights = np.bincount(buckets, weights=labels, minlength=POSITION_BUCKETS)
+    rates = (rights + smoothing * overall) / (counts + smoothing)
+    rate = rates[buckets]
+    return np.where(labels == 1, overall / rate, (1 - overall) / (1 - rate)).astype(np.float32)
+
+
+def train(db: Session, model_type: str = "logistic", holdout: float = 0.2) -> RankingModel:
+    """Fit a ranker on swipe logs, holding out the most recent swipes for evaluation"""
+    from sklearn.metrics import roc_auc_score
+
+    X, y, w = load_training_data(db)
+    if len(y) < 20 or len(set(y)) < 2:
+        raise ValueError(f"Not enough labelled swipes to train ({len(y)} rows)")
+
+    if model_type == "gbdt":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        estimator = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, random_state=0)
+    else:
+        from sklearn.linear_model import LogisticRegression
+        estimator = LogisticRegression(max_iter=1000)
+
+    split = int(len(y) * (1 - holdout))
+    metrics = {"rows": int(len(y)), "positive_rate": float(y.mean())}
+    if 0 < split < len(y) and len(set(y[split:])) == 2:
+        estimator.fit(X[:split], y[:split], sample_weight=w[:split])
+        metrics["holdout_auc"] = float(roc_auc_score(y[split:], estimator.predict_proba(X[split:])[:, 1]))
+    # Refit on everything for the shipped model
+    estimator.fit(X, y, sample_weight=w)
+    return RankingModel(estimator, FEATURE_NAMES, datetime.utcnow().isoformat(), metrics)
+
+
+_model: Optional[RankingModel] = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def load_model(path: str = MODEL_PATH) -> Optional[RankingModel]:
+    """Load the serialized ranker if one exists (called once at startup)"""
+    global _model, _model_loaded
+    with _model_lock:
+        _model_loaded = True
+        if not os.path.exists(path):
+            _model = None
+            return None
+        model = RankingModel.load(path)
+        if model.feature_names != FEATURE_NAMES:
+            logger.warning("Ignoring ranker at %s: trained on different features", path)
+            _model = None
+        else:
+            _model = model
+    return _model
+
+
+def get_model() -> Optional[RankingModel]:
+    if not _model_loaded:
+        load_model()
+    return _model
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Train the learned ranker from swipe logs")
+    parser.add_argument("--model", choices=["logistic", "gbdt"], default="logistic")
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    session = SessionLocal()
+    try:
+        trained = train(session, args.model)
+    finally:
+        session.close()
+    trained.save(args.output)
+    print(f"Trained {args.model} ranker in {time.perf_counter() - started:.1f}s: {trained.metrics}")
+    print(f"Saved to {args.output}")
@@ -0,0 +1,152 @@
+"""
+Region-sharded view of the job catalog.
+
+Most users only care about jobs near them or remote ones, so instead of
+scoring the national catalog, recommendations read candidates from shards
+of the memory-mapped feature store: one per Census division (by job state)
+plus one for remote jobs. A user touches the shard of the division closest
+to them, the divisions of states within REGION_RADIUS_MILES, the remote
+shard and the shard of on-site jobs with no known state (which cannot be
+placed in a region, so they are candidates for everyone, as in /api/jobs),
+so per-request work is bounded by the local catalog size.
+
+Each shard is a sorted array of feature store row positions. Shards are
+derived lazily and independently: when a new feature store version is
+published, a shard is rebuilt the next time a request needs it, under its
+own lock, without touching the others.
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from feature_store import JobFeatures, get_features
+from geocoder import STATES, geocode, state_code
+from metrics import Counter, Histogram, REGISTRY, timed_section
+from ranking import top_k_arrays
+from scoring_kernel import kernel_for
+from utils import calculate_distance
+
+REGION_RADIUS_MILES = float(os.getenv("REGION_RADIUS_MILES", "250"))
+
+DIVISIONS = {
+    "new_england": ("CT", "ME", "MA", "NH", "RI", "VT"),
+    "middle_atlantic": ("NJ", "NY", "PA"),
+    "east_north_central": ("IL", "IN", "MI", "OH", "WI"),
+    "west_north_central": ("IA", "KS", "MN", "MO", "NE", "ND", "SD"),
+    "south_atlantic": ("DE", "DC", "FL", "GA", "MD", "NC", "SC", "VA", "WV", "PR"),
+    "east_south_central": ("AL", "KY", "MS", "TN"),
+    "west_south_central": ("AR", "LA", "OK", "TX"),
+    "mountain": ("AZ", "CO", "ID", "MT", "NV", "NM", "UT", "WY"),
+    "pacific": ("AK", "CA", "HI", "OR", "WA"),
+}
+REMOTE_SHARD = "remote"
+# On-site jobs whose state is missing or not recognised
+UNLOCATED_SHARD = "unlocated"
+SHARD_NAMES = tuple(DIVISIONS) + (REMOTE_SHARD, UNLOCATED_SHARD)
+DIVISION_OF_STATE = {state: division for division, states in DIVISIONS.items() for state in states}
+
+SHARD_RELOADS = Counter("region_shard_reloads_total", "Region shard rebuilds after a feature store change", ("shard",))
+SHARD_CANDIDATES = Histogram(
+    "region_shard_candidates", "Jobs scored per regional candidate lookup", (),
+    (100, 1000, 5000, 10000, 50000, 100000, 500000))
+REGISTRY.extend([SHARD_RELOADS, SHARD_CANDIDATES])
+
+
+class RegionShard:
+    """Row positions of one region's jobs in a feature store version"""
+
+    def __init__(self, name: str, version: str, positions: np.ndarray):
+        self.name = name
+        self.version = version
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def _shard_positions(features: JobFeatures, name: str) -> np.ndarray:
+    remote = features.remote != 0
+    if name == REMOTE_SHARD:
+        return np.flatnonzero(remote)
+
+    # Map the store's state vocabulary to divisions once per build
+    state_divisions = np.array(
+        [DIVISION_OF_STATE.get(state_code(state) or "", UNLOCATED_SHARD) for state in features.vocab["states"]]
+        + [UNLOCATED_SHARD],  # state_id -1 indexes the last entry
+        dtype=object,
+    )
+    in_shard = state_divisions[features.state_id] == name
+    return np.flatnonzero(in_shard & ~remote)
+
+
+class ShardedCatalog:
+    """Lazily rebuilt region shards over the current feature store version"""
+
+    def __init__(self):
+        self._shards: Dict[str, RegionShard] = {}
+        self._locks = {name: threading.Lock() for name in SHARD_NAMES}
+
+    def shard(self, name: str, features: JobFeatures) -> RegionShard:
+        shard = self._shards.get(name)
+        if shard is not None and shard.version == features.version:
+            return shard
+        with self._locks[name]:
+            shard = self._shards.get(name)
+            if shard is None or shard.version != features.version:
+                shard = RegionShard(name, features.version, _shard_positions(features, name))
+                self._shards[name] = shard
+                SHARD_RELOADS.inc((name,))
+        return shard
+
+    def positions(self, names: Iterable[str], features: JobFeatures) -> np.ndarray:
+        parts = [self.shard(name, features).positions for name in names]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+
+_catalog = ShardedCatalog()
+
+
+def user_coordinates(user) -> Optional[Tuple[float, float]]:
+    if user.latitude and user.longitude:
+        return user.latitude, user.longitude
+    # State-level matches are coarse for scoring but fine for picking a region
+    result = geocode(user.location)
+    return (result.latitude, result.longitude) if result else None
+
+
+def user_shards(user) -> Optional[Set[str]]:
+    """Shards relevant to a user, or None when the user cannot be placed"""
+    coordinates = user_coordinates(user)
+    if coordinates is None:
+        return None
+    lat, lon = coordinates
+    distances = {code: calculate_distance(lat, lon, s_lat, s_lon) for code, _, s_lat, s_lon in STATES}
+    nearest = min(distances, key=distances.get)
+    shards = {DIVISION_OF_STATE[nearest], REMOTE_SHARD, UNLOCATED_SHARD}
+    shards.update(DIVISION_OF_STATE[code] for code, distance in distances.items() if distance <= REGION_RADIUS_MILES)
+    return shards
+
+
+def regional_top_k(user, k: int, exclude_ids: Iterable[int] = ()) -> Optional[List[Tuple[float, int]]]:
+    """
+    Top ``k`` (match_score, job_id) among the user's region, remote and
+    unlocated shards, or None when there is no feature store, the user has no
+    known location or those shards hold no candidates (the caller then
+    queries the database)
+    """
+    features = get_features()
+    names = user_shards(user)
+    if features is None or names is None:
+        return None
+    positions = _catalog.positions(sorted(names), features)
+    exclude = np.fromiter(exclude_ids, dtype=np.int64)
+    if len(exclude) and len(positions):
+        positions = positions[~np.isin(features.job_ids[positions], exclude)]
+    SHARD_CANDIDATES.observe((), len(positions))
+    if not len(positions):
+        return None
+    with timed_section("calculate_job_match_score"):
+        scores = kernel_for(user).bind(features).score_positions(features, positions)
+    return top_k_arrays(scores, features.job_ids[positions], k)
@@ -87,6 +87,7 @@ class JobListingResponse(BaseModel):
     aoi_interal_promption_rate: Optional[float]
     aoi_external_promotion_rate: Optional[float]
     aoi_retention_rate_3yr: Optional[float]
+    aoi_score: Optional[float] = None  # 0-5 composite of the AOI fields
     remote_work: bool
     posted_date: Optional[datetime]
     expires_date: Optional[datetime]
@@ -103,6 +104,8 @@ class PaginatedJobListings(BaseModel):
     skip: int
     limit: int
     jobs: List[JobListingResponse]
+    total_is_estimate: bool = False
+    next_after_id: Optional[int] = None  # keyset cursor for the next page of an id-ordered listing
 
 
 # Swipe/Interaction schemas
@@ -115,6 +118,21 @@ class SwipeCreate(BaseModel):
     session_id: Optional[str] = None
     aspect_swiped: Optional[str] = None  # 'salary', 'location', 'company', 'skills', 'overall'
     time_spent_viewing: Optional[float] = None
+    # Reused by the client on retries; derived from the swipe when a session_id is given
+    idempotency_key: Optional[str] = Field(None, max_length=64)
+
+
+class ImpressionCreate(BaseModel):
+    user_id: int
+    job_listing_id: int
+    interaction_type: str = "shown"  # 'shown' or 'viewed'
+    position_in_deck: Optional[int] = None
+    session_id: Optional[str] = None
+    time_spent_viewing: Optional[float] = None
+
+
+class ImpressionBatchResponse(BaseModel):
+    accepted: int
 
 
 class SwipeResponse(BaseModel):
@@ -129,6 +147,7 @@ class SwipeResponse(BaseModel):
     aspect_swiped: Optional[str]
     time_spent_viewing: Optional[float]
     extra_data: Optional[Dict[str, Any]]
+    idempotency_key: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -142,3 +161,8 @@ class RecommendationResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SimilarJobResponse(BaseModel):
+    job: JobListingResponse
+    similarity: float  # Cosine similarity of job embeddings, -1 to 1
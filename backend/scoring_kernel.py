@@ -0,0 +1,296 @@
+"""
+Per-user scoring kernel for job match scores.
+
+A user's explicit importances and learned preferences are compiled once into
+a kernel: the weight of every score component, the user's coordinates (with
+cos(latitude) precomputed), the skill set, and lookup tables for industries
+(substring match against the user's industry, share among the industries of
+liked jobs). ``ScoringKernel.score`` applies it to one JobListing;
+``ScoringKernel.bind`` resolves the lookup tables against a feature store
+version so ``BoundKernel.score_positions`` scores many rows in one NumPy pass.
+Both paths add the same terms in the same order, so their rounded scores are
+identical.
+
+Components (each score is 0-100, the result is the weighted mean):
+
+    location       100 - miles / 2              x location_importance
+    industry       100 on substring match       x industry_importance
+    salary         30k-150k mapped to 0-100     x salary_importance
+    remote         100 if remote, else 30       x flexibility_importance
+    skills         share of the job's skills    x 2
+    learned salary closeness to preferred_min_salary     x learned weight
+    learned industry share among liked industries        x learned weight
+    learned remote  remote_preference (or 1 - it)       x learned weight
+
+The learned weight is LEARNED_PREFERENCE_WEIGHT scaled by how many liked jobs
+the preferences were computed from, reaching full weight at
+LEARNED_PREFERENCE_FULL_LIKES. Users without learned preferences score
+exactly as before. ``kernel_for(user, learned=False)`` compiles the explicit
+profile only; the ranking model uses it so swipe labels never feed back into
+its features through learned preferences.
+
+``kernel_for(user)`` returns compiled kernels from a small LRU keyed by
+user id and ``updated_at``, which every change to a scoring input bumps
+(preference edits and learned-preference recomputes set it explicitly, other
+ORM updates through ``onupdate``), so an input change compiles a new one and
+a hit costs no serialization. Users without an id or timestamp (not yet
+saved) get an uncached kernel. Callers that score many jobs get the kernel
+once per request and call ``score`` or the vectorized path on it. The scalar
+kernel needs no NumPy, which is only imported when a kernel is bound to the
+feature store.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+LEARNED_PREFERENCE_WEIGHT = float(os.getenv("LEARNED_PREFERENCE_WEIGHT", "1.0"))
+LEARNED_PREFERENCE_FULL_LIKES = int(os.getenv("LEARNED_PREFERENCE_FULL_LIKES", "5"))
+KERNEL_CACHE_SIZE = int(os.getenv("SCORING_KERNEL_CACHE_SIZE", "1024"))
+EARTH_RADIUS_MILES = 3959.0
+SKILLS_WEIGHT = 2
+
+_popcount_table = None
+
+
+def _popcount() -> "np.ndarray":
+    """Set bits per byte, used to popcount skill bitsets"""
+    global _popcount_table
+    if _popcount_table is None:
+        import numpy as np
+        _popcount_table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return _popcount_table
+
+
+class ScoringKernel:
+    """A user's scoring inputs, compiled once and applied to many jobs"""
+
+    def __init__(self, user, learned: bool = True):
+        self.latitude = user.latitude
+        self.longitude = user.longitude
+        self.has_location = bool(user.latitude and user.longitude)
+        self.cos_latitude = math.cos(math.radians(user.latitude)) if self.has_location else 0.0
+        self.industry = (user.industry or "").lower()
+        self.skills = frozenset(s.lower() for s in user.skills or [])
+        self.location_importance = user.location_importance
+        self.industry_importance = user.industry_importance
+        self.salary_importance = user.salary_importance
+        self.flexibility_importance = user.flexibility_importance
+        # Substring matches against the user's industry, filled as industries are seen
+        self._industry_match: Dict[str, bool] = {}
+
+        learned = (user.learned_preferences or {}) if learned else {}
+        likes = learned.get("liked_count")
+        confidence = 1.0 if likes is None else min(1.0, likes / max(1, LEARNED_PREFERENCE_FULL_LIKES))
+        self.learned_weight = LEARNED_PREFERENCE_WEIGHT * confidence
+        active = self.learned_weight > 0
+
+        self.preferred_salary = learned.get("preferred_min_salary") if active else None
+        industries = learned.get("preferred_industries") or {}
+        total = sum(industries.values())
+        self.industry_affinity = {
+            industry: count / total for industry, count in industries.items()
+        } if active and total else None
+        self.remote_preference = learned.get("remote_preference") if active else None
+
+    def industry_matches(self, industry: str) -> bool:
+        matched = self._industry_match.get(industry)
+        if matched is None:
+            matched = self._industry_match[industry] = self.industry in industry.lower()
+        return matched
+
+    def distance(self, latitude: float, longitude: float) -> float:
+        """Haversine miles from the user, same operation order as calculate_distance"""
+        delta_lat = math.radians(latitude - self.latitude)
+        delta_lon = math.radians(longitude - self.longitude)
+        a = (math.sin(delta_lat / 2) ** 2
+             + self.cos_latitude * math.cos(math.radians(latitude)) * math.sin(delta_lon / 2) ** 2)
+        return EARTH_RADIUS_MILES * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+
+    def score(self, job) -> float:
+        """Match score (0-100) of one job"""
+        score = 0.0
+        total_weight = 0.0
+
+        if self.has_location and job.latitude and job.longitude:
+            location_score = max(0, 100 - self.distance(job.latitude, job.longitude) / 2)
+            score += location_score * self.location_importance
+            total_weight += self.location_importance
+
+        if self.industry and job.industry:
+            if self.industry_matches(job.industry):
+                score += 100 * self.industry_importance
+            total_weight += self.industry_importance
+
+        if job.salary_min:
+            salary_score = min(100, (job.salary_min - 30000) / 120000 * 100)
+            score += max(0, salary_score) * self.salary_importance
+            total_weight += self.salary_importance
+
+        score += (100 if job.remote_work else 30) * self.flexibility_importance
+        total_weight += self.flexibility_importance
+
+        if self.skills and job.required_skills:
+            job_skills = {s.lower() for s in job.required_skills}
+            overlap = len(self.skills & job_skills) / len(job_skills)
+            score += overlap * 100 * SKILLS_WEIGHT
+            total_weight += SKILLS_WEIGHT
+
+        if self.preferred_salary and job.salary_min:
+            closeness = max(0.0, 1 - abs(job.salary_min - self.preferred_salary) / self.preferred_salary)
+            score += closeness * 100 * self.learned_weight
+            total_weight += self.learned_weight
+
+        if self.industry_affinity is not None and job.industry:
+            score += self.industry_affinity.get(job.industry, 0.0) * 100 * self.learned_weight
+            total_weight += self.learned_weight
+
+        if self.remote_preference is not None:
+            affinity = self.remote_preference if job.remote_work else 1 - self.remote_preference
+            score += affinity * 100 * self.learned_weight
+            total_weight += self.learned_weight
+
+        return round(score / total_weight if total_weight > 0 else 50.0, 2)
+
+    def bind(self, features) -> "BoundKernel":
+        return BoundKernel(self, features)
+
+
+class BoundKernel:
+    """
+    A kernel with its lookup tables resolved against one feature store
+    version. Picklable, so it is what gets sent to scoring pool workers.
+    """
+
+    def __init__(self, kernel: ScoringKernel, features):
+        import numpy as np
+
+        industries = features.vocab["industries"]
+        self.kernel = kernel
+        self.version = features.version
+        self.industry_match = np.array(
+            [kernel.industry_matches(industry) for industry in industries], dtype=bool
+        ) if kernel.industry else None
+        self.industry_affinity = np.array(
+            [kernel.industry_affinity.get(industry, 0.0) for industry in industries], dtype=np.float64
+        ) if kernel.industry_affinity is not None else None
+        self.skill_bits = features.skill_bits_for(kernel.skills) if kernel.skills else None
+
+    def score_positions(self, features, positions: "np.ndarray") -> "np.ndarray":
+        """Vectorized ScoringKernel.score for the given feature store rows"""
+        import numpy as np
+
+        kernel = self.kernel
+        n = len(positions)
+        score = np.zeros(n, dtype=np.float64)
+        weight = np.zeros(n, dtype=np.float64)
+
+        # Location (both sides need non-zero coordinates)
+        if kernel.has_location:
+            lat = features.latitude[positions]
+            lon = features.longitude[positions]
+            has_coords = ~np.isnan(lat) & ~np.isnan(lon) & (lat != 0) & (lon != 0)
+            delta_lat = np.radians(lat - kernel.latitude)
+            delta_lon = np.radians(lon - kernel.longitude)
+            a = (np.sin(delta_lat / 2) ** 2
+                 + kernel.cos_latitude * np.cos(np.radians(lat)) * np.sin(delta_lon / 2) ** 2)
+            distance = EARTH_RADIUS_MILES * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+            location_score = np.maximum(0, 100 - distance / 2)
+            importance = kernel.location_importance
+            score += np.where(has_coords, location_score * importance, 0)
+            weight += np.where(has_coords, importance, 0)
+
+        industry_id = features.industry_id[positions]
+        has_industry = industry_id >= 0
+
+        if self.industry_match is not None:
+            matched = np.zeros(n, dtype=bool)
+            matched[has_industry] = self.industry_match[industry_id[has_industry]]
+            importance = kernel.industry_importance
+            score += np.where(matched, 100 * importance, 0)
+            weight += np.where(has_industry, importance, 0)
+
+        salary = features.salary_min[positions]
+        has_salary = ~np.isnan(salary) & (salary != 0)
+        salary_score = np.maximum(0, np.minimum(100, (salary - 30000) / 120000 * 100))
+        importance = kernel.salary_importance
+        score += np.where(has_salary, salary_score * importance, 0)
+        weight += np.where(has_salary, importance, 0)
+
+        remote = features.remote[positions] != 0
+        importance = kernel.flexibility_importance
+        score += np.where(remote, 100, 30) * importance
+        weight += importance
+
+        if self.skill_bits is not None:
+            skill_count = features.skill_count[positions].astype(np.float64)
+            has_skills = skill_count > 0
+            shared = np.bitwise_and(features.skill_bits[positions], self.skill_bits)
+            overlap_count = _popcount()[shared.view(np.uint8)].sum(axis=1)
+            overlap = np.divide(overlap_count, skill_count, out=np.zeros(n), where=has_skills)
+            score += np.where(has_skills, overlap * 100 * SKILLS_WEIGHT, 0)
+            weight += np.where(has_skills, SKILLS_WEIGHT, 0)
+
+        learned_weight = kernel.learned_weight
+        if kernel.preferred_salary:
+            preferred = kernel.preferred_salary
+            closeness = np.maximum(0.0, 1 - np.abs(salary - preferred) / preferred)
+            score += np.where(has_salary, closeness * 100 * learned_weight, 0)
+            weight += np.where(has_salary, learned_weight, 0)
+
+        if self.industry_affinity is not None:
+            affinity = np.zeros(n, dtype=np.float64)
+            affinity[has_industry] = self.industry_affinity[industry_id[has_industry]]
+            score += np.where(has_industry, affinity * 100 * learned_weight, 0)
+            weight += np.where(has_industry, learned_weight, 0)
+
+        if kernel.remote_preference is not None:
+            preference = kernel.remote_preference
+            score += np.where(remote, preference, 1 - preference) * 100 * learned_weight
+            weight += learned_weight
+
+        final = np.divide(score, weight, out=np.full(n, 50.0), where=weight > 0)
+        return round_scores(final)
+
+
+def round_scores(values: "np.ndarray") -> "np.ndarray":
+    """
+    Round to 2 decimals exactly like Python's round(). np.round scales by 100
+    first, which flips values sitting just below a .xx5 boundary, so those
+    few are re-rounded in Python.
+    """
+    import numpy as np
+
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(float(v), 2) for v in values[near_half]]
+    return rounded
+
+
+_kernels: "OrderedDict[tuple, ScoringKernel]" = OrderedDict()
+_kernels_lock = threading.Lock()
+
+
+def kernel_for(user, learned: bool = True) -> ScoringKernel:
+    """The user's compiled kernel, shared until one of its inputs changes"""
+    updated_at = getattr(user, "updated_at", None)
+    if user.id is None or updated_at is None:
+        return ScoringKernel(user, learned)
+    key = (user.id, updated_at, learned)
+    with _kernels_lock:
+        kernel = _kernels.get(key)
+        if kernel is not None:
+            _kernels.move_to_end(key)
+            return kernel
+    kernel = ScoringKernel(user, learned)
+    with _kernels_lock:
+        _kernels[key] = kernel
+        while len(_kernels) > KERNEL_CACHE_SIZE:
+            _kernels.popitem(last=False)
+    return kernel
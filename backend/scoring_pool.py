@@ -0,0 +1,140 @@
+"""
+Multi-process catalog scoring.
+
+For large candidate sets, ``calculate_job_match_score`` in a Python loop on
+the request thread is GIL-bound. This module scores candidates with the
+user's vectorized scoring kernel (scoring_kernel.py) over the memory-mapped
+feature store, sharded across a persistent ProcessPoolExecutor. Workers map
+the feature store themselves (shared page cache, only the bound kernel and
+candidate positions are pickled), return per-shard top-K lists, and the
+parent merges them (see ranking.py).
+
+The pool is used automatically once the candidate count reaches
+SCORING_POOL_THRESHOLD and every candidate is present in the current feature
+store version; smaller covered sets are scored by the same kernel in-process,
+and callers fall back to scoring ORM rows only when the store lacks them. Workers
+score against the exact version the request's kernel was bound to, so a
+store published mid-request does not fail it.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import feature_store
+from feature_store import get_features, get_version
+from metrics import timed
+from ranking import merge_top_k, top_k_arrays
+from scoring_kernel import BoundKernel, kernel_for
+
+logger = logging.getLogger(__name__)
+
+SCORING_POOL_THRESHOLD = int(os.getenv("SCORING_POOL_THRESHOLD", "50000"))
+SCORING_POOL_WORKERS = int(os.getenv("SCORING_POOL_WORKERS", str(os.cpu_count() or 1)))
+_worker_store_dir = feature_store.STORE_DIR
+
+
+def _init_worker(store_dir: str):
+    global _worker_store_dir
+    _worker_store_dir = store_dir
+
+
+class VersionUnavailable(RuntimeError):
+    """The feature store version a kernel was bound to has been pruned"""
+
+
+def _score_shard(kernel: BoundKernel, positions: np.ndarray, k: int) -> List[Tuple[float, int]]:
+    # Load exactly the kernel's version: the worker's own CURRENT check may
+    # not have seen a newly published store yet (or may already have)
+    features = get_version(kernel.version, _worker_store_dir)
+    if features is None:
+        raise VersionUnavailable(kernel.version)
+    scores = kernel.score_positions(features, positions)
+    return top_k_arrays(scores, features.job_ids[positions], k)
+
+
+class ScoringPool:
+    """Persistent process pool that scores feature store rows in shards"""
+
+    def __init__(self, workers: int = SCORING_POOL_WORKERS, store_dir: str = feature_store.STORE_DIR):
+        self.workers = max(1, workers)
+        self.store_dir = store_dir
+        # spawn: the API process has threads and open DB connections that must not be forked
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(store_dir,),
+        )
+
+    def top_k(self, kernel: BoundKernel, positions: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        shards = [shard for shard in np.array_split(positions, self.workers) if len(shard)]
+        futures = [self._executor.submit(_score_shard, kernel, shard, k) for shard in shards]
+        return merge_top_k([f.result() for f in futures], k)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: Optional[ScoringPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ScoringPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ScoringPool()
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+@timed("calculate_job_match_score")
+def score_catalog(candidate_ids, user, k: int) -> Optional[List[Tuple[float, int]]]:
+    """
+    Top ``k`` (score, job_id) pairs for ``candidate_ids``, scored with the
+    vectorized kernel: across the process pool from SCORING_POOL_THRESHOLD
+    candidates, in-process below it. None when the candidates are not all in
+    the current feature store (the caller then scores ORM rows one by one).
+    """
+    features = get_features()
+    if features is None:
+        return None
+    positions = features.positions(candidate_ids)
+    if len(positions) != len(candidate_ids):
+        return None
+    kernel = kernel_for(user).bind(features)
+    if len(positions) >= SCORING_POOL_THRESHOLD:
+        try:
+            return get_pool().top_k(kernel, positions, k)
+        except VersionUnavailable:
+            logger.warning("Feature store version %s was pruned while scoring; scoring in-process",
+                           features.version)
+    return top_k_arrays(kernel.score_positions(features, positions), features.job_ids[positions], k)
+
+
+@timed("calculate_job_match_score")
+def score_job_ids(job_ids, user) -> Optional[np.ndarray]:
+    """
+    Match scores for ``job_ids`` (in the same order) in one vectorized pass,
+    or None when they are not all in the current feature store
+    """
+    features = get_features()
+    if features is None:
+        return None
+    positions = features.positions(job_ids)
+    if len(positions) != len(job_ids):
+        return None
+    return kernel_for(user).bind(features).score_positions(features, positions)
@@ -0,0 +1,177 @@
+"""
+Content-based job similarity for "more like this" recommendations.
+
+Each job is embedded with TF-IDF over its title, description, required skills
+and occupation, reduced with TruncatedSVD and L2-normalized, giving a float32
+matrix where cosine similarity is a dot product. Queries are exact top-K
+searches (one matrix-vector product plus argpartition), which stays in the
+millisecond range for a 1M-job catalog at the default 64 dimensions.
+
+Embeddings normally come from the shared feature store (feature_store.py),
+which embeds the catalog when a version is published. Without one,
+``python similarity.py`` saves a standalone index file to
+SIMILARITY_INDEX_PATH; the API's startup warm-up does the same when no file
+exists yet. Requests only ever load a prebuilt index: fitting TF-IDF and SVD
+over the catalog takes seconds, so it never runs on a request path.
+"""
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from feature_store import get_features
+from models import JobListing
+from ranking import top_k_arrays
+
+INDEX_PATH = os.getenv("SIMILARITY_INDEX_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "processed", "job_embeddings.npz")
+N_COMPONENTS = int(os.getenv("JOB_EMBEDDING_DIM", "64"))
+MAX_FEATURES = 50000
+
+
+def job_document(title, description, required_skills, occupation) -> str:
+    """Text used to embed a job; skills and occupation are repeated to outweigh boilerplate"""
+    skills = " ".join(required_skills or [])
+    return " ".join(filter(None, [title, title, occupation, occupation, skills, skills, description]))
+
+
+class JobSimilarityIndex:
+    """Exact cosine top-K search over L2-normalized job vectors"""
+
+    def __init__(self, job_ids: np.ndarray, vectors: np.ndarray):
+        # Only reorder when needed, so memory-mapped inputs are used without a copy
+        if len(job_ids) > 1 and np.any(job_ids[1:] < job_ids[:-1]):
+            order = np.argsort(job_ids)
+            job_ids, vectors = job_ids[order], vectors[order]
+        self.job_ids = np.asarray(job_ids, dtype=np.int64)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def _positions(self, job_ids: Iterable[int]) -> np.ndarray:
+        """Row positions of the given ids, skipping ids that are not indexed"""
+        ids = np.fromiter(job_ids, dtype=np.int64)
+        if not len(ids) or not len(self.job_ids):
+            return np.empty(0, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(self.job_ids, ids), len(self.job_ids) - 1)
+        return pos[self.job_ids[pos] == ids]
+
+    def search(self, query: np.ndarray, k: int, exclude_ids: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Top ``k`` (job_id, cosine similarity) pairs for a query vector"""
+        if not len(self.job_ids) or k <= 0:
+            return []
+        scores = self.vectors @ query.astype(np.float32)
+        excluded = self._positions(exclude_ids)
+        if len(excluded):
+            scores[excluded] = -np.inf
+
+        return [(job_id, score) for score, job_id in top_k_arrays(scores, self.job_ids, k) if np.isfinite(score)]
+
+    def similar_to(self, job_ids: Iterable[int], k: int, exclude_ids: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Jobs most similar to the centroid of ``job_ids`` (the seeds themselves are excluded)"""
+        job_ids = list(job_ids)
+        positions = self._positions(job_ids)
+        if not len(positions):
+            return []
+        centroid = self.vectors[positions].mean(axis=0)
+        norm = np.linalg.norm(centroid)
+        if norm == 0:
+            return []
+        return self.search(centroid / norm, k, exclude_ids=list(exclude_ids) + job_ids)
+
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Per process, as every worker may build the index at startup
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, job_ids=self.job_ids, vectors=self.vectors)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "JobSimilarityIndex":
+        data = np.load(path)
+        return cls(data["job_ids"], data["vectors"])
+
+
+def build_index(db: Session, n_components: int = N_COMPONENTS, batch_size: int = 10000) -> JobSimilarityIndex:
+    """Embed every job listing in the database"""
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
+    rows = db.query(
+        JobListing.id, JobListing.title, JobListing.description,
+        JobListing.required_skills, JobListing.occupation
+    ).order_by(JobListing.id).yield_per(batch_size)
+
+    job_ids, documents = [], []
+    for job_id, title, description, skills, occupation in rows:
+        job_ids.append(job_id)
+        documents.append(job_document(title, description, skills, occupation))
+
+    if not job_ids:
+        return JobSimilarityIndex(np.empty(0, dtype=np.int64), np.empty((0, n_components), dtype=np.float32))
+
+    tfidf = TfidfVectorizer(max_features=MAX_FEATURES, stop_words="english", sublinear_tf=True, dtype=np.float32)
+    matrix = tfidf.fit_transform(documents)
+    n_components = max(1, min(n_components, matrix.shape[1] - 1, len(job_ids) - 1))
+    vectors = TruncatedSVD(n_components=n_components, random_state=0).fit_transform(matrix)
+    vectors = normalize(vectors).astype(np.float32)
+    return JobSimilarityIndex(np.asarray(job_ids, dtype=np.int64), vectors)
+
+
+_index: Optional[JobSimilarityIndex] = None
+_index_version: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[JobSimilarityIndex]:
+    """
+    Process-wide index: the memory-mapped embeddings of the current feature
+    store version (shared across workers), else the saved index file,
+    reloaded when it is rewritten. None when neither exists.
+    """
+    global _index, _index_version
+    features = get_features()
+    if features is not None and features.has_embeddings:
+        version = features.version
+        load = lambda: JobSimilarityIndex(features.job_ids, features.embeddings)
+    else:
+        try:
+            version = f"file:{os.stat(INDEX_PATH).st_mtime_ns}"
+        except FileNotFoundError:
+            return None
+        load = lambda: JobSimilarityIndex.load(INDEX_PATH)
+
+    if _index_version != version:
+        with _index_lock:
+            if _index_version != version:
+                _index = load()
+                _index_version = version
+    return _index
+
+
+def ensure_index(db: Session) -> JobSimilarityIndex:
+    """get_index, building and saving the index file first if there is none (startup and CLI only)"""
+    index = get_index()
+    if index is None:
+        build_index(db).save()
+        index = get_index()
+    return index
+
+
+if __name__ == "__main__":
+    import time
+    from database import SessionLocal
+
+    start = time.perf_counter()
+    session = SessionLocal()
+    try:
+        index = build_index(session)
+    finally:
+        session.close()
+    index.save()
+    print(f"Indexed {len(index)} jobs ({index.vectors.shape[1]} dims) in {time.perf_counter() - start:.1f}s")
+    print(f"Saved to {INDEX_PATH}")
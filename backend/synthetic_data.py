@@ -0,0 +1,475 @@
+"""
+Synthetic data generator for load and scaling tests.
+
+Produces job listings, users and swipe histories with realistic shapes:
+listings are spread over states/metros weighted by population, occupations
+follow SOC codes with employment-weighted frequencies and log-normal salaries,
+AOI badges correlate with the promotion/retention rates, and user activity
+follows a power law (a few heavy swipers, a long tail of light ones).
+
+Rows are generated lazily and streamed to the database in chunks: PostgreSQL
+uses COPY FROM STDIN, other databases fall back to batched executemany, so
+memory stays flat even for millions of rows.
+
+    python synthetic_data.py --jobs 1000000 --users 10000
+    python synthetic_data.py --jobs 100000 --users 10000 --swipes 500000 --database-url sqlite:///../data/processed/load.db
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from aoi import compute_aoi_score
+from geocoder import SAMPLE_GAZETTEER_PATH, Gazetteer, normalize_city
+
+# (state, population weight in millions, [(metro, weight)]); metro coordinates
+# come from the development gazetteer (see _metro_coordinates)
+STATES = [
+    ("CA", 39.0, [("Los Angeles", 5), ("San Francisco", 3), ("San Diego", 2), ("Sacramento", 1)]),
+    ("TX", 30.0, [("Houston", 4), ("Dallas", 4), ("Austin", 2), ("San Antonio", 2)]),
+    ("FL", 22.0, [("Miami", 4), ("Orlando", 2), ("Tampa", 2), ("Jacksonville", 1)]),
+    ("NY", 19.6, [("New York", 8), ("Buffalo", 1), ("Rochester", 1)]),
+    ("PA", 13.0, [("Philadelphia", 3), ("Pittsburgh", 2)]),
+    ("IL", 12.5, [("Chicago", 6), ("Springfield", 1)]),
+    ("OH", 11.8, [("Columbus", 2), ("Cleveland", 2), ("Cincinnati", 2)]),
+    ("GA", 11.0, [("Atlanta", 5), ("Savannah", 1)]),
+    ("NC", 10.8, [("Charlotte", 3), ("Raleigh", 2)]),
+    ("MI", 10.0, [("Detroit", 3), ("Grand Rapids", 1)]),
+    ("NJ", 9.3, [("Newark", 2), ("Jersey City", 1)]),
+    ("VA", 8.7, [("Arlington", 2), ("Richmond", 1)]),
+    ("WA", 7.8, [("Seattle", 4), ("Redmond", 1), ("Spokane", 1)]),
+    ("AZ", 7.4, [("Phoenix", 4), ("Tucson", 1)]),
+    ("MA", 7.0, [("Boston", 4), ("Worcester", 1)]),
+    ("TN", 7.0, [("Nashville", 2), ("Memphis", 1)]),
+    ("CO", 5.9, [("Denver", 3), ("Colorado Springs", 1)]),
+    ("MN", 5.7, [("Minneapolis", 3), ("Saint Paul", 1)]),
+    ("OR", 4.2, [("Portland", 3)]),
+    ("UT", 3.4, [("Salt Lake City", 2)]),
+]
+
+# (SOC code, occupation, industry, median salary, employment weight, skills)
+OCCUPATIONS = [
+    ("41-2031.00", "Retail Salespersons", "Retail", 33000, 9.0,
+     ["Customer Service", "Sales", "Point of Sale", "Communication", "Merchandising"]),
+    ("41-2011.00", "Cashiers", "Retail", 29000, 7.0,
+     ["Customer Service", "Cash Handling", "Point of Sale", "Communication"]),
+    ("35-3031.00", "Waiters and Waitresses", "Hospitality", 31000, 5.0,
+     ["Customer Service", "Food Safety", "Communication", "Teamwork"]),
+    ("35-2014.00", "Cooks, Restaurant", "Hospitality", 35000, 3.5,
+     ["Food Safety", "Food Preparation", "Teamwork", "Time Management"]),
+    ("43-4051.00", "Customer Service Representatives", "Professional Services", 39000, 6.0,
+     ["Customer Service", "Communication", "CRM Software", "Problem Solving"]),
+    ("53-7062.00", "Laborers and Freight, Stock, and Material Movers", "Transportation", 36000, 6.0,
+     ["Forklift", "Inventory", "Safety Procedures", "Teamwork"]),
+    ("53-3032.00", "Heavy and Tractor-Trailer Truck Drivers", "Transportation", 50000, 4.0,
+     ["CDL", "Route Planning", "Safety Procedures", "Vehicle Inspection"]),
+    ("43-6014.00", "Secretaries and Administrative Assistants", "Professional Services", 41000, 4.0,
+     ["Scheduling", "Microsoft Office", "Communication", "Data Entry"]),
+    ("31-1131.00", "Nursing Assistants", "Healthcare", 36000, 3.5,
+     ["Patient Care", "Vital Signs", "CPR", "Communication"]),
+    ("29-1141.00", "Registered Nurses", "Healthcare", 82000, 4.5,
+     ["Patient Care", "Nursing", "EMR", "CPR", "Medication Administration"]),
+    ("29-2052.00", "Pharmacy Technicians", "Healthcare", 38000, 1.5,
+     ["Pharmacology", "Customer Service", "Inventory", "Data Entry"]),
+    ("11-1021.00", "General and Operations Managers", "Professional Services", 101000, 3.5,
+     ["Leadership", "Budgeting", "Project Management", "Communication"]),
+    ("13-2011.00", "Accountants and Auditors", "Financial Services", 79000, 2.0,
+     ["Accounting", "Excel", "GAAP", "Auditing"]),
+    ("13-2051.00", "Financial Analysts", "Financial Services", 96000, 1.0,
+     ["Excel", "Financial Modeling", "SQL", "Data Analysis"]),
+    ("15-1252.00", "Software Developers", "Technology", 130000, 2.5,
+     ["Python", "JavaScript", "SQL", "Git", "Cloud Platforms", "React"]),
+    ("15-2051.00", "Data Scientists", "Technology", 108000, 0.6,
+     ["Python", "SQL", "Machine Learning", "Statistics", "Data Analysis"]),
+    ("15-1211.00", "Computer Systems Analysts", "Technology", 103000, 0.8,
+     ["SQL", "Systems Analysis", "Requirements Gathering", "Project Management"]),
+    ("11-3021.00", "Computer and Information Systems Managers", "Technology", 169000, 0.7,
+     ["Leadership", "Cloud Platforms", "Budgeting", "Project Management"]),
+    ("51-4121.00", "Welders, Cutters, Solderers, and Brazers", "Manufacturing", 48000, 1.2,
+     ["Welding", "Blueprint Reading", "Safety Procedures", "Metal Fabrication"]),
+    ("51-2090.00", "Assemblers and Fabricators", "Manufacturing", 39000, 2.5,
+     ["Assembly", "Quality Control", "Safety Procedures", "Hand Tools"]),
+    ("47-2111.00", "Electricians", "Construction", 61000, 1.3,
+     ["Electrical Wiring", "Blueprint Reading", "Safety Procedures", "Troubleshooting"]),
+    ("47-2031.00", "Carpenters", "Construction", 52000, 1.3,
+     ["Carpentry", "Blueprint Reading", "Hand Tools", "Safety Procedures"]),
+    ("49-9021.00", "HVAC Mechanics and Installers", "Construction", 52000, 0.8,
+     ["HVAC", "Troubleshooting", "Electrical Wiring", "Customer Service"]),
+    ("25-2021.00", "Elementary School Teachers", "Education", 63000, 2.5,
+     ["Curriculum Development", "Classroom Management", "Communication", "Lesson Planning"]),
+    ("33-3051.00", "Police and Sheriff's Patrol Officers", "Government", 67000, 1.2,
+     ["Law Enforcement", "Communication", "Report Writing", "Conflict Resolution"]),
+]
+
+COMPANY_SUFFIXES = ["Inc.", "LLC", "Group", "Corp.", "Partners", "Co.", "Holdings", "Services"]
+COMPANY_WORDS = ["Summit", "Pioneer", "Harbor", "Evergreen", "Keystone", "Liberty", "Northstar",
+                 "Cascade", "Frontier", "Granite", "Meridian", "Beacon", "Redwood", "Prairie"]
+EMPLOYMENT_TYPES = (["Full-time"] * 8) + ["Part-time", "Contract"]
+EDUCATION_BY_SALARY = [(45000, "High school diploma"), (70000, "Associate degree"),
+                       (float("inf"), "Bachelor's degree")]
+
+# Fraction of listings that are remote-eligible, by industry
+REMOTE_RATE = {"Technology": 0.45, "Financial Services": 0.3, "Professional Services": 0.25}
+
+JOB_COLUMNS = [
+    "id", "created_at", "nlx_id", "title", "company", "description", "location", "city", "state",
+    "zip_code", "latitude", "longitude", "industry", "occupation", "occupation_code", "salary_min",
+    "salary_max", "salary_currency", "employment_type", "required_skills", "education_required",
+    "experience_required", "aoi_overall_badge", "aoi_badge_early_career", "aoi_badge_growth",
+    "aoi_badge_stability", "aoi_interal_promption_rate", "aoi_external_promotion_rate",
+    "aoi_retention_rate_3yr", "aoi_score", "remote_work", "posted_date", "expires_date", "url", "extra_data",
+]
+USER_COLUMNS = [
+    "id", "created_at", "updated_at", "location", "latitude", "longitude", "work_location",
+    "industry", "occupation", "skills", "location_importance", "industry_importance",
+    "salary_importance", "growth_importance", "flexibility_importance", "learned_preferences",
+]
+SWIPE_COLUMNS = [
+    "id", "user_id", "job_listing_id", "created_at", "interaction_type", "swipe_direction",
+    "position_in_deck", "session_id", "aspect_swiped", "time_spent_viewing", "extra_data",
+]
+
+
+def _cumulative(weights):
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+_STATE_CUM = _cumulative([s[1] for s in STATES])
+_OCCUPATION_CUM = _cumulative([o[4] for o in OCCUPATIONS])
+
+
+@lru_cache(maxsize=None)
+def _metro_coordinates():
+    """(city, state) -> (latitude, longitude) for every metro, from geocoder.SAMPLE_GAZETTEER_PATH"""
+    gazetteer = Gazetteer.load(SAMPLE_GAZETTEER_PATH)
+    return {
+        (city, state): gazetteer.cities[(normalize_city(city), state)]
+        for state, _, metros in STATES for city, _ in metros
+    }
+
+
+def _pick_place(rng):
+    state, _, metros = rng.choices(STATES, cum_weights=_STATE_CUM)[0]
+    city, _ = rng.choices(metros, weights=[m[1] for m in metros])[0]
+    lat, lon = _metro_coordinates()[(city, state)]
+    # Spread listings over the metro area (~25 miles)
+    return state, city, lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.25)
+
+
+def _aoi_profile(rng):
+    """Badges and rates drawn from one latent employer quality so they correlate"""
+    quality = rng.betavariate(2, 3)
+
+    def badge(q):
+        if q > 0.6:
+            return "Platinum"
+        if q > 0.4:
+            return "Gold"
+        return "NA"
+
+    return {
+        "aoi_overall_badge": badge(quality),
+        "aoi_badge_early_career": badge(quality + rng.gauss(0, 0.1)),
+        "aoi_badge_growth": badge(quality + rng.gauss(0, 0.1)),
+        "aoi_badge_stability": badge(quality + rng.gauss(0, 0.1)),
+        "aoi_interal_promption_rate": round(min(0.6, max(0.0, 0.05 + 0.3 * quality + rng.gauss(0, 0.03))), 3),
+        "aoi_external_promotion_rate": round(min(0.6, max(0.0, 0.15 + 0.2 * quality + rng.gauss(0, 0.04))), 3),
+        "aoi_retention_rate_3yr": round(min(0.95, max(0.1, 0.35 + 0.4 * quality + rng.gauss(0, 0.05))), 3),
+    }
+
+
+def generate_jobs(count, seed=0, start_id=1):
+    """Yield JobListing rows (dicts keyed by JOB_COLUMNS) one at a time"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for i in range(count):
+        job_id = start_id + i
+        soc, occupation, industry, median, _, skills = rng.choices(OCCUPATIONS, cum_weights=_OCCUPATION_CUM)[0]
+        state, city, lat, lon = _pick_place(rng)
+        salary_min = round(median * math.exp(rng.gauss(-0.1, 0.25)), -2)
+        salary_max = round(salary_min * rng.uniform(1.1, 1.4), -2)
+        remote = rng.random() < REMOTE_RATE.get(industry, 0.03)
+        company = f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_SUFFIXES)}"
+        posted = now - timedelta(days=rng.expovariate(1 / 14))
+        education = next(label for limit, label in EDUCATION_BY_SALARY if salary_min < limit)
+        row = {
+            "id": job_id,
+            "created_at": posted,
+            "nlx_id": f"SYN{job_id:09d}",
+            "title": occupation if rng.random() < 0.6 else f"Senior {occupation}",
+            "company": company,
+            "description": f"{company} is hiring {occupation.lower()} in {city}, {state}.",
+            "location": "Remote" if remote and rng.random() < 0.3 else f"{city}, {state}",
+            "city": city,
+            "state": state,
+            "zip_code": None,
+            "latitude": round(lat, 5),
+            "longitude": round(lon, 5),
+            "industry": industry,
+            "occupation": occupation,
+            "occupation_code": soc,
+            "salary_min": salary_min,
+            "salary_max": salary_max,
+            "salary_currency": "USD",
+            "employment_type": rng.choice(EMPLOYMENT_TYPES),
+            "required_skills": rng.sample(skills, rng.randint(2, len(skills))),
+            "education_required": education,
+            "experience_required": rng.choice(["0-1 years", "1-3 years", "2-4 years", "5+ years"]),
+            "remote_work": remote,
+            "posted_date": posted,
+            "expires_date": posted + timedelta(days=60),
+            "url": f"https://example.com/job/{job_id}",
+            "extra_data": None,
+        }
+        row.update(_aoi_profile(rng))
+        # Bulk inserts bypass the ORM event that sets aoi_score
+        row["aoi_score"] = compute_aoi_score(
+            row["aoi_overall_badge"], row["aoi_badge_early_career"], row["aoi_badge_growth"],
+            row["aoi_badge_stability"], row["aoi_interal_promption_rate"], row["aoi_external_promotion_rate"],
+            row["aoi_retention_rate_3yr"],
+        )
+        yield row
+
+
+def generate_users(count, seed=0, start_id=1):
+    """Yield User rows (dicts keyed by USER_COLUMNS) one at a time"""
+    rng = random.Random(seed + 1)
+    now = datetime.utcnow()
+    for i in range(count):
+        _, occupation, industry, _, _, skills = rng.choices(OCCUPATIONS, cum_weights=_OCCUPATION_CUM)[0]
+        state, city, lat, lon = _pick_place(rng)
+        created = now - timedelta(days=rng.uniform(0, 90))
+        yield {
+            "id": start_id + i,
+            "created_at": created,
+            "updated_at": created,
+            "location": f"{city}, {state}",
+            "latitude": round(lat, 5),
+            "longitude": round(lon, 5),
+            "work_location": rng.choice(["On-site", "Hybrid", "Remote", None]),
+            "industry": industry if rng.random() < 0.7 else None,
+            "occupation": occupation,
+            "skills": rng.sample(skills, rng.randint(1, len(skills))),
+            "location_importance": rng.randint(1, 5),
+            "industry_importance": rng.randint(1, 5),
+            "salary_importance": rng.randint(1, 5),
+            "growth_importance": rng.randint(1, 5),
+            "flexibility_importance": rng.randint(1, 5),
+            "learned_preferences": {},
+        }
+
+
+def generate_swipes(total, user_count, job_count, seed=0, user_start_id=1, job_start_id=1,
+                    start_id=1, alpha=1.2):
+    """
+    Yield UserJobListing rows with power-law activity per user.
+
+    Each user's share of ``total`` is drawn from a Pareto(alpha) distribution,
+    so most users swipe a handful of times while a few swipe thousands.
+    Users are processed one at a time, so only one user's weight is in memory
+    beyond the per-user weight list.
+    """
+    rng = random.Random(seed + 2)
+    weights = [rng.paretovariate(alpha) for _ in range(user_count)]
+    scale = total / sum(weights)
+    now = datetime.utcnow()
+    swipe_id = start_id
+    emitted = 0
+    for offset, weight in enumerate(weights):
+        remaining = total - emitted
+        if remaining <= 0:
+            break
+        n = remaining if offset == user_count - 1 else min(remaining, int(round(weight * scale)))
+        user_id = user_start_id + offset
+        like_rate = rng.uniform(0.2, 0.6)
+        at = now - timedelta(days=rng.uniform(0, 60))
+        session = 0
+        for position in range(n):
+            # New session roughly every 15 cards
+            if position % 15 == 0:
+                session += 1
+                at += timedelta(hours=rng.expovariate(1 / 20))
+            at += timedelta(seconds=rng.expovariate(1 / 8))
+            liked = rng.random() < like_rate
+            yield {
+                "id": swipe_id,
+                "user_id": user_id,
+                "job_listing_id": job_start_id + rng.randrange(job_count),
+                "created_at": at,
+                "interaction_type": "swipe_right" if liked else "swipe_left",
+                "swipe_direction": "right" if liked else "left",
+                "position_in_deck": position % 15,
+                "session_id": f"syn-{user_id}-{session}",
+                "aspect_swiped": rng.choices(["overall", "salary", "location", "company", "skills"],
+                                             weights=[6, 1, 1, 1, 1])[0],
+                "time_spent_viewing": round(rng.lognormvariate(1.8, 0.6), 2),
+                "extra_data": None,
+            }
+            swipe_id += 1
+        emitted += n
+
+
+class _CsvStream(io.RawIOBase):
+    """File-like object that renders rows to CSV lazily, for COPY FROM STDIN"""
+
+    def __init__(self, rows, columns, chunk_rows=5000):
+        self._rows = iter(rows)
+        self._columns = columns
+        self._chunk_rows = chunk_rows
+        self._buffer = b""
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def _format(self, value):
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, datetime):
+            return value.isoformat(sep=" ")
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+    def _fill(self):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for _ in range(self._chunk_rows):
+            row = next(self._rows, None)
+            if row is None:
+                break
+            writer.writerow([self._format(row[c]) for c in self._columns])
+            self.count += 1
+        self._buffer += out.getvalue().encode("utf-8")
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = 1 << 20
+        while len(self._buffer) < size:
+            before = len(self._buffer)
+            self._fill()
+            if len(self._buffer) == before:
+                break
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def copy_rows(engine, table, columns, rows, batch_size=5000):
+    """Stream rows into a table: COPY on PostgreSQL, batched executemany elsewhere"""
+    from sqlalchemy import insert
+    from database import copy_in
+    from models import Base
+
+    if engine.dialect.name == "postgresql":
+        stream = _CsvStream(rows, columns)
+        raw = engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                copy_in(
+                    cursor,
+                    f'COPY "{table}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')',
+                    stream,
+                )
+                # Explicit ids bypass the serial sequence, so move it past them
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"
+                )
+            raw.commit()
+        finally:
+            raw.close()
+        return stream.count
+
+    statement = insert(Base.metadata.tables[table])
+    count = 0
+    with engine.begin() as conn:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.execute(statement, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.execute(statement, batch)
+            count += len(batch)
+    return count
+
+
+def _next_id(engine, table):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        return (conn.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"')).scalar() or 0) + 1
+
+
+def populate(engine, jobs=0, users=0, swipes=0, seed=0):
+    """Append synthetic jobs, users and swipes to the database behind ``engine``"""
+    counts = {}
+    job_start = _next_id(engine, "job_listing")
+    user_start = _next_id(engine, "user")
+    if jobs:
+        counts["job_listing"] = copy_rows(engine, "job_listing", JOB_COLUMNS,
+                                          generate_jobs(jobs, seed, start_id=job_start))
+    if users:
+        counts["user"] = copy_rows(engine, "user", USER_COLUMNS,
+                                   generate_users(users, seed, start_id=user_start))
+    if swipes and jobs and users:
+        counts["user_job_listing"] = copy_rows(
+            engine, "user_job_listing", SWIPE_COLUMNS,
+            generate_swipes(swipes, users, jobs, seed, user_start_id=user_start, job_start_id=job_start,
+                            start_id=_next_id(engine, "user_job_listing")),
+        )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream synthetic jobs, users and swipes into the database")
+    parser.add_argument("--database-url", help="Target database (default: DATABASE_URL)")
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--swipes", type=int, default=0, help="Total swipe events across all users")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from database import engine
+    from models import Base
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    counts = populate(engine, jobs=args.jobs, users=args.users, swipes=args.swipes, seed=args.seed)
+    if counts.get("job_listing"):
+        from cache import invalidate_catalog
+        from database import SessionLocal
+        from feature_store import refresh_feature_store
+
+        session = SessionLocal()
+        try:
+            refresh_feature_store(session)
+        finally:
+            session.close()
+        invalidate_catalog()
+    elapsed = time.perf_counter() - start
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+    print(f"Done in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
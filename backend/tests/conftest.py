@@ -0,0 +1,76 @@
+"""
+Shared test setup. The backend modules read their configuration at import,
+so the environment points at a throwaway SQLite database, an in-process
+cache, an empty feature store and the sample gazetteer before anything is
+imported.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import httpx
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp_dir, "test.db")
+os.environ["CACHE_URL"] = "memory://"
+os.environ["FEATURE_STORE_DIR"] = os.path.join(_tmp_dir, "features")
+os.environ["SIMILARITY_INDEX_PATH"] = os.path.join(_tmp_dir, "job_embeddings.npz")
+# No full gazetteer: geocoding uses the bundled sample
+os.environ["GAZETTEER_PATH"] = os.path.join(_tmp_dir, "us_gazetteer_full.csv")
+os.environ["STARTUP_WARMUP"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def cache_backend():
+    """A fresh shared cache store for every test"""
+    from cache import MemoryBackend, set_backend
+
+    backend = MemoryBackend()
+    set_backend(backend)
+    return backend
+
+
+class ApiClient:
+    """Blocking calls into the app over an in-process ASGI transport"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, http: httpx.AsyncClient):
+        self.loop = loop
+        self.http = http
+
+    def get(self, path: str, **kwargs) -> httpx.Response:
+        return self.loop.run_until_complete(self.http.get(path, **kwargs))
+
+    def post(self, path: str, **kwargs) -> httpx.Response:
+        return self.loop.run_until_complete(self.http.post(path, **kwargs))
+
+
+@pytest.fixture
+def client():
+    """The API with its lifespan (schema setup, impression buffer) running"""
+    from main import app
+
+    loop = asyncio.new_event_loop()
+    lifespan = app.router.lifespan_context(app)
+    loop.run_until_complete(lifespan.__aenter__())
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    try:
+        yield ApiClient(loop, http)
+    finally:
+        loop.run_until_complete(http.aclose())
+        loop.run_until_complete(lifespan.__aexit__(None, None, None))
+        loop.close()
+
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
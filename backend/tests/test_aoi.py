@@ -0,0 +1,51 @@
+"""AOI composite score"""
+import pytest
+
+from aoi import MAX_SCORE, compute_aoi_score
+
+
+def test_scores_are_rounded_to_two_decimals():
+    assert compute_aoi_score(None, None, None, None, None, None, 0.333) == 0.83
+
+
+def test_no_aoi_data():
+    assert compute_aoi_score(None, None, None, None, None, None, None) is None
+
+
+def test_best_and_worst_listings_hit_the_bounds():
+    assert compute_aoi_score("Platinum", "Platinum", "Platinum", "Platinum", 0.5, 0.3, 1.0) == MAX_SCORE
+    assert compute_aoi_score("NA", "NA", "NA", "NA", 0.0, 0.0, 0.0) == 0.0
+
+
+def test_badge_points_and_overall_weight():
+    # Overall counts twice: 2 x Gold (0.5) out of 5 badge slots
+    assert compute_aoi_score("Gold", None, None, None, None, None, None) == pytest.approx(5 * 1.0 / 5)
+    assert compute_aoi_score(None, "Gold", None, None, None, None, None) == pytest.approx(5 * 0.5 / 5)
+    assert compute_aoi_score(None, None, "Platinum", None, None, None, None) == pytest.approx(5 * 1.0 / 5)
+    assert compute_aoi_score("silver", None, None, None, None, None, None) == 0.0
+
+
+def test_badge_names_are_case_insensitive():
+    assert compute_aoi_score("PLATINUM", None, None, None, None, None, None) == \
+        compute_aoi_score("platinum", None, None, None, None, None, None)
+
+
+def test_promotion_rates_are_capped():
+    capped = compute_aoi_score(None, None, None, None, 0.3, None, None)
+    assert compute_aoi_score(None, None, None, None, 0.9, None, None) == capped
+    assert compute_aoi_score(None, None, None, None, 0.15, None, None) == pytest.approx(capped / 2)
+
+
+def test_rates_are_averaged_over_those_present():
+    # Badges (all zero) and the mean rate weigh half each
+    assert compute_aoi_score(None, None, None, None, 0.3, None, 0.6) == pytest.approx(5 * 0.8 / 2)
+    assert compute_aoi_score("NA", "NA", "NA", "NA", None, None, 0.4) == pytest.approx(5 * 0.4 / 2)
+
+
+@pytest.mark.parametrize("args", [
+    ("Platinum", "Gold", None, "NA", 0.12, 0.45, 0.8),
+    ("Gold", "Gold", "Gold", "Gold", None, None, None),
+    (None, None, None, None, 1.0, 1.0, 2.0),
+])
+def test_score_stays_within_bounds(args):
+    assert 0.0 <= compute_aoi_score(*args) <= MAX_SCORE
@@ -0,0 +1,122 @@
+"""Two-tier cache"""
+import threading
+import time
+
+import cache
+from cache import MemoryBackend, SQLiteBackend, TieredCache, set_backend
+
+
+def _counting_loader(value):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return value
+    return load, calls
+
+
+def test_loads_once_then_serves_from_cache():
+    tiered = TieredCache("t1", ttl=60)
+    load, calls = _counting_loader({"a": 1})
+    assert tiered.get_or_load("k", load) == {"a": 1}
+    assert tiered.get_or_load("k", load) == {"a": 1}
+    assert len(calls) == 1
+
+
+def test_other_workers_read_the_shared_tier():
+    load, calls = _counting_loader([1, 2, 3])
+    TieredCache("t2", ttl=60).get_or_load("k", load)
+    # A second instance of the same cache stands in for another worker
+    assert TieredCache("t2", ttl=60).get_or_load("k", load) == [1, 2, 3]
+    assert len(calls) == 1
+
+
+def test_set_backend_drops_local_entries():
+    load, calls = _counting_loader("v")
+    cache.job_cache.get_or_load("k", load)
+    set_backend(MemoryBackend())
+    cache.job_cache.get_or_load("k", load)
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_load_once():
+    tiered = TieredCache("t3", ttl=60)
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.05)
+        return "v"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tiered.get_or_load("k", slow_load)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["v"] * 8
+    assert len(calls) == 1
+
+
+def test_versions_change_on_invalidation():
+    catalog, user, other = cache.catalog_version(), cache.user_version(1), cache.user_version(2)
+    cache.invalidate_user(1)
+    assert cache.user_version(1) != user
+    assert cache.user_version(2) == other
+    assert cache.catalog_version() == catalog
+    cache.invalidate_catalog()
+    assert cache.catalog_version() != catalog
+
+
+class CountingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super().get(key)
+
+
+def test_catalog_version_is_kept_in_process(monkeypatch):
+    backend = CountingBackend()
+    set_backend(backend)
+    monkeypatch.setattr(cache, "CACHE_CATALOG_VERSION_TTL", 0.05)
+    version = cache.catalog_version()
+    assert cache.catalog_version() == version
+    assert backend.gets == 1
+
+    # Another worker's invalidation shows up once the in-process copy expires
+    backend.incr("version:catalog")
+    assert cache.catalog_version() == version
+    time.sleep(0.06)
+    assert cache.catalog_version() != version
+
+
+class BrokenBackend:
+    def __getattr__(self, name):
+        def fail(*args):
+            raise ConnectionError("shared store down")
+        return fail
+
+
+def test_shared_store_outage_still_computes():
+    set_backend(BrokenBackend())
+    load, calls = _counting_loader(42)
+    assert TieredCache("t4", ttl=60).get_or_load("k", load) == 42
+    assert len(calls) == 1
+
+
+def test_sqlite_backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    backend.set("a", "1", 60)
+    assert backend.get("a") == "1"
+    assert backend.add("a", "2", 60) is False
+    assert backend.add("b", "2", 60) is True
+    assert backend.incr("n") == 1
+    assert backend.incr("n") == 2
+    backend.set("expired", "x", -1)
+    assert backend.get("expired") is None
+    backend.delete("a")
+    assert backend.get("a") is None
@@ -0,0 +1,148 @@
+"""Impression write-behind buffer: backpressure, retries and draining"""
+import asyncio
+import threading
+
+import pytest
+
+from event_buffer import BufferFull, ImpressionBuffer
+
+
+class FakeSession:
+    """Records inserted rows; ``fail`` write attempts raise first, ``gate`` can hold writes back"""
+
+    def __init__(self, store):
+        self.store = store
+        self.pending = []
+
+    def execute(self, statement, rows):
+        if self.store.gate is not None:
+            self.store.gate.wait()
+        if self.store.fail > 0:
+            self.store.fail -= 1
+            raise RuntimeError("database unavailable")
+        self.pending.extend(rows)
+
+    def commit(self):
+        self.store.rows.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class FakeStore:
+    def __init__(self, fail=0, gate=None):
+        self.rows = []
+        self.fail = fail
+        self.gate = gate
+
+    def session(self):
+        return FakeSession(self)
+
+
+def _row(i):
+    return {"user_id": 1, "job_listing_id": i, "interaction_type": "shown"}
+
+
+def _job_ids(rows):
+    return sorted(row["job_listing_id"] for row in rows)
+
+
+async def _until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_full_buffer_rejects_the_whole_batch():
+    gate = threading.Event()
+    store = FakeStore(gate=gate)
+
+    async def scenario():
+        buffer = ImpressionBuffer(store.session, flush_events=1, flush_ms=10, queue_size=2, enqueue_timeout_ms=30)
+        await buffer.start()
+        # The flush task takes the first event and blocks writing it
+        await buffer.put_many([_row(1)])
+        await _until(lambda: buffer.depth() == 0)
+        await buffer.put_many([_row(2)])
+
+        with pytest.raises(BufferFull):
+            await buffer.put_many([_row(3), _row(4)])
+        assert buffer.depth() == 1
+        with pytest.raises(BufferFull):
+            await buffer.put_many([_row(i) for i in range(5, 8)])
+
+        # The client's retry of the refused batch is written once
+        gate.set()
+        await _until(lambda: buffer.depth() == 0)
+        await buffer.put_many([_row(3), _row(4)])
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert _job_ids(store.rows) == [1, 2, 3, 4]
+
+
+def test_waits_for_room_within_the_timeout():
+    gate = threading.Event()
+    store = FakeStore(gate=gate)
+
+    async def scenario():
+        buffer = ImpressionBuffer(store.session, flush_events=1, flush_ms=10, queue_size=1, enqueue_timeout_ms=2000)
+        await buffer.start()
+        await buffer.put_many([_row(1)])
+        await _until(lambda: buffer.depth() == 0)
+        await buffer.put_many([_row(2)])
+        asyncio.get_running_loop().call_later(0.05, gate.set)
+        await buffer.put_many([_row(3)])
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert _job_ids(store.rows) == [1, 2, 3]
+
+
+def test_failed_writes_are_retried():
+    store = FakeStore(fail=2)
+
+    async def scenario():
+        buffer = ImpressionBuffer(store.session, flush_ms=10, retry_initial_ms=1, retry_max_ms=2)
+        await buffer.start()
+        await buffer.put_many([_row(1), _row(2)])
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert _job_ids(store.rows) == [1, 2]
+    assert store.fail == 0
+
+
+def test_batch_is_dropped_after_the_last_retry():
+    store = FakeStore(fail=10)
+
+    async def scenario():
+        buffer = ImpressionBuffer(store.session, flush_ms=10, flush_retries=2, retry_initial_ms=1)
+        await buffer.start()
+        await buffer.put_many([_row(1)])
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert store.rows == []
+    assert store.fail == 7
+
+
+def test_stop_drains_the_queue():
+    store = FakeStore()
+
+    async def scenario():
+        buffer = ImpressionBuffer(store.session, flush_events=10, flush_ms=200)
+        await buffer.start()
+        await buffer.put_many([_row(i) for i in range(25)])
+        await buffer.stop()
+        assert not buffer.running
+        with pytest.raises(BufferFull):
+            await buffer.put_many([_row(99)])
+
+    asyncio.run(scenario())
+    assert _job_ids(store.rows) == list(range(25))
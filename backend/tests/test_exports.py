@@ -0,0 +1,29 @@
+"""Access to the HTTP interaction export"""
+import pytest
+
+import database
+import views
+
+
+@pytest.fixture
+def exports_enabled(monkeypatch):
+    monkeypatch.setattr(views, "EXPORTS_ENABLED", True)
+
+
+def test_disabled_by_default(client):
+    assert client.get("/api/exports/interactions").status_code == 404
+
+
+def test_refused_without_a_replica(client, exports_enabled, monkeypatch):
+    monkeypatch.setattr(database, "_replica_engines", [])
+    response = client.get("/api/exports/interactions")
+    assert response.status_code == 503
+    assert "exports.py" in response.json()["detail"]
+
+
+def test_streams_from_a_replica(client, exports_enabled, monkeypatch):
+    # The test database stands in for a replica
+    monkeypatch.setattr(database, "_replica_engines", [database.get_engine()])
+    response = client.get("/api/exports/interactions", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.text.startswith("interaction_id,")
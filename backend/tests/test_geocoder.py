@@ -0,0 +1,64 @@
+"""Free-text location parsing and gazetteer fallbacks"""
+import pytest
+
+from geocoder import SAMPLE_GAZETTEER_PATH, Gazetteer, build_gazetteer, fill_job_coordinates, normalize_city
+from models import JobListing
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.load(SAMPLE_GAZETTEER_PATH)
+
+
+@pytest.mark.parametrize("text", ["Chicago, IL", "chicago il", "Chicago, Illinois", "Remote - Chicago, IL"])
+def test_city_and_state_formats(gazetteer, text):
+    assert gazetteer.geocode(text) == (41.8781, -87.6298, "city")
+
+
+def test_zip_code_wins(gazetteer):
+    assert gazetteer.geocode("Saint Paul, MN 55144") == (44.9631, -93.1022, "zip")
+    assert gazetteer.geocode("60601-1234") == (41.8781, -87.6298, "zip")
+
+
+def test_saint_abbreviation(gazetteer):
+    assert normalize_city("St. Paul") == "saint paul"
+    assert gazetteer.geocode("St. Paul, Minnesota").precision == "city"
+
+
+def test_city_without_a_state_only_when_unambiguous():
+    gazetteer = Gazetteer.load(SAMPLE_GAZETTEER_PATH)
+    assert gazetteer.geocode("Seattle").precision == "city"
+    gazetteer.add("city", "portland|ME", 43.6591, -70.2568)
+    assert gazetteer.geocode("Portland") is None
+
+
+def test_unknown_city_falls_back_to_the_state(gazetteer):
+    assert gazetteer.geocode("Peoria, IL") == (40.3495, -88.9861, "state")
+    assert gazetteer.geocode("Minnesota").precision == "state"
+
+
+@pytest.mark.parametrize("text", [None, "", "Remote", "United States", "Nowhere Town"])
+def test_no_location(gazetteer, text):
+    assert gazetteer.geocode(text) is None
+
+
+def test_state_matches_are_not_stored():
+    job = JobListing(city="Peoria", state="IL", location="Peoria, IL")
+    assert not fill_job_coordinates(job)
+    assert job.latitude is None
+    job = JobListing(city="Chicago", state="IL")
+    assert fill_job_coordinates(job)
+    assert (job.latitude, job.longitude) == (41.8781, -87.6298)
+
+
+def test_build_reads_census_files(tmp_path):
+    places = tmp_path / "places.txt"
+    places.write_text("USPS\tGEOID\tNAME\tINTPTLAT\tINTPTLONG\n"
+                      "IL\t1759000\tPeoria city\t40.7520\t-89.6171\n")
+    zctas = tmp_path / "zctas.txt"
+    zctas.write_text("GEOID\tINTPTLAT\tINTPTLONG\n61602\t40.6890\t-89.5940\n")
+    built = build_gazetteer(census_places=str(places), census_zctas=str(zctas))
+    assert built.geocode("Peoria, IL") == (40.752, -89.6171, "city")
+    assert built.geocode("61602").precision == "zip"
+    # Nothing but Census places: no synthetic metros
+    assert built.geocode("Chicago, IL").precision == "state"
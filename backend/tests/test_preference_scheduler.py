@@ -0,0 +1,80 @@
+"""When swipes trigger a learned-preference recompute"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import preference_scheduler
+from preference_scheduler import DECISIONS, record_swipe
+
+
+def _user(**preferences):
+    return SimpleNamespace(id=1, learned_preferences=preferences or None)
+
+
+def _job(**fields):
+    return SimpleNamespace(**{"salary_min": 60000, "industry": "Technology", "remote_work": False, **fields})
+
+
+def _decision(user, job, direction, interaction_type=None):
+    """(returned flag, decision counted on /metrics) for one swipe"""
+    before = dict(DECISIONS._values)
+    recompute = record_swipe(user, job, direction, interaction_type)
+    changed = [labels[0] for labels, value in DECISIONS._values.items() if value != before.get(labels, 0.0)]
+    assert len(changed) == 1
+    return recompute, changed[0]
+
+
+def test_first_recompute_after_min_swipes():
+    user = _user()
+    decisions = [_decision(user, None, "left", "swipe_left")
+                 for _ in range(preference_scheduler.PREFERENCE_MIN_SWIPES)]
+    assert decisions[:-1] == [(False, "skip")] * (len(decisions) - 1)
+    assert decisions[-1] == (True, "first")
+
+
+def test_drift_from_a_like_unlike_the_preferences():
+    user = _user(computed_at=time.time(), liked_count=1, preferred_min_salary=150000,
+                 preferred_industries={"Healthcare": 3}, remote_preference=1.0)
+    assert _decision(user, _job(), "right", "swipe_right") == (True, "drift")
+
+
+def test_like_matching_the_preferences_adds_little_drift():
+    user = _user(computed_at=time.time(), liked_count=20, preferred_min_salary=60000,
+                 preferred_industries={"Technology": 5}, remote_preference=0.0)
+    assert _decision(user, _job(), "right", "swipe_right") == (False, "skip")
+
+
+def test_left_swipes_add_no_drift():
+    assert preference_scheduler.swipe_drift({}, _job(), "left") == 0.0
+
+
+def test_age_limit():
+    user = _user(computed_at=time.time() - preference_scheduler.PREFERENCE_MAX_AGE_SECONDS - 1)
+    assert _decision(user, None, "left", "swipe_left") == (True, "age")
+
+
+def test_window_of_swipes(monkeypatch):
+    monkeypatch.setattr(preference_scheduler, "RECENT_SWIPE_LIMIT", 3)
+    user = _user(computed_at=time.time())
+    decisions = [_decision(user, None, "left", "swipe_left") for _ in range(3)]
+    assert decisions == [(False, "skip"), (False, "skip"), (True, "window")]
+
+
+def test_recompute_resets_the_pending_state():
+    user = _user()
+    for _ in range(preference_scheduler.PREFERENCE_MIN_SWIPES):
+        record_swipe(user, None, "left", "swipe_left")
+    assert _decision(user, None, "left", "swipe_left") == (False, "skip")
+
+
+@pytest.mark.parametrize("interaction_type", ["shown", "viewed"])
+def test_non_swipe_interactions_are_ignored(interaction_type):
+    user = _user()
+    for _ in range(preference_scheduler.PREFERENCE_MIN_SWIPES + 1):
+        assert _decision(user, None, None, interaction_type) == (False, "ignored")
+    assert preference_scheduler.get_state(preference_scheduler._state_key(user.id)) is None
+
+
+def test_a_swipe_direction_counts_without_a_swipe_type():
+    assert _decision(_user(), None, "right", "viewed") == (False, "skip")
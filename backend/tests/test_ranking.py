@@ -0,0 +1,53 @@
+"""Top-K selection and its tie ordering"""
+import random
+
+import numpy as np
+import pytest
+
+from ranking import merge_top_k, top_k, top_k_arrays
+
+
+def _reference(pairs, k):
+    """Full sort: score descending, then job id ascending"""
+    return sorted(pairs, key=lambda pair: (-pair[0], pair[1]))[:k]
+
+
+def test_top_k_breaks_ties_by_job_id():
+    pairs = [(50.0, 7), (80.0, 3), (50.0, 2), (80.0, 9), (50.0, 5)]
+    assert top_k(pairs, 4, key=lambda pair: pair) == [(80.0, 3), (80.0, 9), (50.0, 2), (50.0, 5)]
+
+
+def test_top_k_with_nothing_to_return():
+    assert top_k([(1.0, 1)], 0, key=lambda pair: pair) == []
+    assert top_k([], 3, key=lambda pair: pair) == []
+
+
+def test_top_k_arrays_keeps_ties_at_the_cutoff_in_id_order():
+    scores = np.array([10.0, 30.0, 30.0, 20.0, 30.0, 30.0])
+    job_ids = np.array([1, 6, 4, 2, 5, 3])
+    assert top_k_arrays(scores, job_ids, 2) == [(30.0, 3), (30.0, 4)]
+    assert top_k_arrays(scores, job_ids, 5) == [(30.0, 3), (30.0, 4), (30.0, 5), (30.0, 6), (20.0, 2)]
+
+
+def test_top_k_arrays_edges():
+    scores, job_ids = np.array([1.0, 2.0]), np.array([1, 2])
+    assert top_k_arrays(scores, job_ids, 0) == []
+    assert top_k_arrays(np.empty(0), np.empty(0, dtype=np.int64), 3) == []
+    assert top_k_arrays(scores, job_ids, 10) == [(2.0, 2), (1.0, 1)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_paths_agree_with_a_full_sort(seed):
+    rng = random.Random(seed)
+    # Few distinct scores, so most of the ordering comes from tie-breaking
+    pairs = [(float(rng.randint(0, 5)), job_id) for job_id in rng.sample(range(10000), 500)]
+    k = rng.randint(1, 60)
+    expected = _reference(pairs, k)
+
+    scores = np.array([score for score, _ in pairs])
+    job_ids = np.array([job_id for _, job_id in pairs])
+    assert top_k(pairs, k, key=lambda pair: pair) == expected
+    assert top_k_arrays(scores, job_ids, k) == expected
+
+    shards = [top_k_arrays(scores[i::4], job_ids[i::4], k) for i in range(4)]
+    assert merge_top_k(shards, k) == expected
@@ -0,0 +1,33 @@
+"""Learned ranker features and position debiasing"""
+import numpy as np
+
+from models import JobListing, User
+from ranking_model import FEATURE_NAMES, pair_features, position_weights
+
+
+def test_features_do_not_depend_on_deck_position():
+    assert "position_in_deck" not in FEATURE_NAMES
+    user = User(industry="tech", skills=["Python"], location_importance=3, industry_importance=3,
+                salary_importance=3, flexibility_importance=3)
+    jobs = [JobListing(industry="Technology", required_skills=["Python", "SQL"], salary_min=90000),
+            JobListing(industry="Retail", remote_work=True)]
+    features = pair_features(user, jobs)
+    assert features.shape == (2, len(FEATURE_NAMES))
+    assert np.array_equal(features[1], pair_features(user, jobs[1:])[0])
+
+
+def test_weighted_right_swipe_rate_is_the_same_at_every_position():
+    rng = np.random.default_rng(0)
+    positions = rng.integers(0, 30, 20000)
+    # Early cards get liked far more often
+    labels = (rng.random(20000) < np.where(positions < 3, 0.6, 0.2)).astype(int)
+    weights = position_weights(positions, labels, smoothing=0.0)
+
+    buckets = np.minimum(positions, 19)
+    rates = [np.average(labels[buckets == b], weights=weights[buckets == b]) for b in range(20)]
+    assert np.allclose(rates, labels.mean())
+
+
+def test_single_class_logs_are_not_reweighted():
+    assert position_weights(np.array([0, 5, 40]), np.array([1, 1, 1])).tolist() == [1.0, 1.0, 1.0]
+    assert len(position_weights(np.empty(0), np.empty(0))) == 0
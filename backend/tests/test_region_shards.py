@@ -0,0 +1,54 @@
+"""Regional candidate lookup for recommendations"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import region_shards
+from feature_store import JobFeatures, build_feature_store, current_version
+from models import Base, JobListing, User
+from region_shards import REMOTE_SHARD, UNLOCATED_SHARD, regional_top_k, user_shards
+
+
+@pytest.fixture
+def features(tmp_path, monkeypatch):
+    """A feature store where the best match for a Chicago user has no state"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        # Next door to the user, but its listing has no state
+        JobListing(id=1, title="Unlocated", industry="Technology", salary_min=150000,
+                   latitude=41.88, longitude=-87.63, state=None),
+        JobListing(id=2, title="Far away", industry="Retail", salary_min=30000,
+                   latitude=47.61, longitude=-122.33, state="WA"),
+        JobListing(id=3, title="Nearby", industry="Retail", salary_min=30000,
+                   latitude=41.5, longitude=-87.0, state="IL"),
+    ])
+    session.commit()
+    store_dir = str(tmp_path / "features")
+    build_feature_store(session, store_dir, with_embeddings=False)
+    session.close()
+    version = current_version(store_dir)
+    store = JobFeatures(version, f"{store_dir}/{version}")
+    monkeypatch.setattr(region_shards, "get_features", lambda: store)
+    return store
+
+
+def _user():
+    return User(id=1, location="Chicago, IL", latitude=41.88, longitude=-87.63, industry="tech",
+                location_importance=3, industry_importance=3, salary_importance=3, flexibility_importance=3)
+
+
+def test_users_always_get_the_remote_and_unlocated_shards():
+    shards = user_shards(_user())
+    assert {REMOTE_SHARD, UNLOCATED_SHARD, "east_north_central"} <= shards
+    assert "pacific" not in shards
+
+
+def test_best_match_without_a_state_is_recommended(features):
+    top = regional_top_k(_user(), 2)
+    assert [job_id for _, job_id in top] == [1, 3]
+
+
+def test_excluded_jobs_are_skipped(features):
+    assert [job_id for _, job_id in regional_top_k(_user(), 2, exclude_ids=[1])] == [3]
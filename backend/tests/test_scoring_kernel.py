@@ -0,0 +1,97 @@
+"""Scalar and vectorized match scores"""
+import random
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from feature_store import JobFeatures, build_feature_store, current_version
+from models import Base, JobListing, User
+from scoring_kernel import kernel_for
+
+INDUSTRIES = ["Technology", "Healthcare", "Financial Services", "Education", None]
+SKILLS = ["Python", "SQL", "Excel", "Nursing", "Sales", "Java", "Communication"]
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    """Jobs in their own database, and a feature store version built from them"""
+    tmp_path = tmp_path_factory.mktemp("catalog")
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    rng = random.Random(7)
+    session = sessionmaker(bind=engine)()
+    for i in range(300):
+        located = rng.random() < 0.8
+        session.add(JobListing(
+            title=f"Job {i}",
+            industry=rng.choice(INDUSTRIES),
+            salary_min=rng.choice([None, 0, rng.uniform(20000, 200000)]),
+            remote_work=rng.random() < 0.3,
+            required_skills=rng.sample(SKILLS, rng.randint(0, 4)),
+            latitude=rng.uniform(25, 48) if located else None,
+            longitude=rng.uniform(-122, -70) if located else None,
+        ))
+    session.commit()
+    store_dir = str(tmp_path / "features")
+    build_feature_store(session, store_dir, with_embeddings=False)
+    version = current_version(store_dir)
+    features = JobFeatures(version, f"{store_dir}/{version}")
+    jobs = session.query(JobListing).all()
+    yield jobs, features
+    session.close()
+
+
+def _users():
+    rng = random.Random(11)
+    for _ in range(30):
+        user = User(
+            industry=rng.choice(["tech", "Health", "", None]),
+            skills=rng.sample(SKILLS, rng.randint(0, 3)),
+            location_importance=rng.randint(1, 5), industry_importance=rng.randint(1, 5),
+            salary_importance=rng.randint(1, 5), flexibility_importance=rng.randint(1, 5),
+        )
+        if rng.random() < 0.7:
+            user.latitude, user.longitude = rng.uniform(25, 48), rng.uniform(-122, -70)
+        if rng.random() < 0.6:
+            user.learned_preferences = {
+                "preferred_min_salary": rng.uniform(40000, 160000),
+                "preferred_industries": {rng.choice(INDUSTRIES[:-1]): rng.randint(1, 4) for _ in range(2)},
+                "remote_preference": rng.random(),
+                "liked_count": rng.randint(1, 9),
+            }
+        yield user
+
+
+@pytest.mark.parametrize("learned", [True, False])
+def test_vectorized_scores_equal_scalar_scores(catalog, learned):
+    jobs, features = catalog
+    positions = features.positions([job.id for job in jobs])
+    by_id = {job.id: job for job in jobs}
+    for user in _users():
+        kernel = kernel_for(user, learned=learned)
+        vectorized = kernel.bind(features).score_positions(features, positions)
+        scalar = [kernel.score(by_id[int(job_id)]) for job_id in features.job_ids[positions]]
+        assert vectorized.tolist() == scalar
+
+
+def test_learned_false_ignores_learned_preferences(catalog):
+    jobs, _ = catalog
+    user = User(location_importance=3, industry_importance=3, salary_importance=3, flexibility_importance=3)
+    explicit = [kernel_for(user).score(job) for job in jobs]
+    user.learned_preferences = {"remote_preference": 1.0, "preferred_min_salary": 90000, "liked_count": 5}
+    assert [kernel_for(user, learned=False).score(job) for job in jobs] == explicit
+    assert [kernel_for(user).score(job) for job in jobs] != explicit
+
+
+def test_kernels_are_cached_until_the_user_changes():
+    user = User(id=1, updated_at=datetime(2026, 1, 1), location_importance=3, industry_importance=3,
+                salary_importance=3, flexibility_importance=3)
+    kernel = kernel_for(user)
+    assert kernel_for(user) is kernel
+    assert kernel_for(user, learned=False) is not kernel
+    user.learned_preferences = {"remote_preference": 1.0}
+    user.updated_at = datetime(2026, 1, 2)
+    assert kernel_for(user) is not kernel
+    assert kernel_for(user).remote_preference == 1.0
@@ -0,0 +1,50 @@
+"""Idempotent swipe writes (POST /api/swipes)"""
+import uuid
+
+import pytest
+
+from models import JobListing, User
+
+
+@pytest.fixture
+def user_and_job(db):
+    user = User(location="Austin, TX")
+    job = JobListing(title="Data Analyst", industry="Technology", salary_min=70000, remote_work=True)
+    db.add_all([user, job])
+    db.commit()
+    return user.id, job.id
+
+
+def _swipe(user_id, job_id, key, direction="right"):
+    return {
+        "user_id": user_id, "job_listing_id": job_id, "interaction_type": f"swipe_{direction}",
+        "swipe_direction": direction, "session_id": "s1", "idempotency_key": key,
+    }
+
+
+def test_replay_returns_the_stored_swipe(client, user_and_job):
+    key = uuid.uuid4().hex
+    first = client.post("/api/swipes", json=_swipe(*user_and_job, key))
+    replay = client.post("/api/swipes", json=_swipe(*user_and_job, key))
+    assert first.status_code == 201
+    assert replay.status_code == 200
+    assert replay.json()["id"] == first.json()["id"]
+
+
+def test_key_reused_for_a_different_swipe_is_rejected(client, user_and_job):
+    key = uuid.uuid4().hex
+    assert client.post("/api/swipes", json=_swipe(*user_and_job, key)).status_code == 201
+    conflict = client.post("/api/swipes", json=_swipe(*user_and_job, key, direction="left"))
+    assert conflict.status_code == 409
+
+
+def test_keys_are_scoped_to_the_user(client, db, user_and_job):
+    other = User(location="Denver, CO")
+    db.add(other)
+    db.commit()
+    user_id, job_id = user_and_job
+    key = uuid.uuid4().hex
+    first = client.post("/api/swipes", json=_swipe(user_id, job_id, key))
+    second = client.post("/api/swipes", json=_swipe(other.id, job_id, key))
+    assert (first.status_code, second.status_code) == (201, 201)
+    assert first.json()["id"] != second.json()["id"]
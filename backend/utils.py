@@ -1,8 +1,25 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-from typing import List, Dict, Any
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
 import math
+import os
+import time
+from datetime import datetime, timedelta
 from models import User, JobListing, UserJobListing
+from metrics import timed, timed_section
+from ranking import top_k
+from scoring_kernel import kernel_for
+from queries import swipe_by_key, recent_swipes_with_jobs, recent_liked_job_ids
+
+# Swipes older than this do not feed preferences or "similar to your likes";
+# bounding created_at also lets PostgreSQL prune old interaction partitions
+RECENT_INTERACTION_DAYS = int(os.getenv("RECENT_INTERACTION_DAYS", "180"))
+
+
+def recent_interactions_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=RECENT_INTERACTION_DAYS)
 
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -27,87 +44,92 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return distance
 
 
+def swipe_idempotency_key(swipe_data) -> Optional[str]:
+    """
+    Client-supplied key, or one derived from the swipe's identity within its
+    session. Without a session a repeat swipe may be deliberate, so no key.
+    """
+    if swipe_data.idempotency_key:
+        return swipe_data.idempotency_key
+    if not swipe_data.session_id:
+        return None
+    identity = "|".join(str(part) for part in (
+        swipe_data.user_id, swipe_data.job_listing_id, swipe_data.session_id,
+        swipe_data.interaction_type, swipe_data.aspect_swiped
+    ))
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+# Fields a retry must repeat unchanged for its key to be accepted
+SWIPE_REPLAY_FIELDS = ("job_listing_id", "interaction_type", "swipe_direction", "session_id", "aspect_swiped")
+
+
+def is_same_swipe(existing: UserJobListing, swipe_data) -> bool:
+    """Whether a request replaying an idempotency key describes the stored swipe"""
+    return all(getattr(existing, field) == getattr(swipe_data, field) for field in SWIPE_REPLAY_FIELDS)
+
+
+def insert_swipe_once(db: Session, values: Dict[str, Any]) -> Tuple[UserJobListing, bool]:
+    """
+    Insert a swipe unless the user already has one with the same idempotency
+    key. Returns (row, created); on a duplicate the existing row is returned.
+    """
+    key = values.get("idempotency_key")
+    dialect = db.get_bind().dialect.name
+    if key and dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        # No conflict target: on a partitioned table the key is unique per partition only
+        statement = insert(UserJobListing).values(**values).on_conflict_do_nothing().returning(UserJobListing)
+        swipe = db.scalars(statement).first()
+        db.commit()
+        if swipe is not None:
+            return swipe, True
+        return swipe_by_key(db, values["user_id"], key), False
+
+    swipe = UserJobListing(**values)
+    db.add(swipe)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = swipe_by_key(db, values["user_id"], key) if key else None
+        if existing is None:
+            raise
+        return existing, False
+    return swipe, True
+
+
+@timed("calculate_job_match_score")
 def calculate_job_match_score(user: User, job: JobListing) -> float:
     """
     Calculate match score between user preferences and job listing.
-    Returns a score from 0-100.
+    Returns a score from 0-100. Explicit importances and learned preferences
+    are compiled once per user into a scoring kernel (see scoring_kernel.py).
     """
-    score = 0.0
-    total_weight = 0.0
-    
-    # Location match (if coordinates available)
-    if user.latitude and user.longitude and job.latitude and job.longitude:
-        distance = calculate_distance(user.latitude, user.longitude, job.latitude, job.longitude)
-        # Score decreases with distance (50 miles = 50% score, 200+ miles = 0%)
-        location_score = max(0, 100 - (distance / 2))
-        score += location_score * user.location_importance
-        total_weight += user.location_importance
-    
-    # Industry match
-    if user.industry and job.industry:
-        if user.industry.lower() in job.industry.lower():
-            score += 100 * user.industry_importance
-        else:
-            score += 0 * user.industry_importance
-        total_weight += user.industry_importance
-    
-    # Salary match (assume user wants higher salary)
-    if job.salary_min:
-        # Normalize salary score (assuming 30k-150k range)
-        salary_score = min(100, ((job.salary_min - 30000) / 120000) * 100)
-        score += max(0, salary_score) * user.salary_importance
-        total_weight += user.salary_importance
-    
-    
-    # Flexibility (remote work)
-    if job.remote_work:
-        score += 100 * user.flexibility_importance
-    else:
-        score += 30 * user.flexibility_importance  # Some score even if not remote
-    total_weight += user.flexibility_importance
-    
-    # Skills match
-    if user.skills and job.required_skills:
-        user_skills_set = set([s.lower() for s in user.skills])
-        job_skills_set = set([s.lower() for s in job.required_skills])
-        if job_skills_set:
-            skills_overlap = len(user_skills_set & job_skills_set) / len(job_skills_set)
-            score += skills_overlap * 100 * 2  # Skills are important, weight of 2
-            total_weight += 2
-    
-    # Calculate final weighted score
-    if total_weight > 0:
-        final_score = score / total_weight
-    else:
-        final_score = 50.0  # Default middle score
-    
-    return round(final_score, 2)
+    return kernel_for(user).score(job)
 
 
 def update_user_preferences_from_swipes(user: User, db: Session):
     """
     Analyze user's swipe history and update learned preferences.
-    Called every 3 swipes.
+    Called when preference_scheduler decides the swipes since the last run matter.
     """
-    # Get recent swipes (last 30 swipes)
-    recent_swipes = db.query(UserJobListing).filter(
-        UserJobListing.user_id == user.id,
-        UserJobListing.interaction_type.in_(['swipe_left', 'swipe_right'])
-    ).order_by(UserJobListing.created_at.desc()).limit(30).all()
+    # Get recent swipes (last 30 swipes) together with their job listings in
+    # one round-trip instead of separate swipe / liked / rejected queries
+    recent_swipes = recent_swipes_with_jobs(db, user.id, recent_interactions_cutoff())
     
     if not recent_swipes:
         return
     
-    # Separate liked and rejected jobs
-    liked_job_ids = [s.job_listing_id for s in recent_swipes if s.swipe_direction == 'right']
-    rejected_job_ids = [s.job_listing_id for s in recent_swipes if s.swipe_direction == 'left']
-    
-    # Get the actual job listings
-    liked_jobs = db.query(JobListing).filter(JobListing.id.in_(liked_job_ids)).all() if liked_job_ids else []
-    rejected_jobs = db.query(JobListing).filter(JobListing.id.in_(rejected_job_ids)).all() if rejected_job_ids else []
+    # Liked jobs, each counted once even if swiped right repeatedly
+    liked_jobs = list({job.id: job for direction, job in recent_swipes if direction == 'right'}.values())
     
     # Analyze patterns
-    learned_prefs = user.learned_preferences or {}
+    # Copy so the JSON column sees a new value and is flagged as changed
+    learned_prefs = dict(user.learned_preferences or {})
     
     # Average salary of liked jobs
     if liked_jobs:
@@ -132,50 +154,87 @@ def update_user_preferences_from_swipes(user: User, db: Session):
         if aoi_scores:
             learned_prefs['preferred_aoi_score'] = sum(aoi_scores) / len(aoi_scores)
     
+    # Bookkeeping for preference_scheduler's drift estimate
+    learned_prefs['liked_count'] = len(liked_jobs)
+    learned_prefs['computed_at'] = time.time()
+    
     # Update user's learned preferences
     user.learned_preferences = learned_prefs
-    user.updated_at = db.query(func.now()).scalar()
+    user.updated_at = datetime.utcnow()
     db.commit()
 
 
+@timed("get_recommended_jobs")
 def get_recommended_jobs(
     user: User,
     db: Session,
     exclude_job_ids: List[int],
-    limit: int = 10
+    limit: int = 10,
+    ranker=None
 ) -> List[Dict[str, Any]]:
     """
     Get personalized job recommendations for a user.
     Returns list of jobs with match scores and reasons.
+    If a learned ranker is given, it re-orders the best rule-scored candidates.
     """
-    # Build query for jobs not yet seen
-    query = db.query(JobListing)
-    
-    if exclude_job_ids:
-        query = query.filter(~JobListing.id.in_(exclude_job_ids))
-    
-    # Apply some basic filters based on user preferences
-    filters = []
-    
-    # Location filter (if user has coordinates)
-    if user.latitude and user.longitude:
-        # This is a simplified filter; in production, use spatial queries
-        filters.append(JobListing.latitude.isnot(None))
-    
-    # Industry filter
-    if user.industry:
-        filters.append(JobListing.industry.ilike(f"%{user.industry}%"))
-    
-    # Get potential jobs
-    if filters:
-        query = query.filter(or_(*filters))
+    # Best-scoring unseen jobs from the user's region and the remote shard
+    from region_shards import regional_top_k
+
+    regional = regional_top_k(user, limit * 3, exclude_job_ids)
+    if regional is not None:
+        jobs = db.query(JobListing).filter(JobListing.id.in_([job_id for _, job_id in regional])).all()
+    else:
+        # No feature store, no known location or nothing left in the region: fall back to a filtered scan
+        query = db.query(JobListing)
+
+        if exclude_job_ids:
+            query = query.filter(~JobListing.id.in_(exclude_job_ids))
+
+        # Apply some basic filters based on user preferences
+        filters = []
+
+        # Location filter (if user has coordinates)
+        if user.latitude and user.longitude:
+            filters.append(JobListing.latitude.isnot(None))
+
+        # Industry filter
+        if user.industry:
+            filters.append(JobListing.industry.ilike(f"%{user.industry}%"))
+
+        if filters:
+            query = query.filter(or_(*filters))
+
+        # Get more than needed for scoring, best opportunity scores first
+        jobs = query.order_by(JobListing.aoi_score.desc().nulls_last(), JobListing.id).limit(limit * 3).all()
+
+    # Add "similar to your likes" candidates from the job embedding index (skipped until one is built)
+    from similarity import get_index
+
+    liked_job_ids = recent_liked_job_ids(db, user.id, recent_interactions_cutoff())
+    index = get_index() if liked_job_ids else None
     
-    jobs = query.limit(limit * 3).all()  # Get more than needed for scoring
+    similar_job_ids = set()
+    if index is not None:
+        similar_job_ids = {job_id for job_id, _ in index.similar_to(
+            liked_job_ids, limit * 3, exclude_ids=exclude_job_ids
+        )}
+        candidate_ids = {job.id for job in jobs}
+        missing_ids = [job_id for job_id in similar_job_ids if job_id not in candidate_ids]
+        if missing_ids:
+            jobs += db.query(JobListing).filter(JobListing.id.in_(missing_ids)).all()
     
-    # Calculate match scores for all jobs
+    # Calculate match scores for all jobs, vectorized when they are all in the feature store
+    from scoring_pool import score_job_ids
+
+    match_scores = score_job_ids([job.id for job in jobs], user) if jobs else None
+    if match_scores is None:
+        kernel = kernel_for(user)
+        with timed_section("calculate_job_match_score"):
+            match_scores = [kernel.score(job) for job in jobs]
+
     scored_jobs = []
-    for job in jobs:
-        match_score = calculate_job_match_score(user, job)
+    for job, match_score in zip(jobs, match_scores):
+        match_score = float(match_score)
         
         # Generate reasons for recommendation
         reasons = []
@@ -183,6 +242,9 @@ def get_recommended_jobs(
         if user.industry and job.industry and user.industry.lower() in job.industry.lower():
             reasons.append(f"Matches your preferred industry: {job.industry}")
         
+        if job.id in similar_job_ids:
+            reasons.append("Similar to jobs you liked")
+        
         if job.aoi_score and job.aoi_score >= 4.0:
             reasons.append(f"High opportunity score: {job.aoi_score:.1f}/5.0")
         
@@ -210,7 +272,12 @@ def get_recommended_jobs(
             "reasons": reasons[:3]  # Limit to top 3 reasons
         })
     
-    # Sort by match score and return top N
-    scored_jobs.sort(key=lambda x: x['match_score'], reverse=True)
+    # Re-rank the best rule-scored candidates by predicted like probability
+    if ranker is not None and scored_jobs:
+        shortlist = top_k(scored_jobs, ranker.max_candidates, key=lambda x: (x['match_score'], x['job'].id))
+        probabilities = ranker.score_jobs(user, [x['job'] for x in shortlist])
+        ranked = top_k(zip(probabilities, shortlist), limit, key=lambda pair: (pair[0], pair[1]['job'].id))
+        return [x for _, x in ranked]
     
-    return scored_jobs[:limit]
+    # Select the top N by match score (ties by job id)
+    return top_k(scored_jobs, limit, key=lambda x: (x['match_score'], x['job'].id))
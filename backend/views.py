@@ -1,23 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import json
 import uuid
 
-from database import get_db
+from database import get_db, get_read_db, get_replica_engines, note_user_write, replica_session
+from metrics import InstrumentedRoute, timed_section
 from models import User, JobListing, UserJobListing
 from schemas import (
     UserCreate, UserResponse, UserPreferencesUpdate,
     JobListingResponse, SwipeCreate, SwipeResponse,
-    RecommendationResponse, PaginatedJobListings
+    ImpressionCreate, ImpressionBatchResponse,
+    RecommendationResponse, PaginatedJobListings, SimilarJobResponse
 )
 from utils import (
     calculate_job_match_score,
+    swipe_idempotency_key,
+    is_same_swipe,
+    insert_swipe_once,
     update_user_preferences_from_swipes,
     get_recommended_jobs
 )
+from ranking import top_k
+from scoring_kernel import kernel_for
+from exports import EXPORTS_ENABLED, MEDIA_TYPES, stream_export
+from event_buffer import IMPRESSION_TYPES, BufferFull, get_buffer, impression_row
+from geocoder import fill_user_coordinates
+from queries import (
+    user_by_id, job_by_id, job_exists, swipe_by_key, seen_job_ids, user_swipes_page, planner_row_estimate
+)
+from preference_scheduler import record_swipe
+from cache import (
+    catalog_version, user_version, invalidate_user, job_cache, deck_cache, score_cache, count_cache
+)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
 
-router = APIRouter()
+def _job_response(job: JobListing, match_score: Optional[float] = None) -> JobListingResponse:
+    """Build a detached response DTO for a job, optionally carrying its match score"""
+    return JobListingResponse.model_validate(job).model_copy(update={"match_score": match_score})
+
+
+def _estimated_job_count(db: Session, query, filters: list) -> int:
+    """
+    Number of jobs matching ``query`` without counting them per request: the
+    planner's estimate on PostgreSQL, elsewhere an exact count cached per
+    catalog version and filter set
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return planner_row_estimate(db, query.statement)
+    return count_cache.get_or_load(f"{catalog_version()}:{json.dumps(filters)}", query.order_by(None).count)
 
 
 # User endpoints
@@ -40,18 +75,22 @@ def create_user(user_data: UserCreate, db: Session = Depends(get_db)):
         flexibility_importance=user_data.flexibility_importance,
         learned_preferences={}
     )
+    # Coordinates the client did not send come from the offline gazetteer
+    fill_user_coordinates(db_user)
     
+    # id and defaults come back via INSERT ... RETURNING, and the session does
+    # not expire them on commit, so no refresh round-trip is needed
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
+    note_user_write(db_user.id)
     
     return db_user
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_read_db)):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -64,13 +103,20 @@ def update_preferences(
     db: Session = Depends(get_db)
 ):
     """Update user preferences"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update fields if provided
-    if preferences.location is not None:
+    if preferences.location is not None and preferences.location != user.location:
         user.location = preferences.location
+        # Old coordinates belong to the old location; re-geocode unless new ones are sent
+        user.latitude = user.longitude = None
+    if preferences.latitude is not None and preferences.longitude is not None:
+        user.latitude = preferences.latitude
+        user.longitude = preferences.longitude
+    if preferences.work_location is not None:
+        user.work_location = preferences.work_location
     if preferences.industry is not None:
         user.industry = preferences.industry
     if preferences.occupation is not None:
@@ -84,9 +130,11 @@ def update_preferences(
     if preferences.salary_importance is not None:
         user.salary_importance = preferences.salary_importance
     
+    fill_user_coordinates(user)
     user.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(user)
+    note_user_write(user_id)
+    invalidate_user(user_id)
     
     return user
 
@@ -100,9 +148,16 @@ def get_jobs(
     location: Optional[str] = Query(None),
     industry: Optional[str] = Query(None),
     min_salary: Optional[float] = Query(None),
-    db: Session = Depends(get_db)
+    min_aoi: Optional[float] = Query(None, ge=0, le=5),
+    after_id: Optional[int] = Query(None, ge=0),
+    count: str = Query("exact", pattern="^(exact|estimate)$"),
+    db: Session = Depends(get_read_db)
 ):
-    """Get job listings with optional filters"""
+    """
+    Get job listings with optional filters. Without a user, listings are
+    ordered by id and paged in SQL (``after_id`` continues after a job id
+    instead of skipping rows); ``count=estimate`` avoids an exact COUNT(*).
+    """
 
     query = db.query(JobListing)
 
@@ -113,24 +168,69 @@ def get_jobs(
         query = query.filter(JobListing.industry.ilike(f"%{industry}%"))
     if min_salary:
         query = query.filter(JobListing.salary_min >= min_salary)
+    if min_aoi is not None:
+        # Range scan on the aoi_score index
+        query = query.filter(JobListing.aoi_score >= min_aoi)
+
+    user = user_by_id(db, user_id) if user_id else None
+
+    if user is None:
+        # Only the requested page is read, walking the primary key index
+        page_query = query.order_by(JobListing.id)
+        if after_id is not None:
+            page_query = page_query.filter(JobListing.id > after_id)
+        else:
+            page_query = page_query.offset(skip)
+        page = page_query.limit(limit).all()
+        if count == "estimate":
+            total = _estimated_job_count(db, query, [location, industry, min_salary, min_aoi])
+        else:
+            total = query.order_by(None).count()
+        return {
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "jobs": [_job_response(job) for job in page],
+            "total_is_estimate": count == "estimate",
+            "next_after_id": page[-1].id if len(page) == limit else None,
+        }
+
+    # NumPy-backed modules are imported on first use rather than with the app
+    from feature_store import get_features
+    from scoring_pool import score_catalog
+
+    # Candidates are scored in one vectorized pass over the feature store
+    # (across worker processes when there are many); only the returned page
+    # is loaded as ORM rows
+    if get_features() is not None:
+        candidate_ids = [job_id for (job_id,) in query.with_entities(JobListing.id).all()]
+        ranked = score_catalog(candidate_ids, user, skip + limit)
+        if ranked is not None:
+            page = ranked[skip : skip + limit]
+            jobs_by_id = {
+                job.id: job
+                for job in db.query(JobListing).filter(JobListing.id.in_([job_id for _, job_id in page])).all()
+            }
+            return {
+                "total": len(candidate_ids),
+                "skip": skip,
+                "limit": limit,
+                "jobs": [_job_response(jobs_by_id[job_id], score) for score, job_id in page if job_id in jobs_by_id]
+            }
 
     all_jobs = query.all()
     total = len(all_jobs)
 
-    # Calculate match scores if user_id provided
-    if user_id:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            for job in all_jobs:
-                job.match_score = calculate_job_match_score(user, job)
+    # Without the feature store, score the ORM rows. Scores are kept next to
+    # the ORM objects instead of being set on them, so identity-mapped
+    # instances are never mutated and only the returned page is turned into DTOs.
+    kernel = kernel_for(user)
+    scored_jobs = ((kernel.score(job), job) for job in all_jobs)
 
-            # Sort by match_score descending
-            all_jobs.sort(key=lambda j: j.match_score, reverse=True)
-    else:
-        # fallback ordering if no user
-        all_jobs.sort(key=lambda j: j.id)
-
-    jobs = all_jobs[skip : skip + limit]
+    # Select the top skip + limit by match_score (ties by id) instead of sorting everything
+    with timed_section("calculate_job_match_score"):
+        ranked = top_k(scored_jobs, skip + limit, key=lambda pair: (pair[0], pair[1].id))
+    jobs = [_job_response(job, score) for score, job in ranked[skip:]]
 
     return {
         "total": total,
@@ -141,78 +241,174 @@ def get_jobs(
 
 
 @router.get("/jobs/{job_id}", response_model=JobListingResponse)
-def get_job(job_id: int, user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def get_job(job_id: int, user_id: Optional[int] = Query(None), db: Session = Depends(get_read_db)):
     """Get job listing by ID"""
-    job = db.query(JobListing).filter(JobListing.id == job_id).first()
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
+    catalog = catalog_version()
+
+    def load_job():
+        job = job_by_id(db, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return _job_response(job).model_dump(mode="json")
+
+    def load_score():
+        user = user_by_id(db, user_id)
+        job = job_by_id(db, job_id)
+        return calculate_job_match_score(user, job) if user else None
+
+    detail = job_cache.get_or_load(f"{catalog}:{job_id}", load_job)
+
     # Calculate match score if user_id provided
+    match_score = None
     if user_id:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            job.match_score = calculate_job_match_score(user, job)
+        match_score = score_cache.get_or_load(f"{catalog}:{user_id}.{user_version(user_id)}:{job_id}", load_score)
+    
+    return {**detail, "match_score": match_score}
+
+
+@router.get("/jobs/{job_id}/similar", response_model=List[SimilarJobResponse])
+def get_similar_jobs(
+    job_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db)
+):
+    """Get jobs most similar to a job listing ("more like this")"""
+    if not job_exists(db, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    from similarity import get_index
+
+    index = get_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Similarity index is not built yet")
+    neighbors = index.similar_to([job_id], limit)
+    jobs_by_id = {
+        job.id: job
+        for job in db.query(JobListing).filter(JobListing.id.in_([i for i, _ in neighbors])).all()
+    } if neighbors else {}
     
-    return job
+    return [
+        {"job": jobs_by_id[neighbor_id], "similarity": similarity}
+        for neighbor_id, similarity in neighbors
+        if neighbor_id in jobs_by_id
+    ]
 
 
 # Swipe/Interaction endpoints
+def _replayed_swipe(existing: UserJobListing, swipe_data: SwipeCreate, response: Response) -> UserJobListing:
+    """The stored swipe for a retry (200), or 409 when the key was reused for a different swipe"""
+    if not is_same_swipe(existing, swipe_data):
+        raise HTTPException(status_code=409, detail="Idempotency key was already used for a different swipe")
+    response.status_code = 200
+    return existing
+
+
 @router.post("/swipes", response_model=SwipeResponse, status_code=201)
-def create_swipe(swipe_data: SwipeCreate, db: Session = Depends(get_db)):
-    """Record a user swipe/interaction with a job listing"""
+def create_swipe(swipe_data: SwipeCreate, response: Response, db: Session = Depends(get_db)):
+    """Record a user swipe/interaction with a job listing (idempotent per key)"""
+    
+    # A retried request is answered from the unique (user, key) index alone
+    idempotency_key = swipe_idempotency_key(swipe_data)
+    if idempotency_key:
+        existing = swipe_by_key(db, swipe_data.user_id, idempotency_key)
+        if existing:
+            return _replayed_swipe(existing, swipe_data, response)
     
     # Verify user exists
-    user = db.query(User).filter(User.id == swipe_data.user_id).first()
+    user = user_by_id(db, swipe_data.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Verify job exists
-    job = db.query(JobListing).filter(JobListing.id == swipe_data.job_listing_id).first()
-    if not job:
+    # Verify job exists (a like also needs the row, to estimate preference drift)
+    liked_job = None
+    if swipe_data.swipe_direction == 'right':
+        liked_job = job_by_id(db, swipe_data.job_listing_id)
+        job_found = liked_job is not None
+    else:
+        job_found = job_exists(db, swipe_data.job_listing_id)
+    if not job_found:
         raise HTTPException(status_code=404, detail="Job listing not found")
     
-    # Create swipe record
-    db_swipe = UserJobListing(
-        user_id=swipe_data.user_id,
-        job_listing_id=swipe_data.job_listing_id,
-        interaction_type=swipe_data.interaction_type,
-        swipe_direction=swipe_data.swipe_direction,
-        position_in_deck=swipe_data.position_in_deck,
-        session_id=swipe_data.session_id,
-        aspect_swiped=swipe_data.aspect_swiped,
-        time_spent_viewing=swipe_data.time_spent_viewing
-    )
-    
-    db.add(db_swipe)
-    db.commit()
-    db.refresh(db_swipe)
+    # Create swipe record; a concurrent retry that won the race is returned instead
+    db_swipe, created = insert_swipe_once(db, {
+        "user_id": swipe_data.user_id,
+        "job_listing_id": swipe_data.job_listing_id,
+        "interaction_type": swipe_data.interaction_type,
+        "swipe_direction": swipe_data.swipe_direction,
+        "position_in_deck": swipe_data.position_in_deck,
+        "session_id": swipe_data.session_id,
+        "aspect_swiped": swipe_data.aspect_swiped,
+        "time_spent_viewing": swipe_data.time_spent_viewing,
+        "idempotency_key": idempotency_key
+    })
+    if not created:
+        return _replayed_swipe(db_swipe, swipe_data, response)
     
-    # Every 3 swipes, update user preferences
-    swipe_count = db.query(UserJobListing).filter(
-        UserJobListing.user_id == swipe_data.user_id,
-        UserJobListing.interaction_type.in_(['swipe_left', 'swipe_right'])
-    ).count()
+    note_user_write(swipe_data.user_id)
     
-    if swipe_count % 3 == 0:
+    # Recompute learned preferences only once the swipes since the last run
+    # have moved them enough; only then do cached decks and scores go stale
+    if record_swipe(user, liked_job, swipe_data.swipe_direction, swipe_data.interaction_type):
         update_user_preferences_from_swipes(user, db)
+        invalidate_user(swipe_data.user_id)
     
     return db_swipe
 
 
+@router.post("/impressions", response_model=ImpressionBatchResponse, status_code=202)
+async def record_impressions(impressions: List[ImpressionCreate]):
+    """Queue 'shown'/'viewed' events for a batched write (not durable until flushed)"""
+    if len(impressions) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 impressions per request")
+    if any(i.interaction_type not in IMPRESSION_TYPES for i in impressions):
+        raise HTTPException(status_code=400, detail="Only 'shown' and 'viewed' events are accepted")
+    
+    buffer = get_buffer()
+    if buffer is None:
+        raise HTTPException(status_code=503, detail="Impression buffer is not running")
+    
+    received_at = datetime.utcnow()
+    try:
+        await buffer.put_many([impression_row(i, received_at) for i in impressions])
+    except BufferFull:
+        # The database is falling behind and none of the batch was queued;
+        # tell the client to back off and resend it
+        raise HTTPException(status_code=503, detail="Impression buffer is full", headers={"Retry-After": "1"})
+    
+    return {"accepted": len(impressions)}
+
+
 @router.get("/users/{user_id}/swipes", response_model=List[SwipeResponse])
 def get_user_swipes(
     user_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get user's swipe history"""
     
-    swipes = db.query(UserJobListing).filter(
-        UserJobListing.user_id == user_id
-    ).order_by(UserJobListing.created_at.desc()).offset(skip).limit(limit).all()
-    
-    return swipes
+    return user_swipes_page(db, user_id, skip, limit)
+
+
+@router.get("/exports/interactions")
+def export_interactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None)
+):
+    """Stream all interactions joined with job features as NDJSON or CSV"""
+    if not EXPORTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Exports are disabled; use exports.py")
+    if not get_replica_engines():
+        # A long scan must not hold connections from the primary's pool
+        raise HTTPException(status_code=503, detail="Exports need a read replica; use exports.py")
+    # No get_db dependency: the body is streamed after dependencies exit, so
+    # the generator owns its session (and server-side cursor) until it finishes
+    return StreamingResponse(
+        stream_export(replica_session, format, start, end),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="interactions.{format}"'}
+    )
 
 
 # Recommendation endpoints
@@ -220,26 +416,37 @@ def get_user_swipes(
 def get_recommendations(
     user_id: int,
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get personalized job recommendations for user"""
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get jobs user hasn't interacted with yet
-    already_seen_ids = db.query(UserJobListing.job_listing_id).filter(
-        UserJobListing.user_id == user_id
-    ).distinct().all()
-    already_seen_ids = [job_id for (job_id,) in already_seen_ids]
-    
-    # Get recommended jobs
-    recommendations = get_recommended_jobs(
-        user=user,
-        db=db,
-        exclude_job_ids=already_seen_ids,
-        limit=limit
-    )
+    already_seen_ids = seen_job_ids(db, user_id)
+
+    def load_deck():
+        # Get recommended jobs, with spare ones so the deck survives a few swipes
+        from ranking_model import get_model
+
+        recommendations = get_recommended_jobs(
+            user=user,
+            db=db,
+            exclude_job_ids=already_seen_ids,
+            limit=limit * 2,
+            ranker=get_model()
+        )
+        return [RecommendationResponse.model_validate(r).model_dump(mode="json") for r in recommendations]
     
-    return recommendations
+    # Decks are keyed by catalog and preference versions; jobs swiped since
+    # the deck was built are dropped here, and a used-up deck is rebuilt
+    key = f"{catalog_version()}:{user_id}.{user_version(user_id)}:{limit}"
+    deck = deck_cache.get_or_load(key, load_deck)
+    seen = set(already_seen_ids)
+    fresh = [rec for rec in deck if rec["job"]["id"] not in seen]
+    if len(fresh) < limit and len(fresh) < len(deck):
+        fresh = load_deck()
+        deck_cache.put(key, fresh)
+    return fresh[:limit]
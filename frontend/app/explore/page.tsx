@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from 'react';
 import { useRouter } from 'next/navigation';
-import { recommendationAPI, swipeAPI, Recommendation } from '@/lib/api';
+import { recommendationAPI, swipeAPI, impressionAPI, Recommendation } from '@/lib/api';
 import { storage } from '@/lib/storage';
 import JobCard from '@/components/JobCard';
 
@@ -25,6 +25,19 @@ export default function ExplorePage() {
     fetchRecommendations(id);
   }, [router]);
 
+  // Record that the current card was shown (impressions are best-effort)
+  useEffect(() => {
+    const currentRec = recommendations[currentIndex];
+    if (!userId || !currentRec) return;
+    impressionAPI.record([{
+      user_id: userId,
+      job_listing_id: currentRec.job.id,
+      interaction_type: 'shown',
+      position_in_deck: currentIndex,
+      session_id: sessionId,
+    }]).catch((error) => console.error('Error recording impression:', error));
+  }, [userId, recommendations, currentIndex, sessionId]);
+
   const fetchRecommendations = async (userId: number) => {
     try {
       const recs = await recommendationAPI.get(userId, 20);
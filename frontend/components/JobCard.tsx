@@ -200,9 +200,6 @@ export default function JobCard({ recommendation, onSwipe }: JobCardProps) {
               <div className="space-y-2 text-xs">
                 {[
                   { label: 'Overall', value: job.aoi_score },
-                  { label: 'Wage', value: job.aoi_wage_score },
-                  { label: 'Mobility', value: job.aoi_mobility_score },
-                  { label: 'Access', value: job.aoi_access_score },
                 ].map(
                   (score) =>
                     score.value && (
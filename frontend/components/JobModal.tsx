@@ -198,26 +198,6 @@ export default function JobModal({ job, onClose }: JobModalProps) {
                     value: job.aoi_score,
                     description: 'Combined opportunity rating',
                   },
-                  {
-                    label: 'Wage Score',
-                    value: job.aoi_wage_score,
-                    description: 'Compensation potential',
-                  },
-                  {
-                    label: 'Mobility Score',
-                    value: job.aoi_mobility_score,
-                    description: 'Career growth opportunity',
-                  },
-                  {
-                    label: 'Access Score',
-                    value: job.aoi_access_score,
-                    description: 'Ease of entry',
-                  },
-                  {
-                    label: 'Job Quality',
-                    value: job.aoi_job_quality_score,
-                    description: 'Overall job quality',
-                  },
                 ].map(
                   (score) =>
                     score.value && (
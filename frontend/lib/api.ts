@@ -66,10 +66,6 @@ export interface JobListing {
   education_required?: string;
   experience_required?: string;
   aoi_score?: number;
-  aoi_access_score?: number;
-  aoi_wage_score?: number;
-  aoi_mobility_score?: number;
-  aoi_job_quality_score?: number;
   remote_work: boolean;
   posted_date?: string;
   expires_date?: string;
@@ -87,6 +83,16 @@ export interface SwipeCreate {
   session_id?: string;
   aspect_swiped?: string;
   time_spent_viewing?: number;
+  idempotency_key?: string;
+}
+
+export interface ImpressionCreate {
+  user_id: number;
+  job_listing_id: number;
+  interaction_type?: 'shown' | 'viewed';
+  position_in_deck?: number;
+  session_id?: string;
+  time_spent_viewing?: number;
 }
 
 export interface Recommendation {
@@ -146,6 +152,14 @@ export const swipeAPI = {
   },
 };
 
+export const impressionAPI = {
+  // Buffered server-side and written in batches; responds 202 Accepted
+  record: async (events: ImpressionCreate[]) => {
+    const response = await api.post('/impressions', events);
+    return response.data;
+  },
+};
+
 export const recommendationAPI = {
   get: async (userId: number, limit?: number): Promise<Recommendation[]> => {
     const response = await api.get(`/users/${userId}/recommendations`, {